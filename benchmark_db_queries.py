@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试脚本：周期数据表增长时"最新N条"和时间范围查询的耗时
+
+用法: python benchmark_db_queries.py [行数1 行数2 ...]
+
+在临时数据库中逐步写入模拟周期数据（每20ms一个周期），每达到一个行数
+测量一次DatabaseManager的查询耗时，并与按时间戳文本排序的旧查询对比。
+使用微秒整数列上的索引后，查询耗时不随表的大小增长；
+行数可以指定到数千万，例如: python benchmark_db_queries.py 1000000 10000000 30000000
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_codec import encode_cycle
+from gis_pd_decoder import ADC_SCALE
+from gis_pd_storage import us_to_timestamp
+
+CYCLE_INTERVAL_US = 20_000  # 50Hz，每个周期20ms
+START_US = 1_700_000_000_000_000
+INSERT_BATCH = 100_000
+LATEST_COUNT = 100
+RANGE_SECONDS = 10  # 时间范围查询的窗口长度
+
+
+def insert_rows(conn, start, stop, blob):
+    """写入编号为[start, stop)的模拟周期"""
+    for batch_start in range(start, stop, INSERT_BATCH):
+        batch_stop = min(stop, batch_start + INSERT_BATCH)
+        rows = ((us_to_timestamp(START_US + i * CYCLE_INTERVAL_US), START_US + i * CYCLE_INTERVAL_US, i, blob)
+                for i in range(batch_start, batch_stop))
+        with conn:
+            conn.executemany(
+                "INSERT INTO cycle_data (timestamp, ts_us, cycle_number, data) VALUES (?, ?, ?, ?)", rows)
+
+
+def best_time(func, repeat=5):
+    """多次运行取最短耗时（毫秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_benchmark(sizes):
+    """运行基准测试并打印结果"""
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+
+    blob = encode_cycle(np.arange(16) * ADC_SCALE)
+    print(f"=== 周期数据查询基准测试 (最新{LATEST_COUNT}条, {RANGE_SECONDS}秒时间范围) ===")
+    print(f"{'行数':>12} {'最新N条':>10} {'时间范围':>10} {'旧最新N条':>10} {'旧时间范围':>10}  (毫秒)")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = DatabaseManager(os.path.join(tmp_dir, "benchmark.db"))
+        conn = sqlite3.connect(manager.db_path)
+        rows = 0
+        try:
+            for size in sorted(sizes):
+                insert_rows(conn, rows, size, blob)
+                rows = size
+
+                # 时间范围取表的中间位置
+                middle_us = START_US + rows // 2 * CYCLE_INTERVAL_US
+                start_time = us_to_timestamp(middle_us)[:19]
+                end_time = us_to_timestamp(middle_us + RANGE_SECONDS * 1_000_000)[:19]
+
+                latest_ms = best_time(lambda: manager.get_latest_cycle_data(LATEST_COUNT))
+                range_ms = best_time(lambda: manager.get_cycle_data_by_time(start_time, end_time))
+
+                # 旧查询：按时间戳文本排序和比较，需要扫描整个表
+                reader = manager.get_read_connection()
+                legacy_latest_ms = best_time(lambda: reader.execute(
+                    "SELECT id, timestamp, cycle_number, data FROM cycle_data "
+                    "ORDER BY timestamp DESC LIMIT ?", (LATEST_COUNT,)).fetchall(), repeat=1)
+                legacy_range_ms = best_time(lambda: reader.execute(
+                    "SELECT id, timestamp, cycle_number, data FROM cycle_data "
+                    "WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp", (start_time, end_time)).fetchall(),
+                    repeat=1)
+
+                print(f"{rows:>12,} {latest_ms:>10.2f} {range_ms:>10.2f} "
+                      f"{legacy_latest_ms:>10.2f} {legacy_range_ms:>10.2f}")
+        finally:
+            conn.close()
+            manager.close()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    run_benchmark(sizes)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试脚本：对比旧版逐点解码与向量化解码的耗时
+
+用法: python benchmark_decoder.py [每帧采样点数] [重复次数]
+"""
+
+import sys
+import os
+import timeit
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_decoder import decode_payload, legacy_decode_payload, HEADER_WORDS, TRAILER_WORDS
+
+
+def make_payload(samples, seed=0):
+    """生成带帧头帧尾的模拟负载"""
+    rng = np.random.default_rng(seed)
+    words = rng.integers(0, 4096, size=samples + HEADER_WORDS + TRAILER_WORDS, dtype=np.uint16)
+    return words.astype('>u2').tobytes()
+
+
+def run_benchmark(samples=500, repeat=2000):
+    """运行基准测试并打印结果"""
+    payload = make_payload(samples)
+
+    legacy_time = min(timeit.repeat(lambda: legacy_decode_payload(payload), number=repeat, repeat=3))
+    vector_time = min(timeit.repeat(lambda: decode_payload(payload), number=repeat, repeat=3))
+
+    legacy_us = legacy_time / repeat * 1e6
+    vector_us = vector_time / repeat * 1e6
+
+    print(f"=== 负载解码基准测试 ({samples}个采样点, {repeat}次) ===")
+    print(f"旧版逐点解码: {legacy_us:10.2f} us/帧")
+    print(f"向量化解码:   {vector_us:10.2f} us/帧")
+    print(f"加速比:       {legacy_us / vector_us:10.1f} x")
+
+    # 校验两种实现结果一致（旧版保留两位小数）
+    legacy = np.array(legacy_decode_payload(payload))
+    vector = decode_payload(payload)
+    max_diff = float(np.max(np.abs(legacy - vector))) if len(vector) else 0.0
+    print(f"最大偏差:     {max_diff:10.4f} V (旧版四舍五入到0.01)")
+
+    return legacy_us, vector_us
+
+
+if __name__ == "__main__":
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    run_benchmark(samples, repeat)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周期数据缓冲模块：固定容量的二维环形缓冲区
+
+每一行保存一个工频周期的采样数据，追加为O(1)，
+并且任意"最近N个周期"都可以以零拷贝视图的形式取出。
+另外提供按相位×幅值分箱、随周期增量更新的PRPD密度统计。
+"""
+
+import numpy as np
+
+
+def resample_cycle(cycle, width, dtype=np.float32):
+    """将一个周期的数据按相位线性插值到指定点数
+
+    Args:
+        cycle: 一维数组或列表
+        width: 目标点数
+        dtype: 返回的数据类型
+
+    Returns:
+        np.ndarray: 长度为width的数组，点数相同时不拷贝
+    """
+    cycle = np.asarray(cycle, dtype=dtype)
+    if len(cycle) == width:
+        return cycle
+    # 与PRPS绘图一致，按相位线性插值到统一点数
+    source_phase = np.linspace(0, 360, len(cycle))
+    target_phase = np.linspace(0, 360, width)
+    return np.interp(target_phase, source_phase, cycle).astype(dtype)
+
+
+def stack_cycles(cycles, dtype=np.float32):
+    """把多个周期合并为一个矩阵，点数不同时较短的周期末尾填充NaN
+
+    Args:
+        cycles: 周期数据列表
+        dtype: 矩阵的数据类型
+
+    Returns:
+        tuple: (周期数 × 最大点数的矩阵, 每个周期点数的int64数组)
+    """
+    widths = np.fromiter((len(cycle) for cycle in cycles), dtype=np.int64, count=len(cycles))
+    width = int(widths.max()) if len(widths) else 0
+    if len(widths) and (widths == width).all():
+        return np.array(cycles, dtype=dtype).reshape(len(cycles), width), widths
+    matrix = np.full((len(cycles), width), np.nan, dtype=dtype)
+    for i, cycle in enumerate(cycles):
+        matrix[i, :len(cycle)] = cycle
+    return matrix, widths
+
+
+class CycleRingBuffer:
+    """固定容量的周期环形缓冲区（周期数 × 相位点数）
+
+    内部使用双倍长度的存储，每个周期同时写入i和i+capacity两个位置，
+    因此最近N个周期在存储中总是连续的，可以直接返回切片视图。
+    """
+
+    def __init__(self, capacity, width=None, dtype=np.float32):
+        """初始化缓冲区
+
+        Args:
+            capacity: 最多保存的周期数
+            width: 每个周期的相位点数，为None时由第一个追加的周期决定
+            dtype: 数据类型
+        """
+        self.dtype = np.dtype(dtype)
+        self._capacity = max(1, int(capacity))
+        self._width = None
+        self._storage = None
+        self._head = 0  # 下一个写入位置
+        self._size = 0  # 当前保存的周期数
+        self.appended = 0  # 自创建或清空以来追加的周期总数
+        if width is not None:
+            self._allocate(int(width))
+
+    def _allocate(self, width):
+        """按当前容量和宽度分配存储"""
+        self._width = width
+        self._storage = np.zeros((2 * self._capacity, width), dtype=self.dtype)
+        self._head = 0
+        self._size = 0
+
+    @property
+    def capacity(self):
+        """最多保存的周期数"""
+        return self._capacity
+
+    @property
+    def width(self):
+        """每个周期的相位点数"""
+        return self._width or 0
+
+    @property
+    def total_points(self):
+        """当前保存的数据点总数"""
+        return self._size * self.width
+
+    def __len__(self):
+        return self._size
+
+    def _fit_width(self, cycle):
+        """将周期数据重采样到缓冲区宽度"""
+        return resample_cycle(cycle, self._width, self.dtype)
+
+    def append(self, cycle):
+        """追加一个周期，缓冲区满时覆盖最早的周期
+
+        Args:
+            cycle: 一维数组或列表
+        """
+        if len(cycle) == 0:
+            return
+        if self._storage is None:
+            self._allocate(len(cycle))
+
+        row = self._fit_width(cycle)
+        self._storage[self._head] = row
+        self._storage[self._head + self._capacity] = row
+        self._head = (self._head + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+        self.appended += 1
+
+    def extend(self, cycles):
+        """依次追加多个周期"""
+        for cycle in cycles:
+            self.append(cycle)
+
+    def last(self, n=None):
+        """获取最近n个周期的只读视图，按时间从早到晚排列
+
+        Args:
+            n: 周期数，为None时返回全部
+
+        Returns:
+            np.ndarray: 形状为(n, width)的视图，缓冲区未写入过数据时返回空数组
+        """
+        if self._storage is None:
+            return np.empty((0, 0), dtype=self.dtype)
+        n = self._size if n is None else max(0, min(int(n), self._size))
+        # 最新的周期位于head-1，连同其镜像副本，[head+capacity-n, head+capacity)总是连续的
+        end = self._head + self._capacity
+        view = self._storage[end - n:end]
+        view.flags.writeable = False
+        return view
+
+    def snapshot(self, n=None):
+        """获取最近n个周期的拷贝，用于跨线程或长时间持有"""
+        return np.array(self.last(n))
+
+    def resize(self, capacity):
+        """修改容量，保留最新的周期
+
+        Args:
+            capacity: 新的最多保存周期数
+        """
+        capacity = max(1, int(capacity))
+        if capacity == self._capacity:
+            return
+        if self._storage is None:
+            self._capacity = capacity
+            return
+
+        keep = self.snapshot(min(self._size, capacity))
+        appended = self.appended
+        self._capacity = capacity
+        self._allocate(self._width)
+        self.extend(keep)
+        self.appended = appended
+
+    def clear(self):
+        """清空缓冲区，保留容量，下一个追加的周期重新决定宽度"""
+        self._width = None
+        self._storage = None
+        self._head = 0
+        self._size = 0
+        self.appended = 0
+
+
+class PhaseAmplitudeHistogram:
+    """最近N个周期的相位×幅值二维计数矩阵
+
+    每个周期到达时只把它的采样点加到对应的分箱中，
+    窗口已满时再减去被挤出窗口的最早周期，因此更新代价与窗口大小无关。
+    每个周期的分箱下标保存在环形缓冲区中，用于之后从计数中减去。
+    """
+
+    def __init__(self, window, amplitude_range, phase_bins=180, amplitude_bins=100):
+        """初始化统计
+
+        Args:
+            window: 统计的最近周期数
+            amplitude_range: 幅值范围(最小值, 最大值)，超出范围的采样点不计数
+            phase_bins: 相位方向的分箱数（覆盖0-360度）
+            amplitude_bins: 幅值方向的分箱数
+        """
+        self.amplitude_range = (float(amplitude_range[0]), float(amplitude_range[1]))
+        self.phase_bins = int(phase_bins)
+        self.amplitude_bins = int(amplitude_bins)
+        # 最后一个位置用于收集超出幅值范围的采样点，不参与显示
+        self._flat_counts = np.zeros(self.amplitude_bins * self.phase_bins + 1, dtype=np.int32)
+        self._indices = CycleRingBuffer(window, dtype=np.int32)
+
+    @property
+    def window(self):
+        """统计的最近周期数"""
+        return self._indices.capacity
+
+    @property
+    def counts(self):
+        """计数矩阵视图，形状为(幅值分箱数, 相位分箱数)，第0行对应幅值下限"""
+        return self._flat_counts[:-1].reshape(self.amplitude_bins, self.phase_bins)
+
+    def __len__(self):
+        return len(self._indices)
+
+    def _bin_indices(self, cycle):
+        """计算一个周期各采样点所在分箱的一维下标"""
+        if self._indices.width:
+            cycle = resample_cycle(cycle, self._indices.width, np.float64)
+        else:
+            cycle = np.asarray(cycle, dtype=np.float64)
+
+        width = len(cycle)
+        phase_index = np.arange(width) * self.phase_bins // width
+
+        low, high = self.amplitude_range
+        scaled = (cycle - low) * (self.amplitude_bins / (high - low))
+        amplitude_index = np.floor(scaled).astype(np.int64)
+        # 正好等于上限的采样点计入最高一格
+        amplitude_index[cycle == high] = self.amplitude_bins - 1
+
+        flat = amplitude_index * self.phase_bins + phase_index
+        outside = (amplitude_index < 0) | (amplitude_index >= self.amplitude_bins)
+        flat[outside] = len(self._flat_counts) - 1
+        return flat
+
+    def append(self, cycle):
+        """追加一个周期，窗口已满时减去最早的周期
+
+        Args:
+            cycle: 一维数组或列表
+        """
+        if len(cycle) == 0:
+            return
+        indices = self._bin_indices(cycle)
+        if len(self._indices) == self._indices.capacity:
+            np.subtract.at(self._flat_counts, self._indices.last()[0], 1)
+        np.add.at(self._flat_counts, indices, 1)
+        self._indices.append(indices)
+
+    def extend(self, cycles):
+        """依次追加多个周期"""
+        for cycle in cycles:
+            self.append(cycle)
+
+    def rebuild(self, cycles, window=None):
+        """清空后按给定周期重新统计
+
+        Args:
+            cycles: 周期数据二维数组，只统计其中最近window个周期
+            window: 新的统计周期数，为None时保持不变
+        """
+        if window is not None:
+            self._indices.resize(window)
+        self.clear()
+        self.extend(cycles[-self.window:])
+
+    def clear(self):
+        """清空计数"""
+        self._flat_counts[:] = 0
+        self._indices.clear()
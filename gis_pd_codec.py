@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周期数据编码模块：数据库中周期数据的二进制格式
+
+每个周期编码为一个BLOB：固定长度的小端帧头，后面紧跟采样数据。
+帧头包含魔数、格式版本、数据类型、采样点数和缩放系数：
+    魔数(4字节 b'PDCY') | 版本(uint8) | 数据类型(uint8) | 保留(uint16) | 点数(uint32) | 缩放系数(float64)
+实时数据以uint16 ADC码值存储（值 = 码值 × 缩放系数），
+无法精确表示为码值的数据（例如从旧文本迁移的数据）以float32存储。
+旧版本以逗号分隔的十进制文本同样可以读取。
+
+连续的多个周期还可以打包为一个压缩块（见encode_cycle_block）。
+"""
+
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+from gis_pd_decoder import ADC_SCALE
+
+CYCLE_MAGIC = b'PDCY'
+CYCLE_FORMAT_VERSION = 1
+CYCLE_HEADER = struct.Struct('<4sBBHId')
+
+# 数据类型编号
+DTYPE_UINT16 = 1
+DTYPE_FLOAT32 = 2
+CYCLE_DTYPES = {
+    DTYPE_UINT16: np.dtype('<u2'),
+    DTYPE_FLOAT32: np.dtype('<f4'),
+}
+
+
+def encode_cycle_codes(codes, scale=ADC_SCALE):
+    """将ADC码值编码为uint16格式
+
+    Args:
+        codes: 整数码值数组
+        scale: 每个码值对应的数值
+
+    Returns:
+        bytes: 帧头加uint16数据
+    """
+    codes = np.asarray(codes, dtype=CYCLE_DTYPES[DTYPE_UINT16])
+    header = CYCLE_HEADER.pack(CYCLE_MAGIC, CYCLE_FORMAT_VERSION, DTYPE_UINT16, 0, len(codes), scale)
+    return header + codes.tobytes()
+
+
+def encode_cycle_float32(values):
+    """将数值编码为float32格式
+
+    Args:
+        values: 一维数组或列表
+
+    Returns:
+        bytes: 帧头加float32数据
+    """
+    values = np.asarray(values, dtype=CYCLE_DTYPES[DTYPE_FLOAT32])
+    header = CYCLE_HEADER.pack(CYCLE_MAGIC, CYCLE_FORMAT_VERSION, DTYPE_FLOAT32, 0, len(values), 1.0)
+    return header + values.tobytes()
+
+
+def encode_cycle(values, scale=ADC_SCALE):
+    """编码一个周期，能无损还原为ADC码值时使用uint16，否则使用float32
+
+    Args:
+        values: 周期数据（电压值）
+        scale: ADC码值对应的数值
+
+    Returns:
+        bytes: 编码后的BLOB
+    """
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.rint(values / scale)
+    if (len(codes) and codes.min() >= 0 and codes.max() <= 0xFFFF
+            and np.allclose(codes * scale, values, rtol=0, atol=scale * 1e-3)):
+        return encode_cycle_codes(codes, scale)
+    return encode_cycle_float32(values)
+
+
+def is_binary_cycle(blob):
+    """判断数据库中的值是否为二进制格式"""
+    return (isinstance(blob, (bytes, bytearray, memoryview))
+            and bytes(blob[:len(CYCLE_MAGIC)]) == CYCLE_MAGIC)
+
+
+def decode_cycle(blob):
+    """将数据库中的周期数据解码为float32数组
+
+    Args:
+        blob: 二进制BLOB、旧版逗号分隔文本（str或bytes）或数组
+
+    Returns:
+        np.ndarray: float32数组
+    """
+    if isinstance(blob, np.ndarray):
+        return blob.astype(np.float32, copy=False)
+
+    if is_binary_cycle(blob):
+        magic, version, dtype_code, _, count, scale = CYCLE_HEADER.unpack_from(blob)
+        if version != CYCLE_FORMAT_VERSION or dtype_code not in CYCLE_DTYPES:
+            raise ValueError(f"不支持的周期数据格式: 版本{version}, 数据类型{dtype_code}")
+        samples = np.frombuffer(blob, dtype=CYCLE_DTYPES[dtype_code], count=count,
+                                offset=CYCLE_HEADER.size)
+        if dtype_code == DTYPE_UINT16:
+            return np.multiply(samples, np.float32(scale), dtype=np.float32)
+        return samples.astype(np.float32)
+
+    # 旧版逗号分隔的十进制文本
+    if isinstance(blob, (bytes, bytearray, memoryview)):
+        blob = bytes(blob).decode('ascii')
+    if not blob:
+        return np.empty(0, dtype=np.float32)
+    return np.array(blob.split(','), dtype=np.float32)
+
+
+def format_cycle_preview(values, count=10):
+    """生成前count个点的预览文本"""
+    preview = ','.join(str(value) for value in values[:count])
+    if len(values) > count:
+        preview += "..."
+    return preview
+
+
+# 周期块格式
+# 魔数(4字节 b'PDBK') | 版本(uint8) | 压缩方式(uint8) | 变换(uint8) | 数据类型(uint8) |
+# 周期数(uint32) | 每周期点数(uint32) | 缩放系数(float64)，之后为压缩后的数据：
+# 时间戳差分(int64 × 周期数) | 周期编号(int32 × 周期数) | 变换后的采样数据
+BLOCK_MAGIC = b'PDBK'
+BLOCK_FORMAT_VERSION = 1
+BLOCK_HEADER = struct.Struct('<4sBBBBIId')
+
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+BLOCK_COMPRESSIONS = {
+    "zlib": COMPRESSION_ZLIB,
+    "lzma": COMPRESSION_LZMA,
+}
+
+# 相邻周期之间的变换：码值取差分，float32按位异或，变化小的数据大部分字节为0，压缩率更高
+TRANSFORM_DELTA = 1
+TRANSFORM_XOR = 2
+
+
+def _compress(data, compression):
+    """按压缩方式编号压缩数据"""
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(data, 6)
+    return lzma.compress(data, preset=6)
+
+
+def _decompress(data, compression):
+    """按压缩方式编号解压数据"""
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_LZMA:
+        return lzma.decompress(data)
+    raise ValueError(f"不支持的压缩方式: {compression}")
+
+
+def encode_cycle_block(timestamps_us, cycle_numbers, cycles, compression="zlib", scale=ADC_SCALE):
+    """将连续的多个周期编码为一个压缩块
+
+    Args:
+        timestamps_us: 每个周期的时间戳（微秒整数）
+        cycle_numbers: 每个周期的编号
+        cycles: 周期数据二维数组（周期数 × 每周期点数）
+        compression: "zlib"或"lzma"
+        scale: ADC码值对应的数值
+
+    Returns:
+        bytes: 编码后的块
+    """
+    if compression not in BLOCK_COMPRESSIONS:
+        raise ValueError(f"不支持的压缩方式: {compression}")
+    compression_code = BLOCK_COMPRESSIONS[compression]
+
+    values = np.asarray(cycles, dtype=np.float64)
+    count, width = values.shape
+    codes = np.rint(values / scale)
+    if (values.size and codes.min() >= 0 and codes.max() <= 0xFFFF
+            and np.allclose(codes * scale, values, rtol=0, atol=scale * 1e-3)):
+        samples = codes.astype(CYCLE_DTYPES[DTYPE_UINT16])
+        samples[1:] = samples[1:] - samples[:-1]  # uint16按模2^16回绕，可以无损还原
+        transform, dtype_code = TRANSFORM_DELTA, DTYPE_UINT16
+    else:
+        bits = values.astype(CYCLE_DTYPES[DTYPE_FLOAT32]).view('<u4')
+        samples = bits.copy()
+        samples[1:] ^= bits[:-1]
+        transform, dtype_code, scale = TRANSFORM_XOR, DTYPE_FLOAT32, 1.0
+
+    timestamps = np.asarray(timestamps_us, dtype='<i8')
+    timestamp_deltas = timestamps.copy()
+    timestamp_deltas[1:] = np.diff(timestamps)
+
+    body = (timestamp_deltas.tobytes() + np.asarray(cycle_numbers, dtype='<i4').tobytes()
+            + samples.tobytes())
+    header = BLOCK_HEADER.pack(BLOCK_MAGIC, BLOCK_FORMAT_VERSION, compression_code, transform,
+                               dtype_code, count, width, scale)
+    return header + _compress(body, compression_code)
+
+
+def decode_cycle_block(blob):
+    """解码周期块
+
+    Args:
+        blob: encode_cycle_block生成的数据
+
+    Returns:
+        tuple: (时间戳int64数组, 周期编号int64数组, float32二维数组)
+    """
+    magic, version, compression, transform, dtype_code, count, width, scale = BLOCK_HEADER.unpack_from(blob)
+    if magic != BLOCK_MAGIC or version != BLOCK_FORMAT_VERSION:
+        raise ValueError(f"不支持的周期块格式: 版本{version}")
+
+    body = _decompress(bytes(blob[BLOCK_HEADER.size:]), compression)
+    timestamps = np.cumsum(np.frombuffer(body, dtype='<i8', count=count))
+    offset = 8 * count
+    cycle_numbers = np.frombuffer(body, dtype='<i4', count=count, offset=offset).astype(np.int64)
+    offset += 4 * count
+
+    if transform == TRANSFORM_DELTA:
+        deltas = np.frombuffer(body, dtype='<u2', count=count * width, offset=offset).reshape(count, width)
+        codes = np.cumsum(deltas, axis=0, dtype=np.uint16)
+        values = np.multiply(codes, np.float32(scale), dtype=np.float32)
+    elif transform == TRANSFORM_XOR:
+        xored = np.frombuffer(body, dtype='<u4', count=count * width, offset=offset).reshape(count, width)
+        values = np.bitwise_xor.accumulate(xored, axis=0).view('<f4').astype(np.float32)
+    else:
+        raise ValueError(f"不支持的周期块变换: {transform}")
+    return timestamps, cycle_numbers, values
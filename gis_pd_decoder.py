@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MQTT负载解码模块：将传感器上报的二进制负载解析为周期采样数据
+
+负载格式为连续的大端16位ADC码值，前4个字为帧头，最后1个字为帧尾，
+中间部分为一个工频周期内的有效采样点。
+"""
+
+import numpy as np
+
+# ADC参数
+ADC_REF_VOLTAGE = 3.3  # 参考电压
+ADC_FULL_SCALE = 4096  # 12位ADC满量程
+ADC_SCALE = ADC_REF_VOLTAGE / ADC_FULL_SCALE  # 每个码值对应的电压
+
+# 帧结构
+HEADER_WORDS = 4  # 帧头字数
+TRAILER_WORDS = 1  # 帧尾字数
+
+# 大端无符号16位
+PAYLOAD_DTYPE = np.dtype('>u2')
+
+
+def decode_payload_codes(payload):
+    """将负载解析为ADC码值，不做任何拷贝
+
+    Args:
+        payload: MQTT消息负载（bytes、bytearray或memoryview）
+
+    Returns:
+        np.ndarray: 去掉帧头帧尾后的大端uint16只读视图
+    """
+    word_count = len(payload) // 2  # 奇数长度时忽略最后一个不完整的字节
+    if word_count <= HEADER_WORDS + TRAILER_WORDS:
+        return np.empty(0, dtype=PAYLOAD_DTYPE)
+
+    codes = np.frombuffer(payload, dtype=PAYLOAD_DTYPE, count=word_count)
+    return codes[HEADER_WORDS:word_count - TRAILER_WORDS]
+
+
+def decode_payload(payload):
+    """将负载解析为电压值
+
+    Args:
+        payload: MQTT消息负载（bytes、bytearray或memoryview）
+
+    Returns:
+        np.ndarray: float32电压数组，长度为有效采样点数
+    """
+    codes = decode_payload_codes(payload)
+    # 一次向量化运算完成码值到电压的转换，直接输出float32
+    return np.multiply(codes, np.float32(ADC_SCALE), dtype=np.float32)
+
+
+def legacy_decode_payload(payload):
+    """旧版逐点解码实现，仅用于基准测试和结果对照
+
+    Args:
+        payload: MQTT消息负载
+
+    Returns:
+        list: 保留两位小数的电压值列表
+    """
+    hex_message = payload.hex()
+    results = []
+    for i in range(0, len(hex_message), 4):  # 每4个字符解析为一个16进制数
+        if i + 4 <= len(hex_message):
+            hex_value = hex_message[i:i+4]
+            decimal_value = int(hex_value, 16)
+            converted_value = decimal_value * 3.3 / 4096
+            results.append(round(converted_value, 2))  # 保留两位小数
+    return results[4:-1]  # 去掉前4个和最后一个数据
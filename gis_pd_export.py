@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导出模块：把数据库中的历史周期分批写入CSV、压缩的.npz或分块列式二进制文件
+
+数据按批（时间戳、周期编号、NaN补齐的周期矩阵、每个周期的点数）写入，
+每批写完即释放，内存占用与导出的周期数无关。导出先写入临时文件，
+完成后再改名为目标文件，取消或出错时删除临时文件。幅值单位为毫伏。
+
+分块列式文件（.gpdc）的格式：文件头COLUMNAR_MAGIC，之后每批为
+COLUMNAR_CHUNK_HEADER（周期数、最大点数），再依次是int64时间戳（微秒）、
+int64周期编号、uint32点数和float32周期矩阵（周期数 × 最大点数，按行存放），均为小端序。
+"""
+
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+from gis_pd_storage import us_to_timestamp
+
+EXPORT_FORMATS = ("csv", "npz", "columnar")
+EXPORT_EXTENSIONS = {"csv": ".csv", "npz": ".npz", "columnar": ".gpdc"}
+EXPORT_CHUNK_ROWS = 2000  # 每批读取和写入的周期数
+
+COLUMNAR_MAGIC = b"GPDCOL01"
+COLUMNAR_CHUNK_HEADER = struct.Struct("<II")  # 周期数、最大点数
+
+
+def export_format_for(path):
+    """按扩展名判断导出格式，无法识别时返回None"""
+    extension = os.path.splitext(path)[1].lower()
+    for name, known in EXPORT_EXTENSIONS.items():
+        if extension == known:
+            return name
+    return None
+
+
+class ExportWriter:
+    """导出文件的基类：写入临时文件，close时改名为目标文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = path + ".part"
+        self.count = 0  # 已写入的周期数
+
+    def write_chunk(self, timestamps_us, cycle_numbers, cycles, widths):
+        """写入一批周期
+
+        Args:
+            timestamps_us: int64微秒时间戳数组
+            cycle_numbers: int64周期编号数组
+            cycles: 周期矩阵（周期数 × 最大点数），点数不足的周期末尾为NaN
+            widths: 每个周期的点数
+        """
+        self._write_chunk(np.asarray(timestamps_us, dtype=np.int64), np.asarray(cycle_numbers, dtype=np.int64),
+                          np.asarray(cycles, dtype=np.float32), np.asarray(widths, dtype=np.int64))
+        self.count += len(widths)
+
+    def close(self):
+        """写完剩余内容并改名为目标文件"""
+        self._close()
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        """放弃导出，删除临时文件"""
+        try:
+            self._close()
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+    def _write_chunk(self, timestamps_us, cycle_numbers, cycles, widths):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+
+class CsvExportWriter(ExportWriter):
+    """CSV：每行为时间戳文本、周期编号和该周期的全部数据点"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.file = open(self.temp_path, "w", newline="", encoding="utf-8")
+        self.file.write("timestamp,cycle_number,data_mv\n")
+        self._row_formats = {}  # 按点数缓存每行的格式字符串
+
+    def _write_chunk(self, timestamps_us, cycle_numbers, cycles, widths):
+        lines = []
+        for timestamp_us, cycle_number, cycle, width in zip(timestamps_us.tolist(), cycle_numbers.tolist(),
+                                                            cycles, widths.tolist()):
+            row_format = self._row_formats.get(width)
+            if row_format is None:
+                row_format = self._row_formats[width] = "%s,%d" + ",%.6g" * width + "\n"
+            lines.append(row_format % ((us_to_timestamp(timestamp_us), cycle_number) + tuple(cycle[:width].tolist())))
+        self.file.write("".join(lines))
+
+    def _close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class NpzExportWriter(ExportWriter):
+    """压缩的.npz：每批保存为timestamps_us_NNNNNN、cycle_numbers_NNNNNN、widths_NNNNNN和cycles_NNNNNN四个数组
+
+    每个数组直接流式写入zip条目，不需要先在内存中拼接全部数据；用iter_export_chunks按批读取。
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.zip_file = zipfile.ZipFile(self.temp_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        self.chunk_index = 0
+
+    def _write_chunk(self, timestamps_us, cycle_numbers, cycles, widths):
+        for name, array in (("timestamps_us", timestamps_us), ("cycle_numbers", cycle_numbers),
+                            ("widths", widths), ("cycles", cycles)):
+            with self.zip_file.open(f"{name}_{self.chunk_index:06d}.npy", "w", force_zip64=True) as entry:
+                np.lib.format.write_array(entry, np.ascontiguousarray(array), allow_pickle=False)
+        self.chunk_index += 1
+
+    def _close(self):
+        if self.zip_file.fp is not None:
+            self.zip_file.close()
+
+
+class ColumnarExportWriter(ExportWriter):
+    """分块列式二进制文件（.gpdc），格式见模块说明"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.file = open(self.temp_path, "wb")
+        self.file.write(COLUMNAR_MAGIC)
+
+    def _write_chunk(self, timestamps_us, cycle_numbers, cycles, widths):
+        self.file.write(COLUMNAR_CHUNK_HEADER.pack(len(widths), cycles.shape[1] if cycles.ndim == 2 else 0))
+        self.file.write(timestamps_us.astype("<i8").tobytes())
+        self.file.write(cycle_numbers.astype("<i8").tobytes())
+        self.file.write(widths.astype("<u4").tobytes())
+        self.file.write(cycles.astype("<f4").tobytes())
+
+    def _close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+EXPORT_WRITERS = {"csv": CsvExportWriter, "npz": NpzExportWriter, "columnar": ColumnarExportWriter}
+
+
+def open_export_writer(path, export_format=None):
+    """创建导出文件
+
+    Args:
+        path: 目标文件路径
+        export_format: EXPORT_FORMATS之一，为None时按扩展名判断
+
+    Raises:
+        ValueError: 无法确定导出格式
+    """
+    export_format = export_format or export_format_for(path)
+    if export_format not in EXPORT_WRITERS:
+        raise ValueError(f"不支持的导出格式: {export_format}")
+    return EXPORT_WRITERS[export_format](path)
+
+
+def export_cycles(chunks, writer, progress=None, cancelled=None):
+    """把分批的周期写入导出文件
+
+    Args:
+        chunks: 产生(时间戳, 周期编号, 周期矩阵, 点数)的可迭代对象
+        writer: ExportWriter
+        progress: 每批写入后以已写入的周期数调用，可为None
+        cancelled: 返回True时停止导出的函数，可为None
+
+    Returns:
+        bool: 是否完成导出；取消或出错时临时文件已删除
+    """
+    try:
+        for chunk in chunks:
+            if cancelled is not None and cancelled():
+                writer.abort()
+                return False
+            writer.write_chunk(*chunk)
+            if progress is not None:
+                progress(writer.count)
+        writer.close()
+        return True
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def iter_export_chunks(path):
+    """按批读取.npz或.gpdc导出文件
+
+    Yields:
+        tuple: (时间戳, 周期编号, 周期矩阵, 点数)
+    """
+    if export_format_for(path) == "npz":
+        with np.load(path) as archive:
+            chunk_count = sum(1 for name in archive.files if name.startswith("cycles_"))
+            for index in range(chunk_count):
+                yield tuple(archive[f"{name}_{index:06d}"]
+                            for name in ("timestamps_us", "cycle_numbers", "cycles", "widths"))
+        return
+
+    with open(path, "rb") as file:
+        if file.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"不是列式导出文件: {path}")
+        while True:
+            header = file.read(COLUMNAR_CHUNK_HEADER.size)
+            if not header:
+                return
+            rows, width = COLUMNAR_CHUNK_HEADER.unpack(header)
+            timestamps_us = np.frombuffer(file.read(rows * 8), dtype="<i8")
+            cycle_numbers = np.frombuffer(file.read(rows * 8), dtype="<i8")
+            widths = np.frombuffer(file.read(rows * 4), dtype="<u4").astype(np.int64)
+            cycles = np.frombuffer(file.read(rows * width * 4), dtype="<f4").reshape(rows, width)
+            yield timestamps_us, cycle_numbers, cycles, widths
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+细节层次（LOD）模块：绘制PRPD散点图前按相位像素列抽稀采样点
+
+最近max_cycles个周期的全部采样点大多在同一像素上重叠，绘制时间却与点数成正比。
+抽稀后每个相位像素列只保留少量点，点数由PRPD图的像素宽度决定，与周期数无关：
+- "minmax"：每列保留最小值和最大值，保留幅值包络；
+- "lttb"：按相位排列后用最大三角形三桶算法（LTTB）选取点，保留局部峰值。
+高于阈值的采样点（局放脉冲）全部保留，不参与抽稀，因此不会丢失放电脉冲。
+幅值与输入周期数据的单位相同（毫伏）。
+"""
+
+import numpy as np
+
+from gis_pd_render_cache import shared_cache
+from gis_pd_rollups import PULSE_THRESHOLD
+
+LOD_METHODS = ("none", "minmax", "lttb")
+LOD_METHOD_LABELS = {"none": "关闭", "minmax": "最小/最大值", "lttb": "LTTB"}
+DEFAULT_LOD_METHOD = "minmax"
+DEFAULT_LOD_THRESHOLD = PULSE_THRESHOLD  # 高于阈值的采样点全部保留
+POINTS_PER_COLUMN = 2  # 每个相位像素列保留的点数（不含脉冲）
+
+
+def lttb(x, y, n_out):
+    """最大三角形三桶算法（Largest-Triangle-Three-Buckets）
+
+    保留首尾两点，其余点均分为n_out-2个桶，每个桶选取与上一个选中点、
+    下一个桶的平均点组成的三角形面积最大的点。
+
+    Args:
+        x: 按顺序排列的横坐标
+        y: 纵坐标
+        n_out: 保留的点数
+
+    Returns:
+        np.ndarray: 选中点的下标（递增）
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out-1个边界把下标[1, n-1)分为n_out-2个桶，每个桶至少一个点
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # 面积的2倍，只用于比较大小
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def _column_envelope(cycles, phases, columns, pulses):
+    """每个相位像素列中非脉冲采样点的最小值和最大值
+
+    Returns:
+        tuple: (相位, 幅值)，不含全部为脉冲的列
+    """
+    lows = np.where(pulses, np.inf, cycles).min(axis=0)
+    highs = np.where(pulses, -np.inf, cycles).max(axis=0)
+
+    # 相位点按所在像素列分组，点数不超过列数时每个相位点为一组
+    width = len(phases)
+    column = np.arange(width) * columns // width
+    starts = np.flatnonzero(np.r_[True, column[1:] != column[:-1]])
+    sizes = np.diff(np.r_[starts, width])
+    # 同一列内的相位差小于一个像素，取列内的平均相位
+    column_phases = np.add.reduceat(phases, starts) / sizes
+    lows = np.minimum.reduceat(lows, starts)
+    highs = np.maximum.reduceat(highs, starts)
+
+    valid = np.isfinite(lows)
+    x = np.concatenate((column_phases[valid], column_phases[valid]))
+    y = np.concatenate((lows[valid], highs[valid]))
+    return x, y
+
+
+def decimate_prpd(cycles, columns, threshold=DEFAULT_LOD_THRESHOLD, method=DEFAULT_LOD_METHOD):
+    """抽稀PRPD散点图的采样点
+
+    Args:
+        cycles: 周期数据二维数组（周期数 × 相位点数），相位均匀分布在0到360度
+        columns: PRPD图的像素宽度
+        threshold: 高于此值的采样点全部保留
+        method: LOD_METHODS之一，"none"时不抽稀
+
+    Returns:
+        tuple: (相位数组, 幅值数组)
+    """
+    cycles = np.asarray(cycles)
+    count, width = cycles.shape
+    phases = shared_cache.phase_axis(width)
+    budget = POINTS_PER_COLUMN * max(1, int(columns))
+    if method == "none" or cycles.size <= budget:
+        return shared_cache.phase_tile(width, count), cycles.ravel()
+    if method not in LOD_METHODS:
+        raise ValueError(f"未知的抽稀方法: {method}")
+
+    pulses = cycles > threshold
+    pulse_rows, pulse_columns = np.nonzero(pulses)
+    pulse_x = phases[pulse_columns]
+    pulse_y = cycles[pulse_rows, pulse_columns]
+
+    if method == "lttb":
+        # 按相位排列（同一相位内按周期顺序），去掉脉冲后再选点
+        keep = ~pulses.T.ravel()
+        x = np.repeat(phases, count)[keep]
+        y = cycles.T.ravel()[keep]
+        selected = lttb(x, y, budget)
+        x, y = x[selected], y[selected]
+    else:
+        x, y = _column_envelope(cycles, phases, columns, pulses)
+
+    return np.concatenate((x, pulse_x)), np.concatenate((y, pulse_y)).astype(cycles.dtype, copy=False)
@@ -11,19 +11,41 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                               QHBoxLayout, QLabel, QLineEdit, QPushButton,
                               QGroupBox, QGridLayout, QSpinBox, QComboBox,
                               QStatusBar, QMessageBox, QCheckBox,
-                              QTableWidget, QTableWidgetItem, QDialog, QDateTimeEdit,
-                              QScrollArea, QFileDialog, QTabWidget, QSplitter, QToolBar, QStyle)
-from PySide6.QtCore import Qt, QTimer, Signal, Slot, QThread, QMutex, QDateTime, QSize
-from PySide6.QtGui import QAction, QIcon, QActionGroup
+                              QTableWidget, QTableWidgetItem, QTableView, QDialog, QDateTimeEdit,
+                              QScrollArea, QFileDialog, QTabWidget, QSplitter, QToolBar, QStyle,
+                              QProgressBar, QStackedWidget)
+from PySide6.QtCore import (Qt, QTimer, Signal, Slot, QThread, QMutex, QDateTime, QSize,
+                            QAbstractTableModel, QModelIndex, QEvent)
+from PySide6.QtGui import QAction, QIcon, QActionGroup, QImage, QPainter
 from matplotlib import rcParams
 from mpl_toolkits.mplot3d import Axes3D
 import time
 import queue
 import sqlite3
+import threading
+import warnings
 import os
 import datetime
 import csv  # 导入csv模块用于保存CSV文件
 import io
+from gis_pd_decoder import decode_payload
+from gis_pd_codec import encode_cycle, decode_cycle, decode_cycle_block, format_cycle_preview
+from gis_pd_units import mv_to_dbm, dbm_to_mv, to_display_unit
+from gis_pd_storage import (DatabaseWriter, PartitionLayout, configure_connection, open_read_connection,
+                            expand_cycle_block, expand_raw_cycles, raw_payload_bytes, create_schema,
+                            read_table_counts, now_timestamp, timestamp_to_us, us_to_timestamp,
+                            COUNTED_TABLES, STORAGE_POLICIES)
+from gis_pd_rollups import (ROLLUP_RESOLUTIONS, MIN_TREND_BUCKETS, choose_resolution, load_rollups,
+                            concat_rollups)
+from gis_pd_buffers import CycleRingBuffer, PhaseAmplitudeHistogram, resample_cycle, stack_cycles
+from gis_pd_render import (IncrementalPRPDRenderer, IncrementalPRPSRenderer, OffscreenFrameRenderer, FrameSnapshot,
+                           INCREMENTAL_PRPD_TYPES, PRPD_AXES_POSITION, PRPS_AXES_POSITION, PRPS_BOX_ASPECT,
+                           PRPS_VIEW_TYPES, WATERFALL_PRPS_TYPES, WaterfallPRPSRenderer, PRPSPanelBlitter,
+                           prpd_phase_columns)
+from gis_pd_scheduler import FrameScheduler, FRAME_VIEWS, DEFAULT_MIN_INTERVAL_MS, DEFAULT_MAX_INTERVAL_MS
+from gis_pd_render_cache import shared_cache
+from gis_pd_lod import LOD_METHODS, LOD_METHOD_LABELS, DEFAULT_LOD_METHOD, DEFAULT_LOD_THRESHOLD, decimate_prpd
+from gis_pd_export import EXPORT_CHUNK_ROWS, EXPORT_EXTENSIONS, export_cycles, open_export_writer
 
 # 设置matplotlib中文支持
 rcParams['font.sans-serif'] = ['SimHei']  # 设置中文字体支持
@@ -35,9 +57,35 @@ matplotlib.rcParams['path.simplify_threshold'] = 1.0
 matplotlib.rcParams['agg.path.chunksize'] = 10000
 
 class DatabaseManager:
-    """数据库管理类，负责数据库的连接、创建表和数据存储"""
-    def __init__(self, db_name="gis_pd_data.db"):
-        """初始化数据库连接"""
+    """数据库管理类，负责数据库的连接、创建表和数据存储
+
+    写入由批量写入线程完成；查询使用每个线程各自的只读连接，
+    WAL模式下长时间的查询可以和写入同时进行。
+    分区存储时新数据写入"数据库名_partitions"目录下按天或按小时的文件，
+    查询合并主数据库和时间范围有交集的分区，分区文件在第一次查询时才以只读方式打开。
+    """
+    # 每个线程最多保持打开的分区只读连接数
+    MAX_PARTITION_READERS = 8
+    # 分页查询的游标为(微秒时间戳, 文件序号, 来源序号, 行序号)：文件序号主数据库为0，分区为其起始时间；
+    # 来源序号区分按行存储、只保存原始负载和周期块中的周期；块中周期的行序号为(块id << 20) | 周期序号
+    KEY_MIN = -(1 << 62)
+    KEY_MAX = 1 << 62
+    BLOCK_KEY_BITS = 20
+
+    def __init__(self, db_name="gis_pd_data.db", wal=True, block_cycles=0, partition=None,
+                 retention_days=0, retention_action="delete", storage_policy="both"):
+        """初始化数据库连接
+
+        Args:
+            db_name: 数据库文件名（相对于应用程序目录）
+            wal: 是否使用WAL模式（synchronous=NORMAL），为False时使用SQLite默认的回滚日志
+            block_cycles: 大于0时周期数据按压缩块写入cycle_blocks表，每块包含的周期数
+            partition: "day"或"hour"时按时间分区写入，为None时全部写入主数据库
+            retention_days: 分区保留天数，为0时一直保留
+            retention_action: 过期分区的处理方式，"delete"删除，"compress"打包为周期块
+            storage_policy: 每条消息的保存方式，"raw"只保存原始负载（读取时解码），
+                "decoded"只保存解码后的周期，"both"两者都保存
+        """
         # 数据库文件路径
         try:
             # 获取应用程序根目录
@@ -60,6 +108,18 @@ class DatabaseManager:
         self.conn = None
         self.cursor = None
         self.connected = False
+        self.wal = wal
+        self.writer = None  # 批量写入线程，连接成功后启动
+        self.storage_policy = "both"
+        self.set_storage_policy(storage_policy)
+        self.row_counts = dict.fromkeys(COUNTED_TABLES, 0)  # 启动时的各表计数，之后由写入线程维护
+        db_stem = os.path.splitext(os.path.basename(self.db_path))[0]
+        self.partition = partition
+        self.partition_layout = PartitionLayout(
+            os.path.join(os.path.dirname(self.db_path), f"{db_stem}_partitions"), db_stem, partition or "day")
+        self._local = threading.local()  # 每个线程的只读连接
+        self._readers = []
+        self._readers_lock = threading.Lock()
         
         # 创建数据库连接，使用check_same_thread=False允许在不同线程中使用
         try:
@@ -104,6 +164,15 @@ class DatabaseManager:
             # 创建数据表
             self.create_tables()
             
+            # 周期数据和原始数据由写入线程批量写入，不在GUI线程中提交
+            if self.connected:
+                configure_connection(self.conn, self.wal)
+                self.writer = DatabaseWriter(self.db_path, wal=self.wal, block_cycles=block_cycles,
+                                             row_counts=self.row_counts,
+                                             partitions=self.partition_layout if partition else None,
+                                             retention_days=retention_days, retention_action=retention_action)
+                self.writer.start()
+            
             print(f"数据库连接成功: {self.db_path}")
         except sqlite3.Error as e:
             print(f"数据库连接错误: {str(e)}")
@@ -134,26 +203,16 @@ class DatabaseManager:
                 self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
                 self.cursor = self.conn.cursor()
                 
-            # 创建周期数据表
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS cycle_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    cycle_number INTEGER NOT NULL,
-                    data BLOB NOT NULL
-                )
-            ''')
-            
-            # 创建原始数据表
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS raw_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    broker TEXT NOT NULL,
-                    topic TEXT NOT NULL,
-                    raw_data BLOB NOT NULL
-                )
-            ''')
+            # 创建数据表；旧数据库在这里加列并回填微秒时间戳
+            self.row_counts = create_schema(self.conn)
+            
+            # 已有分区的计数保存在各自的文件中
+            for _, _, path in self.partition_layout.list_partitions():
+                try:
+                    for table, count in read_table_counts(path).items():
+                        self.row_counts[table] += count
+                except sqlite3.Error as e:
+                    print(f"读取分区计数错误: {path}, {str(e)}")
             
             self.conn.commit()
         except sqlite3.Error as e:
@@ -162,42 +221,162 @@ class DatabaseManager:
             self.connected = False
     
     def save_cycle_data(self, cycle_number, data):
-        """保存周期数据"""
+        """保存周期数据（放入写入队列，由写入线程批量提交）
+
+        Returns:
+            bool: 成功放入写入队列返回True，未连接或队列已满时返回False
+        """
         if not self.connected:
-            return
-            
-        try:
-            # 将数据列表转换为字符串存储
-            data_str = ','.join(map(str, data))
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-            
-            self.cursor.execute(
-                "INSERT INTO cycle_data (timestamp, cycle_number, data) VALUES (?, ?, ?)",
-                (timestamp, cycle_number, data_str)
-            )
-            self.conn.commit()
-            return True
-        except sqlite3.Error as e:
-            print(f"保存周期数据错误: {str(e)}")
             return False
+            
+        # 以二进制格式存储（ADC码值加帧头），时间戳取接收时刻而不是写入时刻
+        blob = encode_cycle(data)
+        timestamp, timestamp_us = now_timestamp()
+        return self.writer.submit("cycle_data", (timestamp, timestamp_us, cycle_number, blob))
     
-    def save_raw_data(self, broker, topic, raw_data):
-        """保存原始数据"""
+    def save_raw_data(self, broker, topic, raw_data, cycle_number=None):
+        """保存原始数据（放入写入队列，由写入线程批量提交）
+
+        Args:
+            broker: Broker地址
+            topic: 主题
+            raw_data: MQTT消息负载，以字节保存
+            cycle_number: 只保存原始负载时的周期编号，读取周期数据时解码该行；
+                同时保存了解码后的周期时为None
+
+        Returns:
+            bool: 成功放入写入队列返回True，未连接或队列已满时返回False
+        """
         if not self.connected:
-            return
-            
-        try:
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-            
-            self.cursor.execute(
-                "INSERT INTO raw_data (timestamp, broker, topic, raw_data) VALUES (?, ?, ?, ?)",
-                (timestamp, broker, topic, raw_data)
-            )
-            self.conn.commit()
-            return True
-        except sqlite3.Error as e:
-            print(f"保存原始数据错误: {str(e)}")
             return False
+            
+        if not isinstance(raw_data, str):
+            raw_data = bytes(raw_data)
+        timestamp, timestamp_us = now_timestamp()
+        return self.writer.submit("raw_data", (timestamp, timestamp_us, broker, topic, raw_data, cycle_number))
+    
+    def save_message(self, cycle_number, data, payload, broker, topic):
+        """按存储策略保存一条消息的解码周期和/或原始负载
+
+        Args:
+            cycle_number: 周期编号
+            data: 解码后的周期数据
+            payload: MQTT消息负载，为None时只能保存解码后的周期
+            broker: Broker地址
+            topic: 主题
+        """
+        if payload is None or self.storage_policy != "raw":
+            self.save_cycle_data(cycle_number, data)
+            if payload is not None and self.storage_policy == "both":
+                self.save_raw_data(broker, topic, payload)
+        else:
+            self.save_raw_data(broker, topic, payload, cycle_number)
+    
+    def set_storage_policy(self, policy):
+        """切换之后写入的消息的保存方式，已写入的数据仍可查询
+
+        Args:
+            policy: "raw"、"decoded"或"both"
+        """
+        if policy not in STORAGE_POLICIES:
+            raise ValueError(f"不支持的存储策略: {policy}")
+        self.storage_policy = policy
+    
+    def set_block_storage(self, block_cycles):
+        """切换周期数据的存储方式
+
+        Args:
+            block_cycles: 每块的周期数，为0时按行写入cycle_data表
+        """
+        if self.writer is not None:
+            self.writer.set_block_storage(block_cycles)
+    
+    def set_partitioning(self, partition):
+        """切换之后写入的数据是否按时间分区，已写入的数据仍可查询
+
+        Args:
+            partition: "day"、"hour"，为None时写入主数据库
+        """
+        self.partition = partition
+        if partition:
+            self.partition_layout = PartitionLayout(self.partition_layout.directory,
+                                                    self.partition_layout.prefix, partition)
+        if self.writer is not None:
+            self.writer.set_partitioning(self.partition_layout if partition else None)
+    
+    def set_retention(self, retention_days, action="delete"):
+        """设置分区保留天数和过期分区的处理方式，并在后台处理一次
+
+        Args:
+            retention_days: 保留天数，为0时一直保留
+            action: "delete"删除分区文件，"compress"打包为周期块
+        """
+        if self.writer is not None:
+            self.writer.set_retention(retention_days, action)
+    
+    @property
+    def write_lag(self):
+        """尚未写入数据库的行数"""
+        return self.writer.pending if self.writer is not None else 0
+    
+    @property
+    def write_dropped(self):
+        """写入队列已满时丢弃的行数"""
+        return self.writer.dropped_count if self.writer is not None else 0
+    
+    def flush(self, timeout=2.0):
+        """等待已提交的行写入数据库，查询前调用以便看到最新数据"""
+        if self.writer is not None:
+            return self.writer.flush(timeout)
+        return True
+    
+    def get_read_connection(self, path=None):
+        """获取当前线程对主数据库或分区文件的只读连接，第一次调用时创建
+
+        Args:
+            path: 分区文件路径，为None时为主数据库
+
+        Returns:
+            sqlite3.Connection: 只属于调用线程的只读连接
+        """
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        path = path or self.db_path
+        conn = conns.pop(path, None)
+        if conn is None:
+            conn = open_read_connection(path)
+            with self._readers_lock:
+                self._readers.append(conn)
+        conns[path] = conn  # 最近使用的连接排在最后
+        
+        # 分区连接过多时关闭最久未使用的
+        partition_paths = [other for other in conns if other != self.db_path]
+        for other in partition_paths[:-self.MAX_PARTITION_READERS]:
+            stale = conns.pop(other)
+            with self._readers_lock:
+                self._readers.remove(stale)
+            stale.close()
+        return conn
+    
+    def _merge_newest(self, fetch, count):
+        """合并主数据库和分区中最新的count行，按时间从新到旧
+        
+        分区的时间范围互不重叠，从最新的分区开始查询，较新的数据已经足够时
+        不再打开更早的分区。
+        
+        Args:
+            fetch: 参数为只读连接、返回该数据库中最新行的函数，行的第2列为时间戳文本
+            count: 需要的行数
+        """
+        rows = fetch(self.get_read_connection())
+        for _, end_us, path in reversed(self.partition_layout.list_partitions()):
+            boundary = us_to_timestamp(end_us)
+            if sum(1 for row in rows if row[1] >= boundary) >= count:
+                break
+            rows.extend(fetch(self.get_read_connection(path)))
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:count]
     
     def get_cycle_data(self, limit=100, offset=0):
         """获取周期数据"""
@@ -205,11 +384,11 @@ class DatabaseManager:
             return []
             
         try:
-            self.cursor.execute(
-                "SELECT * FROM cycle_data ORDER BY timestamp DESC LIMIT ? OFFSET ?",
-                (limit, offset)
-            )
-            return self.cursor.fetchall()
+            rows = self._merge_newest(lambda conn: conn.execute(
+                "SELECT id, timestamp, cycle_number, data FROM cycle_data ORDER BY ts_us DESC LIMIT ?",
+                (limit + offset,)
+            ).fetchall(), limit + offset)
+            return rows[offset:]
         except sqlite3.Error as e:
             print(f"获取周期数据错误: {str(e)}")
             return []
@@ -220,71 +399,366 @@ class DatabaseManager:
             return []
             
         try:
-            self.cursor.execute(
-                "SELECT * FROM raw_data ORDER BY timestamp DESC LIMIT ? OFFSET ?",
-                (limit, offset)
-            )
-            return self.cursor.fetchall()
+            rows = self._merge_newest(lambda conn: conn.execute(
+                "SELECT id, timestamp, broker, topic, raw_data FROM raw_data ORDER BY ts_us DESC LIMIT ?",
+                (limit + offset,)
+            ).fetchall(), limit + offset)
+            return rows[offset:]
         except sqlite3.Error as e:
             print(f"获取原始数据错误: {str(e)}")
             return []
     
+    def get_row_counts(self):
+        """获取各表已写入数据库的计数（内存中的计数，不查询数据库）
+
+        Returns:
+            dict: 计数名称到计数的映射，cycle_blocks为块中的周期数，
+                raw_cycles为只保存了原始负载的周期数
+        """
+        if self.writer is not None:
+            return dict(self.writer.row_counts)
+        return dict(self.row_counts)
+    
     def get_cycle_count(self):
-        """获取周期数据总数"""
+        """获取周期数据总数（包括周期块中的周期和只保存了原始负载的周期）"""
         if not self.connected:
             return 0
-            
-        try:
-            self.cursor.execute("SELECT COUNT(*) FROM cycle_data")
-            return self.cursor.fetchone()[0]
-        except sqlite3.Error as e:
-            print(f"获取周期数据总数错误: {str(e)}")
-            return 0
+        counts = self.get_row_counts()
+        return counts["cycle_data"] + counts["cycle_blocks"] + counts["raw_cycles"]
     
     def get_raw_count(self):
         """获取原始数据总数"""
         if not self.connected:
             return 0
-            
+        return self.get_row_counts()["raw_data"]
+    
+    @staticmethod
+    def _raw_cycles_in(conn, condition, params):
+        """一个数据库文件中只保存了原始负载的周期，读取时解码
+
+        Args:
+            conn: 只读连接
+            condition: 接在"WHERE cycle_number IS NOT NULL"之后的条件和排序
+            params: 查询参数
+        """
         try:
-            self.cursor.execute("SELECT COUNT(*) FROM raw_data")
-            return self.cursor.fetchone()[0]
-        except sqlite3.Error as e:
-            print(f"获取原始数据总数错误: {str(e)}")
-            return 0
+            rows = conn.execute(
+                "SELECT id, timestamp, cycle_number, raw_data FROM raw_data "
+                f"WHERE cycle_number IS NOT NULL {condition}", params
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []  # 增加存储策略之前创建、之后未再写入的分区没有cycle_number列
+        return expand_raw_cycles(rows)
+    
+    @staticmethod
+    def _latest_cycles_in(conn, count):
+        """一个数据库文件中最新的count个周期（合并按行存储、只保存原始负载和周期块中的周期）"""
+        rows = conn.execute(
+            "SELECT id, timestamp, cycle_number, data FROM cycle_data ORDER BY ts_us DESC LIMIT ?",
+            (count,)
+        ).fetchall()
+        rows.extend(DatabaseManager._raw_cycles_in(
+            conn, "ORDER BY ts_us DESC LIMIT ?", (count,)))
+        
+        # 从最新的块开始读取，直到块中的周期数足够
+        block_cycles = 0
+        for block_id, blob, cycle_count in conn.execute(
+                "SELECT id, data, cycle_count FROM cycle_blocks ORDER BY end_us DESC"):
+            rows.extend(expand_cycle_block(block_id, blob))
+            block_cycles += cycle_count
+            if block_cycles >= count:
+                break
+        return rows
     
     def get_latest_cycle_data(self, count=1):
-        """获取最新的周期数据"""
+        """获取最新的周期数据（合并主数据库、分区、按行存储、只保存原始负载和周期块中的周期）"""
         if not self.connected:
             return []
             
         try:
-            self.cursor.execute(
-                "SELECT * FROM cycle_data ORDER BY timestamp DESC LIMIT ?",
-                (count,)
-            )
-            return self.cursor.fetchall()
+            return self._merge_newest(lambda conn: self._latest_cycles_in(conn, count), count)
         except sqlite3.Error as e:
             print(f"获取最新周期数据错误: {str(e)}")
             return []
     
     def get_cycle_data_by_time(self, start_time, end_time):
-        """根据时间范围获取周期数据"""
+        """根据时间范围获取周期数据（合并主数据库、有交集的分区、按行存储、只保存原始负载和周期块中的周期）
+
+        Args:
+            start_time: 起始时间文本，"年-月-日 时:分:秒"，可以带微秒
+            end_time: 结束时间文本，格式同上，包含该时刻
+        """
         if not self.connected:
             return []
             
         try:
-            self.cursor.execute(
-                "SELECT * FROM cycle_data WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp",
-                (start_time, end_time)
-            )
-            return self.cursor.fetchall()
+            start_us, end_us = timestamp_to_us(start_time), timestamp_to_us(end_time)
+            paths = [None] + [path for _, _, path in self.partition_layout.overlapping(start_us, end_us)]
+            rows = []
+            for path in paths:
+                conn = self.get_read_connection(path)
+                rows.extend(conn.execute(
+                    "SELECT id, timestamp, cycle_number, data FROM cycle_data "
+                    "WHERE ts_us BETWEEN ? AND ? ORDER BY ts_us",
+                    (start_us, end_us)
+                ).fetchall())
+                rows.extend(self._raw_cycles_in(
+                    conn, "AND ts_us BETWEEN ? AND ? ORDER BY ts_us", (start_us, end_us)))
+                
+                # 只读取时间范围有交集的块，再按周期时间戳过滤
+                for block_id, blob in conn.execute(
+                        "SELECT id, data FROM cycle_blocks WHERE start_us <= ? AND end_us >= ? ORDER BY start_us",
+                        (end_us, start_us)):
+                    rows.extend(expand_cycle_block(block_id, blob, start_us, end_us))
+            
+            rows.sort(key=lambda row: row[1])
+            return rows
         except sqlite3.Error as e:
             print(f"根据时间范围获取周期数据错误: {str(e)}")
             return []
     
+    def get_page(self, kind, cursor=None, page_size=200, start_us=None, end_us=None, descending=True):
+        """按键集分页读取周期数据或原始数据（合并主数据库和分区）
+
+        每页从上一页最后一行的键继续，只读取索引中相邻的行，不使用OFFSET，
+        翻到多远的位置耗时都相同。
+
+        Args:
+            kind: "cycle"周期数据（合并按行存储、只保存原始负载和周期块中的周期）或"raw"原始数据
+            cursor: 上一页返回的游标，为None时从第一行开始
+            page_size: 每页行数
+            start_us: 起始微秒时间戳（包含），为None时不限制
+            end_us: 结束微秒时间戳（包含），为None时不限制
+            descending: 为True时从新到旧
+
+        Returns:
+            tuple: (行列表, 下一页的游标)，行的格式与get_latest_cycle_data或get_raw_data相同；
+                行数少于page_size时已没有更多数据
+        """
+        if not self.connected:
+            return [], cursor
+        start_us = self.KEY_MIN if start_us is None else start_us
+        end_us = self.KEY_MAX if end_us is None else end_us
+        if cursor is not None:
+            # 游标之前的时间不必再查询
+            if descending:
+                end_us = min(end_us, cursor[0])
+            else:
+                start_us = max(start_us, cursor[0])
+        
+        partitions = self.partition_layout.overlapping(start_us, end_us)
+        if descending:
+            partitions.reverse()
+        results = self._page_in(self.get_read_connection(), 0, kind, cursor, page_size, start_us, end_us,
+                                descending)
+        for partition_start, partition_end, path in partitions:
+            # 分区的时间范围互不重叠，已有足够的行比这个分区更靠前时不再打开它
+            if descending:
+                ahead = sum(1 for key, _ in results if key[0] >= partition_end)
+            else:
+                ahead = sum(1 for key, _ in results if key[0] < partition_start)
+            if ahead >= page_size:
+                break
+            results.extend(self._page_in(self.get_read_connection(path), partition_start, kind, cursor, page_size,
+                                         start_us, end_us, descending))
+        
+        results.sort(key=lambda result: result[0], reverse=descending)
+        results = results[:page_size]
+        next_cursor = results[-1][0] if results else cursor
+        return [row for _, row in results], next_cursor
+    
+    def _page_in(self, conn, file_key, kind, cursor, page_size, start_us, end_us, descending):
+        """一个数据库文件中游标之后的最多page_size行（每个来源各取一页，由get_page合并）
+
+        Returns:
+            list: (键, 行)列表
+        """
+        if kind == "cycle":
+            sources = [(0, "cycle_data", "id, timestamp, cycle_number, data", ""),
+                       (1, "raw_data", "id, timestamp, cycle_number, raw_data", "cycle_number IS NOT NULL AND ")]
+        else:
+            sources = [(0, "raw_data", "id, timestamp, broker, topic, raw_data", "")]
+        op, order = ("<", "DESC") if descending else (">", "ASC")
+        results = []
+        for rank, table, columns, condition in sources:
+            try:
+                rows = conn.execute(
+                    f"SELECT ts_us, {columns} FROM {table} WHERE {condition}ts_us BETWEEN ? AND ? "
+                    f"AND (ts_us, id) {op} (?, ?) ORDER BY ts_us {order}, id {order} LIMIT ?",
+                    (start_us, end_us) + self._key_bound(cursor, file_key, rank, descending) + (page_size,)
+                ).fetchall()
+            except sqlite3.OperationalError:
+                continue  # 增加存储策略之前创建、之后未再写入的分区没有cycle_number列
+            keys = [(row[0], file_key, rank, row[1]) for row in rows]
+            rows = [row[1:] for row in rows]
+            if rank == 1:
+                rows = expand_raw_cycles(rows)
+            results.extend(zip(keys, rows))
+        
+        if kind == "cycle":
+            results.extend(self._block_page_in(conn, file_key, cursor, page_size, start_us, end_us, descending))
+        return results
+    
+    def _block_page_in(self, conn, file_key, cursor, page_size, start_us, end_us, descending):
+        """一个数据库文件的周期块中游标之后的周期，块按时间顺序解码，直到周期数足够"""
+        order = "end_us DESC" if descending else "start_us ASC"
+        results = []
+        for block_id, blob in conn.execute(
+                f"SELECT id, data FROM cycle_blocks WHERE start_us <= ? AND end_us >= ? ORDER BY {order}",
+                (end_us, start_us)):
+            timestamps_us, cycle_numbers, cycles = decode_cycle_block(blob)
+            for i, timestamp_us in enumerate(timestamps_us.tolist()):
+                key = (timestamp_us, file_key, 2, (block_id << self.BLOCK_KEY_BITS) | i)
+                if not start_us <= timestamp_us <= end_us or (
+                        cursor is not None and (key >= cursor if descending else key <= cursor)):
+                    continue
+                results.append((key, (f"块{block_id}-{i + 1}", us_to_timestamp(timestamp_us),
+                                      int(cycle_numbers[i]), cycles[i])))
+            if len(results) >= page_size:
+                break
+        return results
+    
+    def _key_bound(self, cursor, file_key, rank, descending):
+        """把游标换算为某个来源的(ts_us, id)比较边界
+
+        游标所在的时间戳上，排在游标来源之前的来源的行都已读过（从新到旧时为之后），
+        同一来源只读过id不超过游标的行。
+        """
+        if cursor is None:
+            return (self.KEY_MAX, 0) if descending else (self.KEY_MIN, 0)
+        timestamp_us, cursor_file, cursor_rank, cursor_id = cursor
+        source = (file_key, rank)
+        if source == (cursor_file, cursor_rank):
+            return timestamp_us, cursor_id
+        if (source < (cursor_file, cursor_rank)) == descending:
+            return timestamp_us, (self.KEY_MAX if descending else self.KEY_MIN)
+        return timestamp_us, (self.KEY_MIN if descending else self.KEY_MAX)
+    
+    def count_in_range(self, kind, start_us=None, end_us=None):
+        """统计时间范围内的周期数或原始数据行数（合并主数据库和分区）
+
+        只统计索引和周期块的周期数，只有跨过时间范围边界的块需要解码。
+
+        Args:
+            kind: "cycle"或"raw"
+            start_us: 起始微秒时间戳（包含），为None时不限制
+            end_us: 结束微秒时间戳（包含），为None时不限制
+        """
+        if not self.connected:
+            return 0
+        start_us = self.KEY_MIN if start_us is None else start_us
+        end_us = self.KEY_MAX if end_us is None else end_us
+        paths = [None] + [path for _, _, path in self.partition_layout.overlapping(start_us, end_us)]
+        total = 0
+        for path in paths:
+            conn = self.get_read_connection(path)
+            if kind != "cycle":
+                total += conn.execute("SELECT COUNT(*) FROM raw_data WHERE ts_us BETWEEN ? AND ?",
+                                      (start_us, end_us)).fetchone()[0]
+                continue
+            total += conn.execute("SELECT COUNT(*) FROM cycle_data WHERE ts_us BETWEEN ? AND ?",
+                                  (start_us, end_us)).fetchone()[0]
+            try:
+                total += conn.execute(
+                    "SELECT COUNT(*) FROM raw_data WHERE cycle_number IS NOT NULL AND ts_us BETWEEN ? AND ?",
+                    (start_us, end_us)).fetchone()[0]
+            except sqlite3.OperationalError:
+                pass  # 增加存储策略之前创建的分区
+            total += conn.execute(
+                "SELECT COALESCE(SUM(cycle_count), 0) FROM cycle_blocks WHERE start_us >= ? AND end_us <= ?",
+                (start_us, end_us)).fetchone()[0]
+            for (blob,) in conn.execute(
+                    "SELECT data FROM cycle_blocks WHERE start_us <= ? AND end_us >= ? "
+                    "AND (start_us < ? OR end_us > ?)", (end_us, start_us, start_us, end_us)):
+                timestamps_us = decode_cycle_block(blob)[0]
+                total += int(np.count_nonzero((timestamps_us >= start_us) & (timestamps_us <= end_us)))
+        return total
+    
+    def iter_cycle_chunks(self, start_us=None, end_us=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        """按时间从旧到新分批读取并解码时间范围内的周期，用于流式导出
+
+        每批用get_page的键集分页读取，内存中只保留当前一批。
+
+        Args:
+            start_us: 起始微秒时间戳（包含），为None时不限制
+            end_us: 结束微秒时间戳（包含），为None时不限制
+            chunk_rows: 每批周期数
+
+        Yields:
+            tuple: (int64时间戳数组, int64周期编号数组, 周期矩阵, 每个周期的点数)，
+                周期矩阵的格式见stack_cycles
+        """
+        cursor = None
+        while True:
+            rows, cursor = self.get_page("cycle", cursor, chunk_rows, start_us, end_us, descending=False)
+            if rows:
+                cycles, widths = stack_cycles([decode_cycle(row[3]) for row in rows])
+                yield (np.array([timestamp_to_us(row[1]) for row in rows], dtype=np.int64),
+                       np.array([row[2] for row in rows], dtype=np.int64), cycles, widths)
+            if len(rows) < chunk_rows:
+                return
+    
+    def close_thread_connections(self):
+        """关闭当前线程的只读连接，后台查询线程结束前调用"""
+        conns = getattr(self._local, "conns", None) or {}
+        with self._readers_lock:
+            for conn in conns.values():
+                if conn in self._readers:
+                    self._readers.remove(conn)
+                conn.close()
+        self._local.conns = {}
+    
+    def get_rollups(self, start_time, end_time, resolution=None, with_histogram=False,
+                    min_buckets=MIN_TREND_BUCKETS):
+        """获取时间范围内的汇总统计，用于长时间范围的趋势图
+
+        Args:
+            start_time: 起始时间文本，"年-月-日 时:分:秒"，可以带微秒
+            end_time: 结束时间文本，格式同上，包含该时刻
+            resolution: 分桶时长（秒），为None时选择仍能覆盖min_buckets个桶的最粗分辨率
+            with_histogram: 是否同时合计相位×幅值二维计数
+            min_buckets: 自动选择分辨率时希望覆盖的桶数
+
+        Returns:
+            tuple: (分辨率, load_rollups返回的字典)，未连接时返回(分辨率, None)
+        """
+        start_us, end_us = timestamp_to_us(start_time), timestamp_to_us(end_time)
+        if resolution is None:
+            resolution = choose_resolution(start_us, end_us, min_buckets)
+        if not self.connected:
+            return resolution, None
+            
+        try:
+            # 最细的汇总和数据一起写入分区，较粗的汇总只在主数据库中
+            paths = [None]
+            if resolution == ROLLUP_RESOLUTIONS[0]:
+                paths += [path for _, _, path in self.partition_layout.overlapping(start_us, end_us)]
+            parts = []
+            for path in paths:
+                try:
+                    parts.append(load_rollups(self.get_read_connection(path), resolution, start_us, end_us,
+                                              with_histogram))
+                except sqlite3.OperationalError:
+                    pass  # 增加汇总统计之前创建的分区没有rollups表
+            return resolution, concat_rollups(parts)
+        except sqlite3.Error as e:
+            print(f"获取汇总统计错误: {str(e)}")
+            return resolution, None
+    
     def close(self):
-        """关闭数据库连接"""
+        """关闭数据库连接，先写完写入队列中剩余的行"""
+        if self.writer is not None:
+            self.writer.close()
+            self.row_counts = dict(self.writer.row_counts)
+            self.writer = None
+        with self._readers_lock:
+            for reader in self._readers:
+                try:
+                    reader.close()
+                except sqlite3.Error:
+                    pass
+            self._readers = []
+        self._local = threading.local()
         if self.connected:
             try:
                 self.conn.close()
@@ -311,14 +785,18 @@ class MplCanvas(FigureCanvas):
             
             # 创建3D图
             self.axes_3d = self.fig.add_axes(right_pos, projection='3d')
+            
+            # PRPS瀑布图与3D图位置相同，两者只显示一个
+            self.axes_waterfall = self.fig.add_axes(right_pos)
+            self.axes_waterfall.set_visible(False)
         else:
             self.axes_2d = self.fig.add_subplot(111)  # 只有2D图
             self.axes_3d = None
+            self.axes_waterfall = None
             
         super(MplCanvas, self).__init__(self.fig)
         
-        # 设置动画效果
-        self.blit = False
+        # 不要用属性覆盖FigureCanvas.blit，增量渲染需要调用它只重绘PRPD区域
         self.axes_2d.grid(True, linestyle='--', alpha=0.7)
         self.scatter = None
         self.line = None
@@ -331,15 +809,125 @@ class MplCanvas(FigureCanvas):
             self.axes_3d.set_zlabel(unit_label)
             self.surface = None
 
+class FrameRenderThread(QThread):
+    """在后台线程中绘制实时PRPD/PRPS图
+
+    界面线程提交只读的FrameSnapshot，渲染线程用不显示的Agg画布绘制后发出QImage。
+    只保留最新提交的一帧：渲染期间到达的新帧会替换尚未开始绘制的旧帧，
+    界面线程不会排队等待绘制。
+    """
+    frame_ready = Signal(QImage, int, object)  # 信号：绘制好的图像、帧序号、各图的绘制耗时（毫秒）
+
+    def __init__(self):
+        super().__init__()
+        self._condition = threading.Condition()
+        self._pending = None
+        self._running = True
+        self.dropped_frames = 0  # 被更新的帧替换而未绘制的帧数
+        self.render_ms = 0.0  # 最近一帧的绘制耗时
+
+    def submit(self, snapshot):
+        """提交一帧，替换尚未开始绘制的旧帧"""
+        with self._condition:
+            if self._pending is not None:
+                # 被替换的帧要更新的图由新帧一并更新
+                self.dropped_frames += 1
+                snapshot.views = snapshot.views | self._pending.views
+            self._pending = snapshot
+            self._condition.notify()
+
+    def run(self):
+        # 画布和图元只在渲染线程中创建和使用
+        renderer = OffscreenFrameRenderer()
+        while True:
+            with self._condition:
+                while self._running and self._pending is None:
+                    self._condition.wait()
+                if not self._running:
+                    break
+                snapshot, self._pending = self._pending, None
+            try:
+                start = time.perf_counter()
+                pixels = renderer.render(snapshot)
+                height, width = pixels.shape[:2]
+                image = QImage(pixels.data, width, height, width * 4, QImage.Format_RGBA8888).copy()
+                self.render_ms = (time.perf_counter() - start) * 1000
+                self.frame_ready.emit(image, snapshot.sequence, renderer.last_costs)
+            except Exception as e:
+                print(f"后台绘制错误: {str(e)}")
+
+    def stop(self):
+        """放弃尚未绘制的帧并等待线程结束"""
+        with self._condition:
+            self._running = False
+            self._pending = None
+            self._condition.notify()
+        self.wait()
+
+
+class RenderedFrameView(QWidget):
+    """显示后台绘制好的图表图像，尺寸变化时通知重新绘制"""
+    resized = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.image = None
+        self.sequence = -1  # 当前显示的帧序号
+
+    def show_frame(self, image, sequence):
+        """显示一帧，忽略比当前帧更旧的帧"""
+        if sequence <= self.sequence:
+            return
+        self.image = image
+        self.sequence = sequence
+        self.update()
+
+    def clear(self):
+        """清除显示的图像"""
+        self.image = None
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        if self.image is not None:
+            # 图像按提交时的尺寸绘制，尺寸变化后到新帧到达之前临时缩放
+            painter.drawImage(self.rect(), self.image)
+        painter.end()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.resized.emit()
+
+
 class MQTTThread(QThread):
-    """MQTT处理线程，避免阻塞主线程"""
-    def __init__(self, client):
+    """MQTT处理线程，避免阻塞主线程
+    
+    event模式使用paho的loop_forever阻塞等待套接字，只有数据到达时才唤醒；
+    poll模式保留旧的轮询方式，便于在现场对比延迟。
+    """
+    def __init__(self, client, mode="event"):
         super().__init__()
         self.client = client
+        self.mode = mode
         self.running = True
         self.mutex = QMutex()  # 添加互斥锁保护running变量
         
     def run(self):
+        if self.mode == "event":
+            self.run_event_loop()
+        else:
+            self.run_poll_loop()
+    
+    def run_event_loop(self):
+        """事件驱动的网络循环，disconnect()后自行退出"""
+        try:
+            self.client.loop_forever()
+        except Exception as e:
+            print(f"MQTT线程错误: {str(e)}")
+    
+    def run_poll_loop(self):
+        """轮询方式的网络循环"""
         while True:
             self.mutex.lock()
             if not self.running:
@@ -358,14 +946,20 @@ class MQTTThread(QThread):
         self.mutex.lock()
         self.running = False
         self.mutex.unlock()
-        # 确保线程能够退出循环
-        self.client.loop_stop()
+        # 事件模式下发送DISCONNECT即可让loop_forever退出；
+        # 网络循环不是由loop_start启动的，因此不调用loop_stop
+        if self.mode == "event":
+            try:
+                self.client.disconnect()
+            except Exception as e:
+                print(f"停止MQTT线程错误: {str(e)}")
 
 class MQTTClient(QWidget):
     """MQTT客户端类，处理MQTT连接和消息接收"""
-    message_received = Signal(list)  # 信号：接收到新消息时发出
+    messages_received = Signal(list)  # 信号：每次处理队列时发出，批量传递本次取出的全部周期数据
     connection_status = Signal(bool, str)  # 信号：连接状态变化时发出
-    raw_data_received = Signal(str, str, str)  # 信号：接收到原始数据时发出，传递broker、topic和数据
+    payloads_received = Signal(list)  # 信号：在messages_received之前发出，按相同顺序传递本批周期的原始负载
+    queue_wakeup = Signal()  # 信号：事件模式下有新数据入队时唤醒主线程处理队列
 
     def __init__(self):
         super().__init__()
@@ -379,15 +973,95 @@ class MQTTClient(QWidget):
         self.topic = "pub1"
         self.connected = False
         self.mqtt_thread = None
-        self.message_queue = queue.Queue(maxsize=10)  # 限制队列大小，避免内存溢出
+        self.loop_mode = "event"  # 网络循环模式: event（事件驱动）或 poll（轮询）
+
+        # 消息队列设置
+        self.queue_maxsize = 500  # 队列深度，50Hz设备约可缓冲10秒数据
+        self.queue_interval = 50  # 队列处理间隔，单位毫秒
+        self.max_batch_size = 0  # 每次最多取出的周期数，0表示取空队列
+        self.drop_oldest = True  # 队列满时丢弃最旧的数据，False则丢弃新数据
+        self.dropped_count = 0  # 因队列满而丢弃的周期数
+        self._wakeup_pending = False  # 是否已有未处理的唤醒信号
+        
+        # 延迟统计：从收到消息到发出信号的时间，单位毫秒
+        self.latency_count = 0
+        self.latency_avg_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.message_queue = queue.Queue(maxsize=self.queue_maxsize)  # 限制队列大小，避免内存溢出
+        self._queue_lock = threading.Lock()  # 重建队列时防止网络线程向旧队列入队
         
         # 数据库管理器
         self.db_manager = None
         
-        # 创建一个定时器来处理消息队列
+        # 创建一个定时器来处理消息队列（仅轮询模式使用）
         self.queue_timer = QTimer()
         self.queue_timer.timeout.connect(self.process_message_queue)
-        self.queue_timer.start(50)  # 每50ms处理一次队列
+        self.queue_wakeup.connect(self.process_message_queue)
+        self.start_queue_pump()
+
+    def start_queue_pump(self):
+        """启动消息队列处理，事件模式由入队信号唤醒，轮询模式由定时器驱动"""
+        if self.loop_mode == "poll":
+            if not self.queue_timer.isActive():
+                self.queue_timer.start(self.queue_interval)  # 每50ms处理一次队列
+        elif self.queue_timer.isActive():
+            self.queue_timer.stop()
+
+    def set_loop_mode(self, mode):
+        """设置网络循环模式，下次连接时生效
+
+        Args:
+            mode: "event" 事件驱动，或 "poll" 轮询
+        """
+        if mode not in ("event", "poll"):
+            raise ValueError(f"未知的网络循环模式: {mode}")
+        self.loop_mode = mode
+        self.start_queue_pump()
+
+    def reset_latency_stats(self):
+        """清零延迟统计"""
+        self.latency_count = 0
+        self.latency_avg_ms = 0.0
+        self.latency_max_ms = 0.0
+
+    def configure_message_queue(self, maxsize=None, interval=None, max_batch_size=None, drop_oldest=None):
+        """配置消息队列深度和取出策略
+
+        Args:
+            maxsize: 队列深度，修改后会重建队列，未处理的数据移入新队列，超出新深度的按丢弃策略丢弃并计数
+            interval: 队列处理间隔，单位毫秒
+            max_batch_size: 每次最多取出的周期数，0表示取空队列
+            drop_oldest: 队列满时是否丢弃最旧的数据
+        """
+        if drop_oldest is not None:
+            self.drop_oldest = drop_oldest
+        if maxsize is not None and maxsize != self.queue_maxsize:
+            with self._queue_lock:
+                pending = []
+                while True:
+                    try:
+                        pending.append(self.message_queue.get_nowait())
+                        self.message_queue.task_done()
+                    except queue.Empty:
+                        break
+                excess = max(0, len(pending) - maxsize)
+                if excess:
+                    pending = pending[excess:] if self.drop_oldest else pending[:maxsize]
+                    self.dropped_count += excess
+                self.queue_maxsize = maxsize
+                self.message_queue = queue.Queue(maxsize=self.queue_maxsize)
+                for item in pending:
+                    self.message_queue.put_nowait(item)
+        if interval is not None:
+            self.queue_interval = interval
+            if self.queue_timer.isActive():
+                self.queue_timer.start(self.queue_interval)
+        if max_batch_size is not None:
+            self.max_batch_size = max_batch_size
+
+    def reset_dropped_count(self):
+        """清零丢弃计数"""
+        self.dropped_count = 0
 
     def set_database_manager(self, db_manager):
         """设置数据库管理器"""
@@ -412,14 +1086,15 @@ class MQTTClient(QWidget):
             
             # 连接到Broker
             self.client.connect(self.broker_address, self.broker_port)
+            self.reset_dropped_count()
+            self.reset_latency_stats()
             
-            # 重新启动消息队列处理定时器
-            if hasattr(self, 'queue_timer') and not self.queue_timer.isActive():
-                self.queue_timer.start(50)
+            # 重新启动消息队列处理
+            self.start_queue_pump()
                 
             # 使用线程处理MQTT消息循环，避免阻塞主线程
             if self.mqtt_thread is None or not self.mqtt_thread.isRunning():
-                self.mqtt_thread = MQTTThread(self.client)
+                self.mqtt_thread = MQTTThread(self.client, self.loop_mode)
                 self.mqtt_thread.start()
                 
             return True
@@ -454,11 +1129,10 @@ class MQTTClient(QWidget):
                 self.mqtt_thread = None
             
             # 断开MQTT连接，但不等待回调
+            # 网络循环由MQTTThread驱动而不是loop_start，因此无需调用loop_stop
             try:
                 if hasattr(self.client, '_sock') and self.client._sock:
                     self.client.disconnect()
-                    # 确保完全断开连接
-                    self.client.loop_stop()
             except Exception as e:
                 print(f"断开MQTT连接时发生错误: {str(e)}")
                 
@@ -485,50 +1159,340 @@ class MQTTClient(QWidget):
         self.connection_status.emit(False, "已断开连接")
 
     def process_message_queue(self):
-        """处理消息队列"""
-        if not self.message_queue.empty():
+        """处理消息队列，每次取出所有待处理的周期并批量发出"""
+        # 先清除唤醒标记再取数据，之后入队的数据会重新发出唤醒信号
+        self._wakeup_pending = False
+        
+        batch = []
+        payloads = []
+        receive_times = []
+        while self.max_batch_size <= 0 or len(batch) < self.max_batch_size:
             try:
-                data = self.message_queue.get_nowait()
-                self.message_received.emit(data)
+                receive_time, data, payload = self.message_queue.get_nowait()
+                batch.append(data)
+                payloads.append(payload)
+                receive_times.append(receive_time)
                 self.message_queue.task_done()
             except queue.Empty:
-                pass
+                break
+        
+        if batch:
+            self.update_latency_stats(receive_times)
+            self.payloads_received.emit(payloads)
+            self.messages_received.emit(batch)
+        
+        # 限制了每批数量时，剩余数据需要再次唤醒处理
+        if self.loop_mode == "event" and not self.message_queue.empty() and not self._wakeup_pending:
+            self._wakeup_pending = True
+            QTimer.singleShot(0, self.process_message_queue)
+    
+    def update_latency_stats(self, receive_times):
+        """根据本批数据的接收时间更新延迟统计"""
+        emit_time = time.perf_counter()
+        for receive_time in receive_times:
+            latency_ms = (emit_time - receive_time) * 1000.0
+            self.latency_count += 1
+            # 滑动平均，最近的数据权重更大
+            alpha = max(0.05, 1.0 / self.latency_count)
+            self.latency_avg_ms += alpha * (latency_ms - self.latency_avg_ms)
+            self.latency_max_ms = max(self.latency_max_ms, latency_ms)
 
     def on_message(self, client, userdata, msg):
         """消息接收回调函数"""
         try:
-            hex_message = msg.payload.hex()  # 解码消息内容为十六进制字符串
+            receive_time = time.perf_counter()  # 记录收到消息的时间，用于统计延迟
             
-            # 发出原始数据信号，让主线程处理数据库保存
-            if hasattr(self, 'db_manager') and self.db_manager is not None:
-                # 使用信号将原始数据发送到主线程，而不是直接在MQTT线程中保存
-                self.raw_data_received.emit(self.broker_address, self.topic, hex_message)
-                
-            results = []
-            for i in range(0, len(hex_message), 4):  # 每4个字符解析为一个16进制数
-                if i + 4 <= len(hex_message):
-                    hex_value = hex_message[i:i+4]
-                    decimal_value = int(hex_value, 16)
-                    converted_value = decimal_value * 3.3 / 4096
-                    results.append(round(converted_value, 2))  # 保留两位小数
-            
-            meaningful_data = results[4:-1]  # 去掉前4个和最后一个数据
-            
-            # 将数据放入队列，而不是直接发送信号
-            # 如果队列已满，则丢弃这条消息，避免处理积压
-            try:
-                self.message_queue.put_nowait(meaningful_data)
-            except queue.Full:
-                pass
+            # 直接按大端uint16解析负载，去掉帧头帧尾后得到float32电压数组
+            meaningful_data = decode_payload(msg.payload)
+            
+            # 将数据放入队列，而不是直接发送信号；原始负载随周期一起入队，由主线程按存储策略保存
+            # 如果队列已满，按策略丢弃最旧或最新的数据并计数
+            item = (receive_time, meaningful_data, msg.payload)
+            with self._queue_lock:
+                try:
+                    self.message_queue.put_nowait(item)
+                except queue.Full:
+                    self.dropped_count += 1
+                    if self.drop_oldest:
+                        try:
+                            self.message_queue.get_nowait()
+                            self.message_queue.task_done()
+                            self.message_queue.put_nowait(item)
+                        except (queue.Empty, queue.Full):
+                            pass
+            
+            # 事件模式下唤醒主线程处理队列，已有未处理的唤醒时不重复发出
+            if self.loop_mode == "event" and not self._wakeup_pending:
+                self._wakeup_pending = True
+                self.queue_wakeup.emit()
                 
         except Exception as e:
             print(f"消息处理错误: {str(e)}")
 
+class DatabaseQueryWorker(QThread):
+    """在后台线程中执行数据库查看对话框的分页查询和计数
+
+    请求按顺序处理；每个请求带有查询编号，编号已过期（用户又发起了新的查询）的请求直接跳过。
+    每个新查询的第一个请求之前先在本线程中等待写入队列落盘，界面线程不等待写入线程。
+    查询使用本线程自己的只读连接，线程结束前关闭。
+    """
+    page_loaded = Signal(int, list, object)  # 信号：查询编号、本页的行、下一页的游标
+    count_loaded = Signal(int, int)  # 信号：查询编号、总行数
+    query_failed = Signal(int, str)  # 信号：查询编号、错误信息
+
+    def __init__(self, db_manager):
+        super().__init__()
+        self.db_manager = db_manager
+        self.generation = 0  # 最新的查询编号
+        self._requests = queue.Queue()
+
+    def request_page(self, generation, query, cursor, page_size):
+        """请求读取一页
+
+        Args:
+            generation: 查询编号
+            query: 查询条件字典（kind、start_us、end_us、descending）
+            cursor: 上一页返回的游标，第一页为None
+            page_size: 每页行数
+        """
+        self.generation = generation
+        self._requests.put(("page", generation, query, cursor, page_size))
+
+    def request_count(self, generation, query):
+        """请求统计查询条件下的总行数"""
+        self.generation = generation
+        self._requests.put(("count", generation, query, None, 0))
+
+    def run(self):
+        flushed_generation = None
+        try:
+            while True:
+                request = self._requests.get()
+                if request is None:
+                    break
+                action, generation, query, cursor, page_size = request
+                if generation != self.generation:
+                    continue
+                try:
+                    if generation != flushed_generation:
+                        # 先等待写入队列中的数据落盘，查询结果才包含最新数据
+                        self.db_manager.flush()
+                        flushed_generation = generation
+                    if action == "page":
+                        rows, next_cursor = self.db_manager.get_page(
+                            query["kind"], cursor, page_size, query["start_us"], query["end_us"], query["descending"])
+                        self.page_loaded.emit(generation, rows, next_cursor)
+                    else:
+                        self.count_loaded.emit(generation, self.db_manager.count_in_range(
+                            query["kind"], query["start_us"], query["end_us"]))
+                except Exception as e:
+                    self.query_failed.emit(generation, str(e))
+        finally:
+            self.db_manager.close_thread_connections()
+
+    def stop(self):
+        """处理完当前请求后退出线程"""
+        self._requests.put(None)
+        self.wait()
+
+
+class ExportWorker(QThread):
+    """在后台线程中把时间范围内的周期流式导出到文件
+
+    周期按批从数据库读取、解码并写入，内存占用与导出的周期数无关。
+    开始前在本线程中等待写入队列落盘，导出结果才包含最新数据。
+    """
+    progress = Signal(int, int)  # 信号：已导出的周期数、总周期数
+    export_done = Signal(int, str)  # 信号：导出的周期数、文件路径
+    export_cancelled = Signal()  # 信号：导出已取消，临时文件已删除
+    export_failed = Signal(str)  # 信号：错误信息
+
+    def __init__(self, db_manager, path, start_us=None, end_us=None, export_format=None):
+        """初始化
+
+        Args:
+            db_manager: 数据库管理器
+            path: 目标文件路径
+            start_us: 起始微秒时间戳（包含），为None时不限制
+            end_us: 结束微秒时间戳（包含），为None时不限制
+            export_format: 导出格式（见gis_pd_export.EXPORT_FORMATS），为None时按扩展名判断
+        """
+        super().__init__()
+        self.db_manager = db_manager
+        self.path = path
+        self.start_us = start_us
+        self.end_us = end_us
+        self.export_format = export_format
+        self._cancelled = False
+
+    def cancel(self):
+        """在写完当前一批后停止导出"""
+        self._cancelled = True
+
+    def run(self):
+        try:
+            self.db_manager.flush()
+            total = self.db_manager.count_in_range("cycle", self.start_us, self.end_us)
+            self.progress.emit(0, total)
+            writer = open_export_writer(self.path, self.export_format)
+            completed = export_cycles(self.db_manager.iter_cycle_chunks(self.start_us, self.end_us), writer,
+                                      progress=lambda count: self.progress.emit(count, max(total, count)),
+                                      cancelled=lambda: self._cancelled)
+            if completed:
+                self.export_done.emit(writer.count, self.path)
+            else:
+                self.export_cancelled.emit()
+        except Exception as e:
+            self.export_failed.emit(str(e))
+        finally:
+            self.db_manager.close_thread_connections()
+
+
+class QueryTableModel(QAbstractTableModel):
+    """数据库查看对话框的表格模型
+
+    行按页从后台线程加载：视图滚动到末尾时通过canFetchMore/fetchMore请求下一页，
+    页到达后追加到模型中。只保存查询到的原始行，预览文本在视图绘制单元格时才计算。
+    """
+    PAGE_SIZE = 200  # 每页行数
+    HEADERS = {
+        "cycle": ["ID", "时间戳", "周期编号", "数据(前10个点)"],
+        "raw": ["ID", "时间戳", "Broker", "主题", "原始数据(前30个字符)"],
+    }
+
+    loading_changed = Signal()  # 信号：加载了新的一页或得到总行数时发出
+
+    def __init__(self, worker, parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.worker.page_loaded.connect(self.on_page_loaded)
+        self.worker.count_loaded.connect(self.on_count_loaded)
+        self.worker.query_failed.connect(self.on_query_failed)
+        self.generation = 0
+        self.query = {"kind": "cycle", "start_us": None, "end_us": None, "descending": True, "limit": None}
+        self.rows = []
+        self.cursor = None
+        self.exhausted = True  # 是否已没有更多的行
+        self.loading = False  # 是否有尚未返回的页请求
+        self.total = None  # 总行数，后台统计完成前为None
+        self.error = None
+
+    def start(self, kind, start_us=None, end_us=None, descending=True, limit=None):
+        """开始新的查询，清空已加载的行并在后台加载第一页和总行数
+
+        Args:
+            kind: "cycle"或"raw"
+            start_us: 起始微秒时间戳，为None时不限制
+            end_us: 结束微秒时间戳，为None时不限制
+            descending: 为True时从新到旧
+            limit: 最多显示的行数，为None时不限制
+        """
+        self.beginResetModel()
+        self.generation += 1
+        self.query = {"kind": kind, "start_us": start_us, "end_us": end_us,
+                      "descending": descending, "limit": limit}
+        self.rows = []
+        self.cursor = None
+        self.exhausted = False
+        self.loading = False
+        self.total = None
+        self.error = None
+        self.endResetModel()
+        self.worker.request_count(self.generation, self.query)
+        self.fetchMore(QModelIndex())
+        self.loading_changed.emit()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS[self.query["kind"]])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[self.query["kind"]][section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if self.query["kind"] == "cycle" and column == 3:
+            return format_cycle_preview(decode_cycle(row[3]))
+        if self.query["kind"] == "raw" and column == 4:
+            raw_data = raw_payload_bytes(row[4]).hex()
+            return raw_data[:30] + ("..." if len(raw_data) > 30 else "")
+        return str(row[column])
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        """在后台请求下一页，页到达前不会重复请求"""
+        if not self.canFetchMore(parent):
+            return
+        page_size = self.PAGE_SIZE
+        if self.query["limit"] is not None:
+            page_size = min(page_size, self.query["limit"] - len(self.rows))
+        self.loading = True
+        self.worker.request_page(self.generation, self.query, self.cursor, page_size)
+
+    def on_page_loaded(self, generation, rows, cursor):
+        """追加后台加载的一页，过期查询的结果直接丢弃"""
+        if generation != self.generation:
+            return
+        page_size = self.PAGE_SIZE
+        if self.query["limit"] is not None:
+            page_size = min(page_size, self.query["limit"] - len(self.rows))
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+        self.cursor = cursor
+        self.loading = False
+        self.exhausted = len(rows) < page_size or (
+            self.query["limit"] is not None and len(self.rows) >= self.query["limit"])
+        self.loading_changed.emit()
+
+    def on_count_loaded(self, generation, total):
+        """记录后台统计的总行数"""
+        if generation != self.generation:
+            return
+        if self.query["limit"] is not None:
+            total = min(total, self.query["limit"])
+        self.total = total
+        self.loading_changed.emit()
+
+    def on_query_failed(self, generation, message):
+        """记录查询错误并停止继续加载"""
+        if generation != self.generation:
+            return
+        self.error = message
+        self.loading = False
+        self.exhausted = True
+        self.loading_changed.emit()
+
+
 class DatabaseViewDialog(QDialog):
-    """数据库查看对话框"""
+    """数据库查看对话框
+
+    表格使用QueryTableModel按页加载，查询和计数在后台线程中执行，
+    按时间范围查询上百万行时界面也不会卡顿。开始时间到结束时间的周期可以在后台流式导出。
+    """
+    # 导出文件对话框的过滤器和对应的导出格式
+    EXPORT_FILTERS = {
+        "CSV文件 (*.csv)": "csv",
+        "NumPy压缩文件 (*.npz)": "npz",
+        "分块列式文件 (*.gpdc)": "columnar",
+    }
+    
     def __init__(self, db_manager, parent=None):
         super().__init__(parent)
         self.db_manager = db_manager
+        self.query_worker = DatabaseQueryWorker(db_manager)
+        self.query_worker.start()
+        self.export_worker = None
         self.setWindowTitle("数据库数据查看")
         self.setMinimumSize(800, 600)
         
@@ -555,7 +1519,7 @@ class DatabaseViewDialog(QDialog):
         # 添加最新数据数量选择
         query_layout.addWidget(QLabel("最新数据数量:"), 1, 0)
         self.limit_spin = QSpinBox()
-        self.limit_spin.setRange(1, 1000)
+        self.limit_spin.setRange(1, 10000000)
         self.limit_spin.setValue(100)
         query_layout.addWidget(self.limit_spin, 1, 1)
         
@@ -585,13 +1549,39 @@ class DatabaseViewDialog(QDialog):
         self.generate_prpd_button.clicked.connect(self.view_historical_charts)
         query_layout.addWidget(self.generate_prpd_button, 1, 6)
         
+        # 添加长期趋势按钮：使用汇总统计，按开始/结束时间选择范围
+        self.trend_button = QPushButton("长期趋势")
+        self.trend_button.setToolTip("从汇总统计查看开始时间到结束时间的幅值和脉冲数趋势，时间范围可以很长")
+        self.trend_button.clicked.connect(self.view_long_term_trend)
+        query_layout.addWidget(self.trend_button, 0, 6)
+        
+        # 添加导出按钮：按开始/结束时间在后台流式导出周期数据
+        self.export_button = QPushButton("导出周期数据")
+        self.export_button.setToolTip("把开始时间到结束时间的全部周期导出为CSV、NPZ或分块列式文件，导出在后台进行")
+        self.export_button.clicked.connect(self.export_cycles)
+        query_layout.addWidget(self.export_button, 2, 6)
+        
+        # 导出进度和取消按钮，导出时才显示
+        self.export_progress = QProgressBar()
+        self.export_progress.setFormat("导出周期 %v/%m")
+        self.export_progress.setVisible(False)
+        query_layout.addWidget(self.export_progress, 2, 0, 1, 5)
+        self.cancel_export_button = QPushButton("取消导出")
+        self.cancel_export_button.clicked.connect(self.cancel_export)
+        self.cancel_export_button.setVisible(False)
+        query_layout.addWidget(self.cancel_export_button, 2, 5)
+        
         query_group.setLayout(query_layout)
         layout.addWidget(query_group)
         
-        # 创建数据表格
-        self.table = QTableWidget()
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        # 创建数据表格，行由模型按页加载
+        self.table_model = QueryTableModel(self.query_worker, self)
+        self.table_model.loading_changed.connect(self.update_status)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.verticalHeader().setDefaultSectionSize(self.table.fontMetrics().height() + 6)
         self.table.doubleClicked.connect(self.show_data_details)
         layout.addWidget(self.table)
         
@@ -599,9 +1589,6 @@ class DatabaseViewDialog(QDialog):
         self.status_label = QLabel()
         layout.addWidget(self.status_label)
         
-        # 存储查询结果
-        self.query_results = []
-        
         # 初始查询
         self.query_data()
     
@@ -612,26 +1599,145 @@ class DatabaseViewDialog(QDialog):
         self.end_time_edit.setEnabled(is_time_range)
         self.limit_spin.setEnabled(not is_time_range)
     
+    def done(self, result):
+        """关闭对话框时停止后台查询线程，并取消尚未完成的导出"""
+        self.query_worker.stop()
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            self.export_worker.wait()
+        super().done(result)
+    
+    def export_cycles(self):
+        """选择文件后在后台导出开始时间到结束时间的周期"""
+        if not self.db_manager or not self.db_manager.connected:
+            QMessageBox.warning(self, "无法导出", "数据库未连接。")
+            return
+        if self.export_worker is not None and self.export_worker.isRunning():
+            return
+        
+        start_text = self.start_time_edit.dateTime().toString("yyyy-MM-dd hh:mm:ss")
+        end_text = self.end_time_edit.dateTime().toString("yyyy-MM-dd hh:mm:ss")
+        default_filename = f"周期数据_{start_text[:10]}_{end_text[:10]}.csv"
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出周期数据", default_filename, ";;".join(self.EXPORT_FILTERS))
+        if not file_path:
+            return  # 用户取消了导出
+        self.start_export(file_path, timestamp_to_us(start_text), timestamp_to_us(end_text),
+                          self.EXPORT_FILTERS.get(selected_filter, "csv"))
+    
+    def start_export(self, file_path, start_us, end_us, export_format):
+        """启动后台导出
+
+        Args:
+            file_path: 目标文件路径，没有对应的扩展名时自动补上
+            start_us: 起始微秒时间戳（包含）
+            end_us: 结束微秒时间戳（包含）
+            export_format: 导出格式
+        """
+        extension = EXPORT_EXTENSIONS[export_format]
+        if not file_path.lower().endswith(extension):
+            file_path += extension
+        
+        self.export_worker = ExportWorker(self.db_manager, file_path, start_us, end_us, export_format)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.export_done.connect(self.on_export_done)
+        self.export_worker.export_cancelled.connect(self.on_export_cancelled)
+        self.export_worker.export_failed.connect(self.on_export_failed)
+        self.export_progress.setRange(0, 0)  # 统计周期数期间显示忙碌状态
+        self.export_progress.setVisible(True)
+        self.cancel_export_button.setVisible(True)
+        self.cancel_export_button.setEnabled(True)
+        self.export_button.setEnabled(False)
+        self.export_worker.start()
+    
+    def cancel_export(self):
+        """请求取消导出，当前一批写完后停止"""
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            self.cancel_export_button.setEnabled(False)
+    
+    def on_export_progress(self, exported, total):
+        """显示导出进度"""
+        self.export_progress.setRange(0, max(1, total))
+        self.export_progress.setValue(exported)
+    
+    def finish_export(self, message):
+        """导出结束后隐藏进度并显示结果"""
+        self.export_progress.setVisible(False)
+        self.cancel_export_button.setVisible(False)
+        self.export_button.setEnabled(True)
+        self.status_label.setText(message)
+    
+    def on_export_done(self, count, file_path):
+        """导出完成"""
+        self.finish_export(f"已导出 {count} 个周期到: {file_path}")
+    
+    def on_export_cancelled(self):
+        """导出已取消"""
+        self.finish_export("导出已取消")
+    
+    def on_export_failed(self, message):
+        """导出失败"""
+        self.finish_export(f"导出失败: {message}")
+        QMessageBox.critical(self, "导出失败", f"导出周期数据时发生错误:\n{message}")
+    
     def view_historical_charts(self):
         """从历史数据生成PRPD或PRPS图"""
         # 确保数据类型是周期数据
-        if self.data_type_combo.currentText() != "周期数据" or not self.query_results:
+        model = self.table_model
+        if model.query["kind"] != "cycle" or not model.rows:
             QMessageBox.warning(self, "无法生成图表", "请先查询周期数据，并确保有查询结果。")
             return
         
+        # 图表需要按时间从新到旧的周期，按时间范围查询的结果是从旧到新
+        rows = model.rows if model.query["descending"] else model.rows[::-1]
+        fetch_rows = None
+        if not model.exhausted:
+            # 表格只加载了一部分时，图表在后台线程中读取查询条件下的全部周期
+            db_manager = self.db_manager
+            if model.query["limit"] is not None:
+                limit = model.query["limit"]
+                fetch_rows = lambda: db_manager.get_latest_cycle_data(limit)
+            else:
+                time_range = self.query_time_range()
+                fetch_rows = lambda: db_manager.get_cycle_data_by_time(*time_range)[::-1]
+        
         # 创建新的对话框显示历史数据可视化
-        dialog = HistoricalChartsDialog(self.query_results, self)
+        dialog = HistoricalChartsDialog(rows, self, db_manager=self.db_manager,
+                                        time_range=self.query_time_range(), fetch_rows=fetch_rows)
+        dialog.exec()
+    
+    def query_time_range(self):
+        """按时间范围查询时返回所选的时间范围，否则返回None（使用查询结果的时间范围）"""
+        if self.query_type_combo.currentIndex() != 1:
+            return None
+        return (self.start_time_edit.dateTime().toString("yyyy-MM-dd hh:mm:ss"),
+                self.end_time_edit.dateTime().toString("yyyy-MM-dd hh:mm:ss"))
+    
+    def view_long_term_trend(self):
+        """直接从汇总统计查看所选时间范围的长期趋势，不需要先查询周期数据"""
+        time_range = (self.start_time_edit.dateTime().toString("yyyy-MM-dd hh:mm:ss"),
+                      self.end_time_edit.dateTime().toString("yyyy-MM-dd hh:mm:ss"))
+        db_manager = self.db_manager
+
+        def fetch_rows():
+            # 在后台线程中等待写入队列落盘，加载完成后重绘的趋势才包含最新数据
+            db_manager.flush()
+            return []
+        dialog = HistoricalChartsDialog([], self, db_manager=db_manager, time_range=time_range,
+                                        fetch_rows=fetch_rows)
+        dialog.chart_type_combo.setCurrentText("长期趋势")
         dialog.exec()
     
     def show_data_details(self, index):
         """显示数据详情"""
         row = index.row()
-        if row < 0 or row >= len(self.query_results):
+        if row < 0 or row >= len(self.table_model.rows):
             return
             
         # 获取数据
-        data_row = self.query_results[row]
-        data_type = self.data_type_combo.currentText()
+        data_row = self.table_model.rows[row]
+        data_type = "周期数据" if self.table_model.query["kind"] == "cycle" else "原始数据"
         
         # 创建详情对话框
         detail_dialog = QDialog(self)
@@ -654,8 +1760,7 @@ class DatabaseViewDialog(QDialog):
             data_group = QGroupBox("数据内容")
             data_layout = QVBoxLayout()
             
-            data_str = data_row[3]
-            data_points = data_str.split(',')
+            data_points = decode_cycle(data_row[3])
             
             # 创建数据表格
             data_table = QTableWidget()
@@ -665,7 +1770,7 @@ class DatabaseViewDialog(QDialog):
             
             for i, point in enumerate(data_points):
                 data_table.setItem(i, 0, QTableWidgetItem(str(i)))
-                data_table.setItem(i, 1, QTableWidgetItem(point))
+                data_table.setItem(i, 1, QTableWidgetItem(str(point)))
             
             data_layout.addWidget(data_table)
             data_group.setLayout(data_layout)
@@ -687,7 +1792,7 @@ class DatabaseViewDialog(QDialog):
             data_group = QGroupBox("原始数据")
             data_layout = QVBoxLayout()
             
-            raw_data = str(data_row[4])
+            raw_data = raw_payload_bytes(data_row[4]).hex()  # 以十六进制显示
             data_text = QLabel(raw_data)
             data_text.setWordWrap(True)
             data_text.setTextInteractionFlags(Qt.TextSelectableByMouse)
@@ -714,101 +1819,167 @@ class DatabaseViewDialog(QDialog):
         detail_dialog.exec()
     
     def query_data(self):
-        """根据选择的选项查询数据"""
-        data_type = self.data_type_combo.currentText()
-        query_type = self.query_type_combo.currentText()
-        limit = self.limit_spin.value()
-        
-        # 获取时间范围
-        start_time = self.start_time_edit.dateTime().toString("yyyy-MM-dd hh:mm:ss")
-        end_time = self.end_time_edit.dateTime().toString("yyyy-MM-dd hh:mm:ss")
-        
-        # 清空表格和结果
-        self.table.clear()
-        self.table.setRowCount(0)
-        self.query_results = []
-        
+        """根据选择的选项开始查询，行由表格模型在后台按页加载"""
         if not self.db_manager or not self.db_manager.connected:
             self.status_label.setText("数据库未连接")
             return
         
-        try:
-            # 根据数据类型查询
-            if data_type == "周期数据":
-                # 设置表头
-                self.table.setColumnCount(4)
-                self.table.setHorizontalHeaderLabels(["ID", "时间戳", "周期编号", "数据(前10个点)"])
-                
-                # 查询数据
-                data = []
-                if query_type == "最新数据":
-                    data = self.db_manager.get_latest_cycle_data(limit)
-                else:  # 按时间范围
-                    data = self.db_manager.get_cycle_data_by_time(start_time, end_time)
-                
-                # 保存查询结果
-                self.query_results = data
-                
-                # 填充表格
-                self.table.setRowCount(len(data))
-                for i, row in enumerate(data):
-                    self.table.setItem(i, 0, QTableWidgetItem(str(row[0])))
-                    self.table.setItem(i, 1, QTableWidgetItem(str(row[1])))
-                    self.table.setItem(i, 2, QTableWidgetItem(str(row[2])))
-                    
-                    # 显示数据的前10个点
-                    data_str = row[3]
-                    data_points = data_str.split(',')
-                    preview = ','.join(data_points[:10])
-                    if len(data_points) > 10:
-                        preview += "..."
-                    self.table.setItem(i, 3, QTableWidgetItem(preview))
-                
-                self.status_label.setText(f"已查询到 {len(data)} 条周期数据")
-            
-            else:  # 原始数据
-                # 设置表头
-                self.table.setColumnCount(5)
-                self.table.setHorizontalHeaderLabels(["ID", "时间戳", "Broker", "主题", "原始数据(前30个字符)"])
-                
-                # 查询数据
-                data = self.db_manager.get_raw_data(limit)
-                
-                # 保存查询结果
-                self.query_results = data
-                
-                # 填充表格
-                self.table.setRowCount(len(data))
-                for i, row in enumerate(data):
-                    self.table.setItem(i, 0, QTableWidgetItem(str(row[0])))
-                    self.table.setItem(i, 1, QTableWidgetItem(str(row[1])))
-                    self.table.setItem(i, 2, QTableWidgetItem(str(row[2])))
-                    self.table.setItem(i, 3, QTableWidgetItem(str(row[3])))
-                    
-                    # 显示原始数据的前30个字符
-                    raw_data = str(row[4])
-                    preview = raw_data[:30]
-                    if len(raw_data) > 30:
-                        preview += "..."
-                    self.table.setItem(i, 4, QTableWidgetItem(preview))
-                
-                self.status_label.setText(f"已查询到 {len(data)} 条原始数据")
-            
-            # 调整列宽
+        kind = "cycle" if self.data_type_combo.currentText() == "周期数据" else "raw"
+        time_range = self.query_time_range()
+        if time_range is None:
+            # 最新数据：从新到旧，最多limit行
+            self.table_model.start(kind, limit=self.limit_spin.value())
+        else:
+            # 按时间范围：从旧到新，不限制行数，滚动时继续加载
+            start_us, end_us = (timestamp_to_us(text) for text in time_range)
+            self.table_model.start(kind, start_us, end_us, descending=False)
+    
+    def update_status(self):
+        """显示已加载的行数和后台统计的总行数"""
+        model = self.table_model
+        name = "周期数据" if model.query["kind"] == "cycle" else "原始数据"
+        if model.error is not None:
+            self.status_label.setText(f"查询数据错误: {model.error}")
+            return
+        text = f"已加载 {len(model.rows)} 条{name}"
+        if model.total is not None:
+            text += f"，共 {model.total} 条"
+        if model.loading:
+            text += "（加载中...）"
+        elif not model.exhausted:
+            text += "，滚动到末尾继续加载"
+        self.status_label.setText(text)
+        if len(model.rows) <= QueryTableModel.PAGE_SIZE and not model.loading:
             self.table.resizeColumnsToContents()
+
+class HistoryLoader(QThread):
+    """在后台线程中读取并解码历史周期，结果缓存为矩阵
+
+    查询结果按时间从新到旧，先解码最新的一批周期并发出partial_loaded，
+    界面可以先绘制默认范围的图表；全部解码后发出loaded。
+    """
+    CHUNK_ROWS = 2000  # 每批解码的周期数，每批之后报告进度
+
+    progress = Signal(int, int)  # 信号：已解码的周期数、总周期数
+    partial_loaded = Signal(object)  # 信号：最新一批周期的解码结果（格式同decode_rows）
+    loaded = Signal(object)  # 信号：全部周期的解码结果
+    failed = Signal(str)  # 信号：读取或解码错误
+
+    def __init__(self, rows, fetch_rows=None, db_manager=None):
+        """初始化
+
+        Args:
+            rows: 周期数据行，按时间从新到旧
+            fetch_rows: 在后台线程中读取周期数据行的函数（返回值同rows），为None时使用rows
+            db_manager: fetch_rows使用的数据库管理器，线程结束前关闭本线程的只读连接
+        """
+        super().__init__()
+        self.rows = rows
+        self.fetch_rows = fetch_rows
+        self.db_manager = db_manager
+        self._cancelled = False
+
+    @staticmethod
+    def decode_rows(rows):
+        """解码周期数据行
+
+        Args:
+            rows: 周期数据行，按时间从新到旧
+
+        Returns:
+            dict: cycles（周期数 × 点数的float32矩阵，从旧到新，点数不足的周期末尾为NaN）、
+                widths（每个周期的点数）、cycle_numbers（周期编号）、time_range（最早和最新的时间戳文本）
+        """
+        cycles, widths = stack_cycles([decode_cycle(row[3]) for row in reversed(rows)])
+        return {
+            "cycles": cycles,
+            "widths": widths,
+            "cycle_numbers": [row[2] for row in reversed(rows)],
+            "time_range": (rows[-1][1], rows[0][1]) if rows else None,
+        }
+
+    def cancel(self):
+        """停止解码并等待线程结束"""
+        self._cancelled = True
+        self.wait()
+
+    def run(self):
+        try:
+            rows = self.fetch_rows() if self.fetch_rows is not None else self.rows
+            total = len(rows)
+            self.progress.emit(0, total)
+            parts = []
+            for start in range(0, total, self.CHUNK_ROWS):
+                if self._cancelled:
+                    return
+                chunk = rows[start:start + self.CHUNK_ROWS]
+                parts.append((stack_cycles([decode_cycle(row[3]) for row in reversed(chunk)]),
+                              [row[2] for row in reversed(chunk)]))
+                if start == 0 and total > self.CHUNK_ROWS:
+                    (cycles, widths), numbers = parts[0]
+                    self.partial_loaded.emit({"cycles": cycles, "widths": widths, "cycle_numbers": numbers,
+                                              "time_range": (chunk[-1][1], chunk[0][1])})
+                self.progress.emit(min(start + self.CHUNK_ROWS, total), total)
             
+            # 各批从新到旧排列，合并时反过来并补齐点数
+            parts.reverse()
+            width = max((cycles.shape[1] for (cycles, _), _ in parts), default=0)
+            matrix = np.full((total, width), np.nan, dtype=np.float32)
+            widths = np.zeros(total, dtype=np.int64)
+            numbers = []
+            offset = 0
+            for (cycles, part_widths), part_numbers in parts:
+                matrix[offset:offset + len(cycles), :cycles.shape[1]] = cycles
+                widths[offset:offset + len(cycles)] = part_widths
+                numbers.extend(part_numbers)
+                offset += len(cycles)
+            self.loaded.emit({"cycles": matrix, "widths": widths, "cycle_numbers": numbers,
+                              "time_range": (rows[-1][1], rows[0][1]) if rows else None})
         except Exception as e:
-            self.status_label.setText(f"查询数据错误: {str(e)}")
+            self.failed.emit(str(e))
+        finally:
+            if self.db_manager is not None and self.fetch_rows is not None:
+                self.db_manager.close_thread_connections()
+
 
 class HistoricalChartsDialog(QDialog):
-    """历史数据可视化对话框"""
-    def __init__(self, data, parent=None):
+    """历史数据可视化对话框
+
+    PRPD/PRPS图使用查询到的周期；长期趋势和PRPD统计图从数据库的汇总统计读取，
+    时间范围可以长达数月甚至数年。
+    
+    查询到的周期只解码一次，缓存为按时间从早到晚排列的矩阵（周期1是最早的数据），
+    周期较多时在后台线程中解码并显示进度；修改数据范围只对缓存的矩阵切片。
+    数据点较多时先绘制抽稀的预览，稍后再绘制完整的图表。
+    """
+    # 使用汇总统计的图表类型
+    ROLLUP_CHART_TYPES = ("长期趋势", "PRPD统计图")
+    PREVIEW_POINTS = 20000  # PRPD图超过此点数时先绘制预览
+    PREVIEW_COLUMNS = 60  # PRPS图的相位点数超过此数时先绘制预览
+    # PRPS瀑布图的图表类型及对应的WaterfallPRPSRenderer显示方式，绘制较快，不需要预览
+    WATERFALL_CHART_TYPES = {"PRPS热力瀑布图": "热力瀑布图", "PRPS堆叠线瀑布图": "堆叠线瀑布图"}
+    WATERFALL_MAX_CYCLES = 500  # 瀑布图最多显示的周期数（三维图为prps_max_cycles）
+    DETAIL_DELAY_MS = 150  # 预览之后绘制完整图表的延迟，期间的新修改只重绘预览
+    
+    def __init__(self, data, parent=None, db_manager=None, time_range=None, fetch_rows=None):
+        """初始化
+
+        Args:
+            data: 查询到的周期数据行，按时间从新到旧
+            parent: 父窗口
+            db_manager: 数据库管理器，用于读取汇总统计
+            time_range: (起始时间文本, 结束时间文本)，为None时使用查询结果的时间范围
+            fetch_rows: 在后台线程中读取周期数据行的函数（返回值同data），为None时使用data
+        """
         super().__init__(parent)
+        self.db_manager = db_manager
+        self.time_range = time_range
         self.setWindowTitle("历史数据可视化")
         self.setMinimumSize(1000, 700)  # 增加对话框尺寸以容纳3D图
-        # 反转数据顺序，使其按照时间戳升序排列（从早到晚）
-        # 这样在PRPS图中，周期1将是最早的数据，周期N将是最新的数据
-        self.data = list(reversed(data))
+        self.history = None  # 解码后的周期矩阵（见HistoryLoader.decode_rows），加载完成前为None
+        self.history_complete = False
+        self.loader = None
+        total = len(data)
         
         # 单位设置
         self.use_dbm = True  # 默认使用dBm单位
@@ -827,18 +1998,26 @@ class HistoricalChartsDialog(QDialog):
         # 添加图表类型选择
         settings_layout.addWidget(QLabel("图表类型:"), 0, 0)
         self.chart_type_combo = QComboBox()
-        self.chart_type_combo.addItems(["PRPD散点图", "PRPD颜色散点图", "PRPD线图", "PRPS三维图"])
+        self.chart_type_combo.addItems(["PRPD散点图", "PRPD颜色散点图", "PRPD线图", "PRPS三维图"]
+                                       + list(self.WATERFALL_CHART_TYPES) + list(self.ROLLUP_CHART_TYPES))
         self.chart_type_combo.currentIndexChanged.connect(self.update_chart)
         settings_layout.addWidget(self.chart_type_combo, 0, 1)
         
         # 添加数据范围选择
         settings_layout.addWidget(QLabel("数据范围:"), 0, 2)
         self.range_spin = QSpinBox()
-        self.range_spin.setRange(1, len(self.data))
-        self.range_spin.setValue(min(50, len(self.data)))  # 默认显示50个周期或全部
+        self.range_spin.setRange(1, max(1, total))
+        self.range_spin.setValue(min(50, max(1, total)))  # 默认显示50个周期或全部
         self.range_spin.valueChanged.connect(self.update_chart)
         settings_layout.addWidget(self.range_spin, 0, 3)
-        settings_layout.addWidget(QLabel(f"/ {len(self.data)} 周期"), 0, 4)
+        self.total_label = QLabel(f"/ {total} 周期")
+        settings_layout.addWidget(self.total_label, 0, 4)
+        
+        # 后台解码的进度
+        self.load_progress = QProgressBar()
+        self.load_progress.setFormat("解码周期 %v/%m")
+        self.load_progress.setVisible(False)
+        settings_layout.addWidget(self.load_progress, 1, 2, 1, 3)
         
         # 添加显示参考正弦波选项
         self.show_sine_checkbox = QCheckBox("显示参考正弦波")
@@ -892,9 +2071,64 @@ class HistoricalChartsDialog(QDialog):
         self.axes_3d = None
         self.colorbar = None
         
+        # 预览之后延迟绘制完整图表
+        self.detail_timer = QTimer(self)
+        self.detail_timer.setSingleShot(True)
+        self.detail_timer.setInterval(self.DETAIL_DELAY_MS)
+        self.detail_timer.timeout.connect(self.draw_detail)
+        
+        # 周期不多时直接解码，否则在后台线程中读取和解码
+        if fetch_rows is None and total <= HistoryLoader.CHUNK_ROWS:
+            self.history = HistoryLoader.decode_rows(data)
+            self.history_complete = True
+        else:
+            self.loader = HistoryLoader(data, fetch_rows, db_manager)
+            self.loader.progress.connect(self.on_load_progress)
+            self.loader.partial_loaded.connect(self.on_history_partial)
+            self.loader.loaded.connect(self.on_history_loaded)
+            self.loader.failed.connect(self.on_history_failed)
+            self.load_progress.setVisible(True)
+            self.loader.start()
+        
         # 绘制初始图表
         self.update_chart()
     
+    def done(self, result):
+        """关闭对话框时停止后台解码"""
+        self.detail_timer.stop()
+        if self.loader is not None:
+            self.loader.cancel()
+        super().done(result)
+    
+    def on_load_progress(self, decoded, total):
+        """显示解码进度，总周期数确定后更新数据范围"""
+        if self.range_spin.maximum() != max(1, total):
+            self.range_spin.blockSignals(True)
+            self.range_spin.setRange(1, max(1, total))
+            self.range_spin.setValue(min(50, max(1, total)))
+            self.range_spin.blockSignals(False)
+            self.total_label.setText(f"/ {total} 周期")
+        self.load_progress.setRange(0, max(1, total))
+        self.load_progress.setValue(decoded)
+    
+    def on_history_partial(self, history):
+        """最新一批周期解码后先绘制图表"""
+        if not self.history_complete:
+            self.history = history
+            self.update_chart()
+    
+    def on_history_loaded(self, history):
+        """全部周期解码后重绘图表"""
+        self.history = history
+        self.history_complete = True
+        self.load_progress.setVisible(False)
+        self.update_chart()
+    
+    def on_history_failed(self, message):
+        """显示读取或解码错误"""
+        self.load_progress.setVisible(False)
+        QMessageBox.warning(self, "加载失败", f"读取历史数据时发生错误:\n{message}")
+    
     def toggle_unit(self):
         """切换单位显示（毫伏mV和dBm）"""
         self.use_dbm = not self.use_dbm
@@ -921,10 +2155,10 @@ class HistoricalChartsDialog(QDialog):
         """
         if to_dbm:
             # 毫伏转dBm: 毫伏值*54.545-81.818
-            return value * 54.545 - 81.818
+            return mv_to_dbm(value)
         else:
             # dBm转毫伏: (dBm值+81.818)/54.545
-            return (value + 81.818) / 54.545
+            return dbm_to_mv(value)
 
     def get_axis_range(self):
         """根据当前单位获取轴范围
@@ -967,52 +2201,152 @@ class HistoricalChartsDialog(QDialog):
         根据给定的颜色列表创建自定义颜色映射
         
         :param colors: 颜色列表，至少包含4种颜色
-        :return: matplotlib颜色映射对象
+        :return: matplotlib颜色映射对象（按颜色方案缓存，各图表共享，不要修改）
+        """
+        return shared_cache.colormap(colors)
+    
+    def get_time_range(self):
+        """汇总统计图表的时间范围
+
+        Returns:
+            tuple: (起始时间文本, 结束时间文本)，无法确定时返回None
+        """
+        if self.time_range is not None:
+            return self.time_range
+        if self.history is None:
+            return None
+        return self.history["time_range"]
+    
+    def draw_rollup_chart(self, chart_type, show_sine_wave):
+        """绘制使用汇总统计的长期趋势图或PRPD统计图"""
+        self.axes_2d = self.figure.add_subplot(111)
+        time_range = self.get_time_range()
+        if self.db_manager is None or time_range is None:
+            self.axes_2d.text(0.5, 0.5, "没有可用的汇总统计", ha='center', va='center')
+            return
+        
+        is_trend = chart_type == "长期趋势"
+        try:
+            resolution, rollups = self.db_manager.get_rollups(*time_range, with_histogram=not is_trend)
+        except ValueError:
+            rollups = None  # 时间戳格式无法识别
+        if rollups is None or not len(rollups["start_us"]):
+            self.axes_2d.text(0.5, 0.5, "该时间范围内没有汇总统计", ha='center', va='center')
+            return
+        
+        resolution_text = {1: "1秒", 60: "1分钟", 3600: "1小时"}.get(resolution, f"{resolution}秒")
+        if is_trend:
+            self.draw_trend(rollups, resolution_text)
+        else:
+            self.draw_rollup_prpd(rollups, resolution_text, show_sine_wave)
+    
+    def draw_trend(self, rollups, resolution_text):
+        """绘制每个时间桶的最大/平均幅值和脉冲数随时间的变化"""
+        times = rollups["start_us"].astype('datetime64[us]')
+        with warnings.catch_warnings():
+            # 没有采样点的相位分箱为NaN
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            max_values = to_display_unit(np.nanmax(rollups["max_amplitude"], axis=1).astype(np.float64),
+                                         self.use_dbm)
+            mean_values = to_display_unit(np.nanmean(rollups["mean_amplitude"], axis=1).astype(np.float64),
+                                          self.use_dbm)
+        
+        self.axes_2d.plot(times, max_values, 'r-', linewidth=1.0, label="最大幅值")
+        self.axes_2d.plot(times, mean_values, 'b-', linewidth=1.0, label="平均幅值")
+        self.axes_2d.set_ylabel(self.unit_label)
+        y_min, y_max = self.get_axis_range()
+        self.axes_2d.set_ylim(y_min, y_max)
+        
+        pulse_axes = self.axes_2d.twinx()
+        pulse_axes.fill_between(times, rollups["pulse_count"], step="post", color='gray', alpha=0.3,
+                                label="脉冲数")
+        pulse_axes.set_ylabel("脉冲数")
+        
+        self.axes_2d.set_title(f"长期趋势 (分辨率{resolution_text}, {len(times)}个时间段, "
+                               f"{int(rollups['cycle_count'].sum())}个周期)")
+        self.axes_2d.set_xlabel("时间")
+        self.axes_2d.legend(loc='upper left')
+        self.axes_2d.grid(True, linestyle='--', alpha=0.7)
+        self.figure.autofmt_xdate()
+    
+    def draw_rollup_prpd(self, rollups, resolution_text, show_sine_wave):
+        """把时间范围内所有时间桶的相位×幅值计数合计后绘制为密度图"""
+        counts = rollups["histogram"]
+        color_scheme_name = self.color_scheme_combo.currentText()
+        custom_cmap = self.create_custom_colormap(self.color_schemes[color_scheme_name])
+        
+        # 汇总统计的幅值范围正好对应-50到0 dBm，dBm与毫伏是线性关系
+        y_min, y_max = self.get_axis_range()
+        self.axes_2d.imshow(np.ma.masked_equal(counts, 0), origin='lower', aspect='auto',
+                            extent=(0, 360, y_min, y_max), cmap=custom_cmap, interpolation='nearest')
+        
+        if show_sine_wave:
+            sine_amp, sine_offset = self.get_sine_wave_params()
+            x_sine, y_sine = shared_cache.sine_overlay(sine_amp, sine_offset)
+            self.axes_2d.plot(x_sine, y_sine, 'r-', linewidth=1.5, alpha=0.7, label="参考正弦波")
+        
+        self.axes_2d.set_title(f"PRPD统计图 (分辨率{resolution_text}, {int(rollups['cycle_count'].sum())}个周期)")
+        self.axes_2d.set_xlabel("相位")
+        self.axes_2d.set_ylabel(self.unit_label)
+        self.axes_2d.set_xlim(0, 360)
+        self.axes_2d.set_ylim(y_min, y_max)
+        self.axes_2d.grid(True, linestyle='--', alpha=0.7)
+    
+    def update_chart(self, *args):
+        """更新图表，数据点较多时先绘制预览"""
+        self.detail_timer.stop()
+        preview = self.needs_preview()
+        self.render_chart(preview)
+        if preview:
+            self.detail_timer.start()
+    
+    def draw_detail(self):
+        """预览之后绘制完整的图表"""
+        self.render_chart(False)
+    
+    def selected_cycles(self):
+        """数据范围内最新的周期（缓存矩阵的切片，不拷贝）
+
+        Returns:
+            tuple: (周期矩阵, 每个周期的点数, 周期编号列表)
         """
-        import matplotlib.colors as mcolors
-        
-        # 确保有足够的颜色
-        if len(colors) < 4:
-            colors = colors + ['#FF0000']  # 默认添加红色
-        
-        # 创建颜色映射
-        n_bins = 100  # 颜色渐变的细腻程度
-        cmap = mcolors.LinearSegmentedColormap.from_list(
-            'custom_colormap', 
-            [mcolors.to_rgba(color) for color in colors[:4]], 
-            N=n_bins
-        )
-        
-        return cmap
+        count = min(self.range_spin.value(), len(self.history["cycles"]))
+        if count == 0:
+            return self.history["cycles"][:0], self.history["widths"][:0], []
+        return (self.history["cycles"][-count:], self.history["widths"][-count:],
+                self.history["cycle_numbers"][-count:])
+    
+    def needs_preview(self):
+        """当前图表的数据点是否多到需要先绘制预览"""
+        chart_type = self.chart_type_combo.currentText()
+        if self.history is None or chart_type in self.ROLLUP_CHART_TYPES or chart_type in self.WATERFALL_CHART_TYPES:
+            return False
+        cycles, widths, _ = self.selected_cycles()
+        if chart_type == "PRPS三维图":
+            return cycles.shape[1] > self.PREVIEW_COLUMNS
+        return int(widths.sum()) > self.PREVIEW_POINTS
     
-    def update_chart(self):
-        """更新图表"""
+    def render_chart(self, preview):
+        """绘制图表
+
+        Args:
+            preview: 为True时绘制抽稀的预览
+        """
         # 获取设置
         chart_type = self.chart_type_combo.currentText()
-        data_range = self.range_spin.value()
+        
+        # 汇总统计图表不需要解码查询到的周期
+        if chart_type in self.ROLLUP_CHART_TYPES:
+            self.figure.clear()
+            self.colorbar = None
+            self.figure.subplots_adjust(left=0.12, right=0.88, top=0.9, bottom=0.15)
+            self.draw_rollup_chart(chart_type, self.show_sine_checkbox.isChecked())
+            self.canvas.draw()
+            return
+
         show_sine_wave = self.show_sine_checkbox.isChecked()
         color_scheme = self.color_scheme_combo.currentText()
         
-        # 确保数据范围不超过实际数据量
-        data_range = min(data_range, len(self.data))
-        
-        # 从查询结果中准备数据
-        all_data = []
-        cycle_labels = []
-        
-        # 只使用最新的N个数据点（根据范围设置）
-        selected_data = self.data[-data_range:]
-        
-        for row in selected_data:
-            # 周期数据存储在第3列(索引为2)
-            cycle_number = row[2]
-            cycle_labels.append(f"周期 {cycle_number}")
-            
-            # 数据字符串存储在第4列(索引为3)
-            data_str = row[3]
-            data_points = [float(point) for point in data_str.split(',')]
-            all_data.append(data_points)
-        
         # 清除当前图表并重新创建
         self.figure.clear()
         
@@ -1027,46 +2361,62 @@ class HistoricalChartsDialog(QDialog):
         # 统一设置布局参数，使用较宽的边距确保图表美观
         self.figure.subplots_adjust(left=0.12, right=0.88, top=0.9, bottom=0.12)
         
+        if self.history is None:
+            # 后台仍在读取和解码
+            self.axes_2d = self.figure.add_subplot(111)
+            self.axes_2d.text(0.5, 0.5, "正在加载历史数据...", ha='center', va='center')
+            self.canvas.draw()
+            return
+        
+        # 只使用最新的N个周期（根据范围设置），直接取缓存矩阵的切片
+        cycles, widths, cycle_numbers = self.selected_cycles()
+        cycle_labels = [f"周期 {cycle_number}" for cycle_number in cycle_numbers]
+        
         if chart_type == "PRPS三维图":
             # 创建3D图
             self.axes_3d = self.figure.add_subplot(111, projection='3d')
-            self.draw_prps(all_data, cycle_labels, color_scheme)
+            self.draw_prps(cycles, widths, cycle_labels, color_scheme, preview)
+        elif chart_type in self.WATERFALL_CHART_TYPES:
+            self.axes_2d = self.figure.add_subplot(111)
+            self.draw_prps_waterfall(cycles, widths, color_scheme, self.WATERFALL_CHART_TYPES[chart_type])
         else:
             # 创建2D图
             self.axes_2d = self.figure.add_subplot(111)
-            self.draw_prpd(all_data, cycle_labels, chart_type, show_sine_wave)
+            self.draw_prpd(cycles, widths, cycle_labels, chart_type, show_sine_wave, preview)
         
         # 重绘画布
         self.canvas.draw()
     
-    def draw_prpd(self, all_data, cycle_labels, chart_type, show_sine_wave):
-        """绘制PRPD图"""
-        if not all_data:
+    def draw_prpd(self, cycles, widths, cycle_labels, chart_type, show_sine_wave, preview=False):
+        """绘制PRPD图
+
+        Args:
+            cycles: 周期矩阵，点数不足的周期末尾为NaN
+            widths: 每个周期的点数
+            cycle_labels: 周期标签
+            chart_type: 图表类型
+            show_sine_wave: 是否显示参考正弦波
+            preview: 为True时按周期抽稀到约PREVIEW_POINTS个点
+        """
+        if len(cycles) == 0:
             self.axes_2d.text(0.5, 0.5, "没有数据可显示", ha='center', va='center')
             return
+        cycle_count = len(cycles)
+        if preview:
+            # 每隔若干个周期取一个，保留最新的周期
+            step = max(1, int(np.ceil(widths.sum() / self.PREVIEW_POINTS)))
+            cycles, widths = cycles[::-1][::step][::-1], widths[::-1][::step][::-1]
+            cycle_labels = cycle_labels[::-1][::step][::-1]
             
-        # 合并所有周期的数据用于绘图
-        flattened_data = []
-        x_data = []
+        # 每个周期的相位按各自的点数均匀分布在0-360度（历史周期的点数可能不同）
+        columns = np.arange(cycles.shape[1])
+        phases = columns * (360.0 / np.maximum(widths - 1, 1))[:, None]
+        valid = columns < widths[:, None]
+        x_data = phases[valid]
         
-        for i, cycle_data in enumerate(all_data):
-            cycle_phases = np.linspace(0, 360, len(cycle_data))
-            flattened_data.extend(cycle_data)
-            x_data.extend(cycle_phases)
-        
-        # 根据当前单位设置转换数据
-        if self.use_dbm:
-            display_data = []
-            for cycle_data in all_data:
-                display_data.append([self.convert_unit(x, True) for x in cycle_data])
-            
-            # 合并所有周期的转换后数据
-            all_display_data = []
-            for cycle_data in display_data:
-                all_display_data.extend(cycle_data)
-        else:
-            display_data = all_data
-            all_display_data = flattened_data
+        # 根据当前单位设置转换数据，整个矩阵一次数组运算
+        display_matrix = to_display_unit(cycles.astype(np.float64), self.use_dbm)
+        all_display_data = display_matrix[valid]
         
         if chart_type == "PRPD散点图":
             self.axes_2d.scatter(x_data, all_display_data, alpha=0.7, s=10)
@@ -1086,10 +2436,11 @@ class HistoricalChartsDialog(QDialog):
             # colorbar.set_label(self.unit_label)
         elif chart_type == "PRPD线图":
             # 对于线图，按周期分别绘制
-            for i, cycle_data in enumerate(display_data):
-                cycle_phases = np.linspace(0, 360, len(cycle_data))
+            for i, width in enumerate(widths):
+                cycle_data = display_matrix[i, :width]
+                cycle_phases = phases[i, :width]
                 # 仅当周期数不多时显示图例
-                if len(display_data) <= 10:
+                if len(widths) <= 10:
                     self.axes_2d.plot(cycle_phases, cycle_data, linewidth=1.0, 
                               label=cycle_labels[i])
                 else:
@@ -1100,15 +2451,17 @@ class HistoricalChartsDialog(QDialog):
             # 获取正弦波参数
             sine_amp, sine_offset = self.get_sine_wave_params()
 
-            # 生成正弦波数据
-            x_sine = np.linspace(0, 360, 1000)
-            y_sine = sine_amp * np.sin(x_sine * 2 * np.pi / 360) + sine_offset
+            # 正弦波数据只随单位变化，从缓存中取出
+            x_sine, y_sine = shared_cache.sine_overlay(sine_amp, sine_offset)
 
             # 绘制正弦波
             self.axes_2d.plot(x_sine, y_sine, 'r-', linewidth=1.5, alpha=0.7, label="参考正弦波")
 
         # 设置图表标题和轴标签
-        self.axes_2d.set_title(f"PRPD图 ({len(all_data)}个周期)")
+        title = f"PRPD图 ({cycle_count}个周期)"
+        if preview:
+            title += f" 预览：每{step}个周期取1个"
+        self.axes_2d.set_title(title)
         self.axes_2d.set_xlabel("相位 )")
         self.axes_2d.set_ylabel(self.unit_label)
 
@@ -1119,8 +2472,16 @@ class HistoricalChartsDialog(QDialog):
         # 设置网格
         self.axes_2d.grid(True, linestyle='--', alpha=0.7)
     
-    def draw_prps(self, all_data, cycle_labels, color_scheme):
-        """绘制PRPS三维图"""
+    def draw_prps(self, cycles, widths, cycle_labels, color_scheme, preview=False):
+        """绘制PRPS三维图
+
+        Args:
+            cycles: 周期矩阵，点数不足的周期末尾为NaN
+            widths: 每个周期的点数
+            cycle_labels: 周期标签
+            color_scheme: 颜色方案名称
+            preview: 为True时相位方向抽稀到约PREVIEW_COLUMNS个点
+        """
         # 清除当前3D图并重新创建
         self.figure.delaxes(self.axes_3d)
         self.axes_3d = self.figure.add_subplot(111, projection='3d')
@@ -1136,42 +2497,23 @@ class HistoricalChartsDialog(QDialog):
             pass
         
         # 只使用PRPS需要的最新周期数
-        prps_data = all_data[-self.prps_max_cycles:] if len(all_data) > self.prps_max_cycles else all_data
+        prps_cycles = cycles[-self.prps_max_cycles:]
+        prps_widths = widths[-self.prps_max_cycles:]
         
         # 准备数据
-        num_cycles = len(prps_data)
+        num_cycles = len(prps_cycles)
         if num_cycles == 0:
             return
             
-        # 找到所有周期中最大的数据点数
-        max_points = max(len(cycle_data) for cycle_data in prps_data)
-        
-        # 创建规则网格
-        phase = np.linspace(0, 360, max_points)
-        cycles = np.arange(1, num_cycles + 1)
-        
-        # 创建空的Z值矩阵
-        z_data = np.zeros((num_cycles, max_points))
-        
-        # 填充Z值矩阵
-        for i, cycle_data in enumerate(prps_data):
-            # 对于每个周期，我们需要将数据重采样到max_points个点
-            if len(cycle_data) == max_points:
-                z_data[i, :] = cycle_data
-            else:
-                # 如果周期的数据点数不等于max_points，则需要重采样
-                cycle_phases = np.linspace(0, 360, len(cycle_data))
-                z_data[i, :] = np.interp(phase, cycle_phases, cycle_data)
-        
-        # 根据当前单位设置转换数据
-        if self.use_dbm:
-            # 转换z_data中的每个值
-            for i in range(z_data.shape[0]):
-                for j in range(z_data.shape[1]):
-                    z_data[i, j] = self.convert_unit(z_data[i, j], True)
+        # Z值矩阵（显示单位）
+        z_data = self.prps_display_matrix(prps_cycles, prps_widths)
+        max_points = z_data.shape[1]
         
-        # 创建网格
-        X, Y = np.meshgrid(phase, cycles)
+        # 规则网格从缓存中取出，预览时相位方向抽稀
+        X, Y = shared_cache.meshgrid(max_points, num_cycles)
+        if preview and max_points > self.PREVIEW_COLUMNS:
+            columns = np.linspace(0, max_points - 1, self.PREVIEW_COLUMNS).round().astype(int)
+            X, Y, z_data = X[:, columns], Y[:, columns], z_data[:, columns]
         
         # 创建自定义颜色映射
         custom_cmap = self.create_custom_colormap(self.color_schemes[color_scheme])
@@ -1186,7 +2528,7 @@ class HistoricalChartsDialog(QDialog):
         #                                   shrink=0.6, aspect=10, pad=0.02)
         
         # 设置图表标题和轴标签
-        self.axes_3d.set_title(f"历史PRPS图 ({num_cycles}个周期)")
+        self.axes_3d.set_title(f"历史PRPS图 ({num_cycles}个周期)" + (" 预览" if preview else ""))
         self.axes_3d.set_xlabel("相位")
         self.axes_3d.set_ylabel("周期")
         self.axes_3d.set_zlabel(self.unit_label)
@@ -1213,6 +2555,45 @@ class HistoricalChartsDialog(QDialog):
         self.axes_3d.set_ylabel("周期", fontsize=10, labelpad=10)
         self.axes_3d.set_zlabel(self.unit_label, fontsize=10, labelpad=10)
     
+    def prps_display_matrix(self, prps_cycles, prps_widths):
+        """PRPS图的幅值矩阵：点数不足的周期重采样到最大点数，并转换为显示单位
+
+        Args:
+            prps_cycles: 周期矩阵，点数不足的周期末尾为NaN
+            prps_widths: 每个周期的点数
+        """
+        # Z值矩阵直接取缓存矩阵，点数不足的周期重采样到max_points个点
+        max_points = int(prps_widths.max())
+        z_data = prps_cycles[:, :max_points].astype(np.float64)
+        for i in np.flatnonzero(prps_widths != max_points):
+            z_data[i] = resample_cycle(prps_cycles[i, :prps_widths[i]], max_points, np.float64)
+        
+        # 根据当前单位设置转换数据
+        return to_display_unit(z_data, self.use_dbm)
+    
+    def draw_prps_waterfall(self, cycles, widths, color_scheme, view_type):
+        """绘制PRPS热力瀑布图或堆叠线瀑布图，最多显示WATERFALL_MAX_CYCLES个周期
+
+        Args:
+            cycles: 周期矩阵，点数不足的周期末尾为NaN
+            widths: 每个周期的点数
+            color_scheme: 颜色方案名称
+            view_type: WaterfallPRPSRenderer的显示方式
+        """
+        prps_cycles = cycles[-self.WATERFALL_MAX_CYCLES:]
+        prps_widths = widths[-self.WATERFALL_MAX_CYCLES:]
+        num_cycles = len(prps_cycles)
+        if num_cycles == 0:
+            return
+        
+        # 矩阵已转换为显示单位，渲染器不再转换
+        z_min, z_max = self.get_axis_range()
+        custom_cmap = self.create_custom_colormap(self.color_schemes[color_scheme])
+        renderer = WaterfallPRPSRenderer(self.axes_2d)
+        renderer.setup(None, view_type, num_cycles, (z_min, z_max), custom_cmap)
+        renderer.update(self.prps_display_matrix(prps_cycles, prps_widths), num_cycles,
+                        f"历史PRPS{view_type} ({num_cycles}个周期)")
+    
     def export_image(self):
         """导出图表为图像文件"""
         try:
@@ -1229,7 +2610,11 @@ class HistoricalChartsDialog(QDialog):
 
 class MainWindow(QMainWindow):
     """主窗口类"""
-    def __init__(self):
+    def __init__(self, db_name="gis_pd_data.db"):
+        """
+        Args:
+            db_name: 数据库文件名（相对于应用程序目录，也可以是绝对路径）
+        """
         super().__init__()
         self.setWindowTitle("GIS-PD实时分析平台")
         self.setWindowIcon(self.style().standardIcon(QStyle.SP_ComputerIcon)) # 设置窗口图标
@@ -1256,8 +2641,13 @@ class MainWindow(QMainWindow):
         # 周期数据存储
         self.cycle_count = 1  # 当前周期计数
         self.max_cycles = 50  # 默认最大周期数，用于PRPD图
-        self.prps_max_cycles = 50  # PRPS图固定显示最新的50个周期
-        self.accumulated_data = []  # 累积的数据
+        self.prps_max_cycles = 50  # PRPS图显示最新的50个周期
+        self.prps_view = "三维表面"  # PRPS图的显示方式，瀑布图可以显示几百个周期
+        # 累积的数据，环形缓冲区容量同时满足PRPD图和PRPS图的需求
+        self.accumulated_data = CycleRingBuffer(max(self.max_cycles, self.prps_max_cycles))
+        # PRPD密度图的相位×幅值计数，按毫伏值统计，幅值范围对应-50到0 dBm
+        self.prpd_density = PhaseAmplitudeHistogram(
+            self.max_cycles, (self.convert_unit(-50, False), self.convert_unit(0, False)))
         
         # CSV导出设置
         self.csv_export_cycles = 50  # 默认导出50个周期数据
@@ -1272,6 +2662,18 @@ class MainWindow(QMainWindow):
         # 显示设置
         self.show_3d_plot = True  # 设置为始终显示3D图
         self.show_sine_wave = True  # 是否显示参考正弦波
+        self.incremental_render = True  # PRPD散点图只更新数据而不重建图元
+        self.background_render = True  # 在后台线程中绘制实时图表，界面线程只显示图像
+        self.lod_method = DEFAULT_LOD_METHOD  # PRPD散点图按像素列抽稀的方法
+        self.lod_threshold = DEFAULT_LOD_THRESHOLD  # 抽稀时全部保留的脉冲阈值（毫伏）
+        self.frame_renderer = None  # 后台绘制线程，第一次需要绘制时启动
+        self.frame_sequence = 0
+        
+        # 按绘制耗时分别调整PRPD和PRPS图的刷新间隔，没有新数据时不唤醒
+        self.frame_scheduler = FrameScheduler(DEFAULT_MIN_INTERVAL_MS, DEFAULT_MAX_INTERVAL_MS)
+        self.plot_timer = QTimer()
+        self.plot_timer.setSingleShot(True)
+        self.plot_timer.timeout.connect(self.redraw_plot)
         
         # 单位设置
         self.use_dbm = True  # 默认使用dBm单位
@@ -1279,7 +2681,15 @@ class MainWindow(QMainWindow):
         
         # 数据库设置
         self.save_to_db = False  # 默认不保存数据到数据库
-        self.db_manager = DatabaseManager()  # 创建数据库管理器
+        self.block_storage = False  # 是否将周期数据压缩为块存储
+        self.block_storage_cycles = 50  # 每个块包含的周期数
+        self.partition_modes = {"不分区": None, "按天": "day", "按小时": "hour"}  # 分区存储方式
+        self.retention_actions = {"删除": "delete", "压缩": "compress"}  # 过期分区的处理方式
+        # 每条消息的保存方式；默认两者都保存，状态栏的周期数据计数只统计解码后的周期
+        self.storage_policies = {"仅原始负载": "raw", "仅解码周期": "decoded", "原始负载和解码周期": "both"}
+        self.default_storage_policy = "仅原始负载"
+        self.batch_payloads = None  # 下一批周期的原始负载
+        self.db_manager = DatabaseManager(db_name, storage_policy=self.storage_policies[self.default_storage_policy])
         
         # 获取保存路径信息
         self.get_save_paths()
@@ -1287,9 +2697,9 @@ class MainWindow(QMainWindow):
         # 创建MQTT客户端
         self.mqtt_client = MQTTClient()
         self.mqtt_client.set_database_manager(self.db_manager)  # 设置数据库管理器
-        self.mqtt_client.message_received.connect(self.update_plot)
+        self.mqtt_client.messages_received.connect(self.update_plot_batch)
         self.mqtt_client.connection_status.connect(self.update_connection_status)
-        self.mqtt_client.raw_data_received.connect(self.save_raw_data)  # 连接原始数据信号
+        self.mqtt_client.payloads_received.connect(self.set_batch_payloads)  # 下一批周期的原始负载
         
         # 创建界面
         self.setup_ui()
@@ -1299,11 +2709,6 @@ class MainWindow(QMainWindow):
         self.timer.timeout.connect(self.update_status)
         self.timer.start(1000)  # 每秒更新一次状态
         
-        # 创建定时器用于限制绘图频率
-        self.plot_timer = QTimer()
-        self.plot_timer.timeout.connect(self.redraw_plot)
-        self.plot_timer.start(200)  # 每200ms重绘一次图表
-        
         # 创建定时器用于自动保存图像
         self.image_save_timer = QTimer()
         self.image_save_timer.timeout.connect(self.auto_save_image)
@@ -1311,6 +2716,7 @@ class MainWindow(QMainWindow):
         
         # 标记是否需要重绘
         self.need_redraw = False
+        self._prps_drawn_state = None  # 上次绘制PRPS图时的数据和设置
     
     def setup_ui(self):
         """设置用户界面 - 现代化布局"""
@@ -1366,7 +2772,7 @@ class MainWindow(QMainWindow):
         pan_zoom_group.addAction(self.zoom_action)
 
         toolbar.addAction(QAction(self.style().standardIcon(QStyle.SP_BrowserReload), "重置视图", self, triggered=lambda: self.canvas.toolbar.home()))
-        toolbar.addAction(QAction(self.style().standardIcon(QStyle.SP_DialogSaveButton), "保存图表", self, triggered=lambda: self.canvas.toolbar.save_figure()))
+        toolbar.addAction(QAction(self.style().standardIcon(QStyle.SP_DialogSaveButton), "保存图表", self, triggered=self.save_chart))
 
         toolbar.addSeparator()
 
@@ -1393,10 +2799,26 @@ class MainWindow(QMainWindow):
         connection_grid.addWidget(QLabel("主题:"), 2, 0)
         self.topic_input = QLineEdit(self.mqtt_client.topic)
         connection_grid.addWidget(self.topic_input, 2, 1)
+        connection_grid.addWidget(QLabel("消息队列深度:"), 3, 0)
+        self.queue_size_spin = QSpinBox()
+        self.queue_size_spin.setRange(10, 10000)
+        self.queue_size_spin.setValue(self.mqtt_client.queue_maxsize)
+        self.queue_size_spin.valueChanged.connect(self.update_queue_size)
+        connection_grid.addWidget(self.queue_size_spin, 3, 1)
+        self.drop_oldest_checkbox = QCheckBox("队列满时丢弃最旧数据")
+        self.drop_oldest_checkbox.setChecked(self.mqtt_client.drop_oldest)
+        self.drop_oldest_checkbox.stateChanged.connect(self.toggle_drop_oldest)
+        connection_grid.addWidget(self.drop_oldest_checkbox, 4, 0, 1, 2)
+        connection_grid.addWidget(QLabel("网络循环:"), 5, 0)
+        self.loop_mode_combo = QComboBox()
+        self.loop_mode_combo.addItems(["事件驱动", "轮询"])
+        self.loop_mode_combo.setCurrentIndex(0 if self.mqtt_client.loop_mode == "event" else 1)
+        self.loop_mode_combo.currentIndexChanged.connect(self.update_loop_mode)
+        connection_grid.addWidget(self.loop_mode_combo, 5, 1)
         self.connect_button = QPushButton("连接")
         self.connect_button.setIcon(self.style().standardIcon(QStyle.SP_DialogYesButton))
         self.connect_button.clicked.connect(self.toggle_connection)
-        connection_grid.addWidget(self.connect_button, 3, 0, 1, 2)
+        connection_grid.addWidget(self.connect_button, 6, 0, 1, 2)
         connection_group.setLayout(connection_grid)
         side_layout.addWidget(connection_group)
 
@@ -1405,7 +2827,7 @@ class MainWindow(QMainWindow):
         chart_settings_layout = QGridLayout()
         chart_settings_layout.addWidget(QLabel("PRPD图类型:"), 0, 0)
         self.chart_type_combo = QComboBox()
-        self.chart_type_combo.addItems(["散点图", "颜色散点图", "线图"])
+        self.chart_type_combo.addItems(["散点图", "颜色散点图", "线图", "密度图"])
         self.chart_type_combo.currentIndexChanged.connect(self.update_plot_type)
         chart_settings_layout.addWidget(self.chart_type_combo, 0, 1)
         chart_settings_layout.addWidget(QLabel("PRPD累积周期数:"), 1, 0)
@@ -1436,6 +2858,61 @@ class MainWindow(QMainWindow):
         self.color_scheme_combo.setCurrentText(self.current_color_scheme)
         self.color_scheme_combo.currentTextChanged.connect(self.update_color_scheme)
         chart_settings_layout.addWidget(self.color_scheme_combo, 6, 1)
+        self.incremental_render_checkbox = QCheckBox("PRPD增量渲染")
+        self.incremental_render_checkbox.setChecked(self.incremental_render)
+        self.incremental_render_checkbox.stateChanged.connect(self.toggle_incremental_render)
+        chart_settings_layout.addWidget(self.incremental_render_checkbox, 7, 0, 1, 2)
+        self.background_render_checkbox = QCheckBox("后台渲染")
+        self.background_render_checkbox.setToolTip("在后台线程中绘制PRPD/PRPS图，绘制期间界面仍可响应；"
+                                                   "平移或缩放时自动改为在界面中绘制，关闭后可用鼠标旋转PRPS图")
+        self.background_render_checkbox.setChecked(self.background_render)
+        self.background_render_checkbox.stateChanged.connect(self.toggle_background_render)
+        chart_settings_layout.addWidget(self.background_render_checkbox, 8, 0, 1, 2)
+        chart_settings_layout.addWidget(QLabel("最短刷新间隔(ms):"), 9, 0)
+        self.min_interval_spin = QSpinBox()
+        self.min_interval_spin.setRange(20, 5000)
+        self.min_interval_spin.setSingleStep(10)
+        self.min_interval_spin.setValue(self.frame_scheduler.min_interval_ms)
+        self.min_interval_spin.setToolTip("绘制很快时的刷新间隔；绘制较慢时间隔按绘制耗时自动加长，PRPS图比PRPD图刷新得少")
+        self.min_interval_spin.valueChanged.connect(self.update_frame_interval_bounds)
+        chart_settings_layout.addWidget(self.min_interval_spin, 9, 1)
+        chart_settings_layout.addWidget(QLabel("最长刷新间隔(ms):"), 10, 0)
+        self.max_interval_spin = QSpinBox()
+        self.max_interval_spin.setRange(20, 60000)
+        self.max_interval_spin.setSingleStep(100)
+        self.max_interval_spin.setValue(self.frame_scheduler.max_interval_ms)
+        self.max_interval_spin.setToolTip("绘制再慢也至少按此间隔刷新")
+        self.max_interval_spin.valueChanged.connect(self.update_frame_interval_bounds)
+        chart_settings_layout.addWidget(self.max_interval_spin, 10, 1)
+        chart_settings_layout.addWidget(QLabel("PRPD散点抽稀:"), 11, 0)
+        self.lod_method_combo = QComboBox()
+        for method in LOD_METHODS:
+            self.lod_method_combo.addItem(LOD_METHOD_LABELS[method], method)
+        self.lod_method_combo.setCurrentIndex(LOD_METHODS.index(self.lod_method))
+        self.lod_method_combo.setToolTip("按相位像素列减少散点数，点数由图的宽度决定而与周期数无关；"
+                                         "最小/最大值保留幅值包络，LTTB保留局部峰值")
+        self.lod_method_combo.currentIndexChanged.connect(self.update_lod_settings)
+        chart_settings_layout.addWidget(self.lod_method_combo, 11, 1)
+        chart_settings_layout.addWidget(QLabel("脉冲保留阈值(dBm):"), 12, 0)
+        self.lod_threshold_spin = QSpinBox()
+        self.lod_threshold_spin.setRange(-100, 20)
+        self.lod_threshold_spin.setValue(round(float(mv_to_dbm(self.lod_threshold))))
+        self.lod_threshold_spin.setToolTip("高于此阈值的采样点（局放脉冲）全部绘制，不参与抽稀")
+        self.lod_threshold_spin.valueChanged.connect(self.update_lod_settings)
+        chart_settings_layout.addWidget(self.lod_threshold_spin, 12, 1)
+        chart_settings_layout.addWidget(QLabel("PRPS显示方式:"), 13, 0)
+        self.prps_view_combo = QComboBox()
+        self.prps_view_combo.addItems(list(PRPS_VIEW_TYPES))
+        self.prps_view_combo.setCurrentText(self.prps_view)
+        self.prps_view_combo.setToolTip("三维表面绘制较慢；热力瀑布图和堆叠线瀑布图绘制很快，可以实时显示几百个周期")
+        self.prps_view_combo.currentTextChanged.connect(self.update_prps_view)
+        chart_settings_layout.addWidget(self.prps_view_combo, 13, 1)
+        chart_settings_layout.addWidget(QLabel("PRPS周期数:"), 14, 0)
+        self.prps_cycles_spin = QSpinBox()
+        self.prps_cycles_spin.setRange(2, 1000)
+        self.prps_cycles_spin.setValue(self.prps_max_cycles)
+        self.prps_cycles_spin.valueChanged.connect(self.update_prps_max_cycles)
+        chart_settings_layout.addWidget(self.prps_cycles_spin, 14, 1)
         chart_settings_group.setLayout(chart_settings_layout)
         side_layout.addWidget(chart_settings_group)
 
@@ -1466,6 +2943,37 @@ class MainWindow(QMainWindow):
         self.paths_button.setIcon(self.style().standardIcon(QStyle.SP_DirIcon))
         self.paths_button.clicked.connect(self.show_paths_info)
         data_storage_layout.addWidget(self.paths_button, 4, 0, 1, 2)
+        data_storage_layout.addWidget(QLabel("保存内容:"), 5, 0)
+        self.storage_policy_combo = QComboBox()
+        self.storage_policy_combo.addItems(list(self.storage_policies.keys()))
+        self.storage_policy_combo.setCurrentText(self.default_storage_policy)
+        self.storage_policy_combo.setToolTip("只保存原始负载时，查询周期数据时再解码，每条消息只写入一行")
+        self.storage_policy_combo.currentTextChanged.connect(self.update_storage_policy)
+        data_storage_layout.addWidget(self.storage_policy_combo, 5, 1)
+        self.block_storage_checkbox = QCheckBox("压缩块存储")
+        self.block_storage_checkbox.setToolTip(f"每{self.block_storage_cycles}个周期压缩为一个数据块保存，节省空间并加快历史查询"
+                                               "（用于保存的解码周期）")
+        self.block_storage_checkbox.setChecked(self.block_storage)
+        self.block_storage_checkbox.stateChanged.connect(self.toggle_block_storage)
+        data_storage_layout.addWidget(self.block_storage_checkbox, 6, 0, 1, 2)
+        data_storage_layout.addWidget(QLabel("分区存储:"), 7, 0)
+        self.partition_combo = QComboBox()
+        self.partition_combo.addItems(list(self.partition_modes.keys()))
+        self.partition_combo.setToolTip("按天或按小时把新数据写入独立的数据库文件，避免单个文件无限增长")
+        self.partition_combo.currentTextChanged.connect(self.update_partitioning)
+        data_storage_layout.addWidget(self.partition_combo, 7, 1)
+        data_storage_layout.addWidget(QLabel("分区保留天数:"), 8, 0)
+        self.retention_spin = QSpinBox()
+        self.retention_spin.setRange(0, 3650)
+        self.retention_spin.setSpecialValueText("不限")
+        self.retention_spin.valueChanged.connect(self.update_retention)
+        data_storage_layout.addWidget(self.retention_spin, 8, 1)
+        data_storage_layout.addWidget(QLabel("过期分区:"), 9, 0)
+        self.retention_action_combo = QComboBox()
+        self.retention_action_combo.addItems(list(self.retention_actions.keys()))
+        self.retention_action_combo.setToolTip("删除过期的分区文件，或将其中的周期打包压缩后保留")
+        self.retention_action_combo.currentTextChanged.connect(self.update_retention)
+        data_storage_layout.addWidget(self.retention_action_combo, 9, 1)
         data_storage_group.setLayout(data_storage_layout)
         side_layout.addWidget(data_storage_group)
 
@@ -1478,7 +2986,20 @@ class MainWindow(QMainWindow):
         # 创建一个隐藏的matplotlib工具栏，用于驱动我们的自定义工具栏按钮
         self.canvas.toolbar = NavigationToolbar(self.canvas, self)
         self.canvas.toolbar.setVisible(False)
-        canvas_layout.addWidget(self.canvas)
+        # 后台渲染时显示绘制好的图像，在界面中绘制时显示画布
+        self.frame_view = RenderedFrameView()
+        self.frame_view.resized.connect(self.request_redraw)
+        self.chart_stack = QStackedWidget()
+        self.chart_stack.addWidget(self.canvas)
+        self.chart_stack.addWidget(self.frame_view)
+        canvas_layout.addWidget(self.chart_stack)
+        # PRPD增量渲染器，复用散点和正弦波图元
+        self.prpd_renderer = IncrementalPRPDRenderer(self.canvas, self.canvas.axes_2d)
+        self.prps_renderer = IncrementalPRPSRenderer(self.canvas.axes_3d)
+        self.waterfall_renderer = WaterfallPRPSRenderer(self.canvas.axes_waterfall)
+        # PRPS图不参与普通重绘，到刷新时间时只重绘并blit PRPS区域
+        self.prps_blitter = PRPSPanelBlitter(self.canvas, (self.canvas.axes_3d, self.canvas.axes_waterfall),
+                                             self.canvas.axes_2d)
 
     def create_status_bar(self):
         """创建状态栏"""
@@ -1488,6 +3009,15 @@ class MainWindow(QMainWindow):
         self.status_bar.addWidget(self.connection_status_label)
         self.data_count_label = QLabel("数据点: 0")
         self.status_bar.addPermanentWidget(self.data_count_label)
+        self.dropped_count_label = QLabel("丢弃周期: 0")
+        self.status_bar.addPermanentWidget(self.dropped_count_label)
+        self.latency_label = QLabel("延迟: --")
+        self.status_bar.addPermanentWidget(self.latency_label)
+        self.write_lag_label = QLabel("待写入: 0")
+        self.status_bar.addPermanentWidget(self.write_lag_label)
+        self.frame_rate_label = QLabel("刷新: --")
+        self.frame_rate_label.setToolTip("PRPD图和PRPS图当前的刷新间隔")
+        self.status_bar.addPermanentWidget(self.frame_rate_label)
 
     def toggle_side_panel(self):
         """折叠或展开侧边栏"""
@@ -1508,6 +3038,7 @@ class MainWindow(QMainWindow):
         # 检查matplotlib工具栏的实际状态并更新按钮
         if self.canvas.toolbar.mode == '':
             self.pan_action.setChecked(False)
+        self.request_redraw()
 
     def handle_zoom_action(self, checked):
         """处理缩放按钮的点击事件并同步状态"""
@@ -1518,6 +3049,7 @@ class MainWindow(QMainWindow):
         # 检查matplotlib工具栏的实际状态并更新按钮
         if self.canvas.toolbar.mode == '':
             self.zoom_action.setChecked(False)
+        self.request_redraw()
     
     def toggle_connection(self):
         """切换MQTT连接状态"""
@@ -1577,6 +3109,20 @@ class MainWindow(QMainWindow):
             self.connect_button.setText("连接")
             self.connect_button.setIcon(self.style().standardIcon(QStyle.SP_DialogYesButton))
     
+    def update_queue_size(self, size):
+        """更新消息队列深度"""
+        self.mqtt_client.configure_message_queue(maxsize=size)
+    
+    def toggle_drop_oldest(self, state):
+        """切换队列满时的丢弃策略"""
+        self.mqtt_client.configure_message_queue(drop_oldest=(state == Qt.CheckState.Checked.value))
+    
+    def update_loop_mode(self, index):
+        """切换网络循环模式，下次连接时生效"""
+        self.mqtt_client.set_loop_mode("event" if index == 0 else "poll")
+        if self.mqtt_client.connected:
+            self.status_bar.showMessage("网络循环模式将在重新连接后生效", 3000)
+    
     def update_buffer_size(self, size):
         """更新数据缓冲区大小"""
         self.max_buffer_size = size
@@ -1587,19 +3133,44 @@ class MainWindow(QMainWindow):
         self.data_mutex.unlock()
     
     def update_max_cycles(self, cycles):
-        """更新最大周期数"""
+        """更新最大周期数，并调整环形缓冲区容量"""
         self.max_cycles = cycles
+        self.data_mutex.lock()
+        self.accumulated_data.resize(max(self.max_cycles, self.prps_max_cycles))
+        self.prpd_density.rebuild(self.accumulated_data.last(), self.max_cycles)
+        self.data_mutex.unlock()
+        # 周期数变化后，按原周期数缓存的网格不再需要
+        shared_cache.invalidate("grid")
         self.cycle_count_label.setText(f"{self.cycle_count}/{self.max_cycles}")
         self.need_redraw = True
     
+    def update_prps_max_cycles(self, cycles):
+        """更新PRPS图显示的周期数，并调整环形缓冲区容量"""
+        self.prps_max_cycles = cycles
+        self.data_mutex.lock()
+        self.accumulated_data.resize(max(self.max_cycles, self.prps_max_cycles))
+        self.data_mutex.unlock()
+        shared_cache.invalidate("grid")
+        self.need_redraw = True
+    
+    def update_prps_view(self, view):
+        """切换PRPS图的显示方式（三维表面、热力瀑布图、堆叠线瀑布图）"""
+        self.prps_view = view
+        self.need_redraw = True
+    
     def reset_cycles(self):
         """重置周期计数和累积数据"""
         self.data_mutex.lock()
         self.cycle_count = 1
-        self.accumulated_data = []
+        self.accumulated_data.clear()
+        self.prpd_density.clear()
         self.cycle_count_label.setText(f"{self.cycle_count}/{self.max_cycles}")
         self.need_redraw = True
         self.data_mutex.unlock()
+        # 周期总数已归零，PRPS条带缓存需要重建
+        self.prps_renderer.invalidate()
+        self.waterfall_renderer.invalidate()
+        self._prps_drawn_state = None
         self.status_bar.showMessage("周期已重置", 2000)
     
     def update_plot_type(self):
@@ -1610,7 +3181,8 @@ class MainWindow(QMainWindow):
         """清除数据"""
         self.data_mutex.lock()
         self.data_buffer = []
-        self.accumulated_data = []
+        self.accumulated_data.clear()
+        self.prpd_density.clear()
         self.cycle_count = 1
         self.cycle_count_label.setText(f"{self.cycle_count}/{self.max_cycles}")
         self.data_mutex.unlock()
@@ -1620,6 +3192,10 @@ class MainWindow(QMainWindow):
         self.canvas.axes_2d.grid(True, linestyle='--', alpha=0.7)
         self.canvas.scatter = None
         self.canvas.line = None
+        self.prpd_renderer.invalidate()
+        self.prps_renderer.invalidate()
+        self.waterfall_renderer.invalidate()
+        self._prps_drawn_state = None
         
         # 清除3D图
         if self.canvas.axes_3d:
@@ -1631,36 +3207,46 @@ class MainWindow(QMainWindow):
             self.canvas.surface = None
         
         self.canvas.draw()
+        self.frame_view.clear()
         self.data_count_label.setText("数据点: 0")
     
     def update_plot(self, data):
-        """更新数据，但不立即重绘"""
-        current_time = time.time()
+        """更新单个周期的数据，但不立即重绘"""
+        self.update_plot_batch([data])
+    
+    def update_plot_batch(self, batch):
+        """批量更新多个周期的数据，但不立即重绘"""
+        if not batch:
+            return
         
         # 更新数据缓冲区
         self.data_mutex.lock()
-        self.data_buffer = data
+        self.data_buffer = batch[-1]
+        
+        # 本批周期对应的原始负载（由payloads_received信号先行传递）
+        payloads = self.batch_payloads
+        self.batch_payloads = None
+        if payloads is None or len(payloads) != len(batch):
+            payloads = [None] * len(batch)
         
         # 处理周期数据
         # 每收到一次数据视为一个周期
-        if len(data) > 0:
-            # 添加新周期数据
-            self.accumulated_data.append(data)
+        for data, payload in zip(batch, payloads):
+            if len(data) == 0:
+                continue
             
-            # 如果累积的周期数超过PRPS的最大周期数，则移除最早的周期数据
-            # 但保留足够的数据以满足PRPD图和PRPS图的需求
-            max_needed_cycles = max(self.max_cycles, self.prps_max_cycles)
-            if len(self.accumulated_data) > max_needed_cycles:
-                self.accumulated_data = self.accumulated_data[-max_needed_cycles:]
+            # 添加新周期数据，缓冲区满时自动覆盖最早的周期
+            self.accumulated_data.append(data)
+            self.prpd_density.append(data)
             
             # 更新周期计数
             self.cycle_count = min(self.cycle_count + 1, self.max_cycles)
-            self.cycle_count_label.setText(f"{self.cycle_count}/{self.max_cycles}")
             
-            # 保存周期数据到数据库（确保在主线程中执行）
+            # 按存储策略保存周期数据和/或原始负载到数据库（确保在主线程中执行）
             if self.save_to_db and self.db_manager is not None:
                 try:
-                    self.db_manager.save_cycle_data(self.cycle_count, data)
+                    self.db_manager.save_message(self.cycle_count, data, payload,
+                                                 self.mqtt_client.broker_address, self.mqtt_client.topic)
                 except Exception as e:
                     print(f"保存周期数据错误: {str(e)}")
         
@@ -1670,9 +3256,9 @@ class MainWindow(QMainWindow):
         self.need_redraw = True
         self.data_mutex.unlock()
         
-        # 更新数据点数量标签
-        total_points = sum(len(cycle_data) for cycle_data in self.accumulated_data)
-        self.data_count_label.setText(f"数据点: {total_points}")
+        # 每批只更新一次界面标签
+        self.cycle_count_label.setText(f"{self.cycle_count}/{self.max_cycles}")
+        self.data_count_label.setText(f"数据点: {self.accumulated_data.total_points}")
     
     def adjust_chart_layout(self):
         """根据当前图表类型和配置调整图表布局"""
@@ -1681,35 +3267,71 @@ class MainWindow(QMainWindow):
         # 完全重新设置图表布局，确保PRPD和PRPS图均分空间
         self.canvas.fig.subplots_adjust(left=0.08, right=0.92, top=0.92, bottom=0.1, wspace=0.4, hspace=0.2)
         
-        # 获取整个图表区域
-        fig_width = self.canvas.fig.get_figwidth()
-        fig_height = self.canvas.fig.get_figheight()
-        
-        # 计算每个子图应占用的宽度比例
-        subplot_width = (0.92 - 0.08) / 2  # 左右边距各占8%，剩余空间平分
-        
-        # 明确设置两个子图的位置参数，确保完全对称
-        left_pos = [0.08, 0.1, subplot_width - 0.04, 0.8]  # [left, bottom, width, height]
-        right_pos = [0.08 + subplot_width + 0.08, 0.1, subplot_width - 0.04, 0.8]
-        
-        # 应用新的位置设置
-        self.canvas.axes_2d.set_position(left_pos)
-        self.canvas.axes_3d.set_position(right_pos)
+        # 明确设置两个子图的位置参数，确保完全对称（与后台渲染的布局相同）
+        self.canvas.axes_2d.set_position(PRPD_AXES_POSITION)
+        self.canvas.axes_3d.set_position(PRPS_AXES_POSITION)
+        self.canvas.axes_waterfall.set_position(PRPS_AXES_POSITION)
         
         # 确保3D图有适当的宽高比
-        self.canvas.axes_3d.set_box_aspect([1, 0.7, 0.5])
+        self.canvas.axes_3d.set_box_aspect(PRPS_BOX_ASPECT)
     
-    def redraw_plot(self):
-        """重绘图表，由定时器触发"""
-        if not self.need_redraw:
+    @property
+    def need_redraw(self):
+        """是否有需要重绘的图"""
+        return self.frame_scheduler.dirty
+    
+    @need_redraw.setter
+    def need_redraw(self, value):
+        """标记PRPD和PRPS图都需要重绘（并按刷新间隔安排定时器），或取消重绘"""
+        if value:
+            self.frame_scheduler.mark_dirty()
+            self.schedule_redraw()
+        else:
+            self.frame_scheduler.clear()
+    
+    def schedule_redraw(self):
+        """在下一个需要重绘的图到刷新时间时触发重绘；没有需要重绘的图或已暂停时不启动定时器"""
+        delay = self.frame_scheduler.next_delay(time.monotonic() * 1000)
+        if delay is None:
             return
-            
+        delay = int(np.ceil(delay))
+        if not self.plot_timer.isActive() or self.plot_timer.remainingTime() > delay:
+            self.plot_timer.start(delay)
+    
+    def redraw_plot(self):
+        """重绘已到刷新时间的图，由定时器触发"""
+        views = self.frame_scheduler.due_views(time.monotonic() * 1000)
+        if views:
+            if self.use_background_render():
+                self.submit_frame(views)
+            else:
+                if self.chart_stack.currentWidget() is not self.canvas:
+                    # 从后台渲染切换回来，画布上的两个图都已过期
+                    self.chart_stack.setCurrentWidget(self.canvas)
+                    self.prpd_renderer.invalidate()
+                    self.prps_blitter.invalidate()
+                    self._prps_drawn_state = None
+                    views = FRAME_VIEWS
+                self.draw_canvas(views)
+        self.schedule_redraw()
+    
+    def draw_canvas(self, views=FRAME_VIEWS):
+        """在界面线程中绘制画布
+
+        Args:
+            views: 需要更新的图（"prpd"、"prps"），其余的图保持上次绘制的内容
+        """
+        # 绘图在主线程中完成，期间不会追加新周期，直接使用缓冲区视图无需拷贝
         self.data_mutex.lock()
-        accumulated_data_copy = self.accumulated_data.copy()
+        cycle_view = self.accumulated_data.last()
         self.data_mutex.unlock()
         
-        if not accumulated_data_copy:
+        if len(cycle_view) == 0:
+            # 没有数据可画，取消重绘标记，否则定时器会以0ms间隔不断触发
+            self.frame_scheduler.clear(views)
             return
+        now_ms = time.monotonic() * 1000
+        self.frame_scheduler.mark_drawn(views, now_ms)
             
         # 在重绘前移除可能存在的颜色条，防止布局问题
         if hasattr(self.canvas, 'colorbar_2d') and self.canvas.colorbar_2d is not None:
@@ -1719,22 +3341,238 @@ class MainWindow(QMainWindow):
             except:
                 pass
         
-        # 绘制2D图 (PRPD)
-        self.draw_prpd(accumulated_data_copy)
-        
-        # 绘制PRPS图
-        self.draw_prps(accumulated_data_copy)
-        
-        # 调整图表布局
-        self.adjust_chart_layout()
-        
-        # 重绘画布
-        self.canvas.draw()
+        # 绘制2D图 (PRPD)，分别测量两个图的绘制耗时用于调整刷新间隔
+        start = time.perf_counter()
+        prpd_needs_full_draw = False
+        if "prpd" in views:
+            if self.use_incremental_prpd():
+                prpd_needs_full_draw = self.draw_prpd_incremental(cycle_view)
+            else:
+                self.prpd_renderer.invalidate()
+                self.draw_prpd(cycle_view)
+                prpd_needs_full_draw = True
+        prpd_ms = (time.perf_counter() - start) * 1000
+        
+        costs = {"prpd": prpd_ms} if "prpd" in views else {}
+        
+        # PRPS图只在到刷新时间且数据或设置变化时重绘，只有重新创建图元时才需要调整图表布局
+        prps_state = (self.accumulated_data.appended, self.use_dbm, self.current_color_scheme, self.prps_max_cycles,
+                      self.prps_view)
+        needs_full_draw = prpd_needs_full_draw
+        if "prps" in views and prps_state != self._prps_drawn_state:
+            start = time.perf_counter()
+            if self.draw_prps(cycle_view):
+                self.adjust_chart_layout()
+                needs_full_draw = True
+            self._prps_drawn_state = prps_state
+            costs["prps"] = (time.perf_counter() - start) * 1000
+        
+        # 坐标轴未变化时两个图分别只blit各自的区域，blit的耗时计入各自的图
+        for view, blitter in (("prpd", self.prpd_renderer), ("prps", self.prps_blitter)):
+            if needs_full_draw or view not in costs:
+                continue
+            start = time.perf_counter()
+            needs_full_draw = not blitter.blit()
+            costs[view] += (time.perf_counter() - start) * 1000
+        
+        # 重绘画布，完整重绘的耗时计入PRPS图（只更新PRPD图时计入PRPD图）
+        if needs_full_draw:
+            start = time.perf_counter()
+            self.canvas.draw()
+            view = "prps" if "prps" in costs else "prpd"
+            if view in costs:
+                costs[view] += (time.perf_counter() - start) * 1000
+        for view, cost_ms in costs.items():
+            self.frame_scheduler.record_cost(view, cost_ms)
+    
+    def use_incremental_prpd(self):
+        """判断当前PRPD图是否使用增量渲染（线图按周期绘制多条线，仍使用完整重绘）"""
+        return self.incremental_render and self.chart_type_combo.currentText() in INCREMENTAL_PRPD_TYPES
+    
+    def use_background_render(self):
+        """判断是否在后台线程中绘制（平移、缩放需要交互式画布，此时在界面中绘制）"""
+        return self.background_render and self.canvas.toolbar.mode == ''
+    
+    def request_redraw(self):
+        """在下一次定时重绘时重新绘制"""
+        self.need_redraw = True
+    
+    def submit_frame(self, views=FRAME_VIEWS):
+        """拷贝绘制所需的数据和设置，交给后台绘制线程
+
+        Args:
+            views: 需要更新的图（"prpd"、"prps"）
+        """
+        chart_type = self.chart_type_combo.currentText()
+        self.data_mutex.lock()
+        cycles = self.accumulated_data.snapshot(max(self.max_cycles, self.prps_max_cycles))
+        appended = self.accumulated_data.appended
+        density = (self.prpd_density.counts.copy(), len(self.prpd_density)) if chart_type == "密度图" else None
+        self.data_mutex.unlock()
+        if len(cycles) == 0:
+            self.frame_scheduler.clear(views)
+            return
+        self.frame_scheduler.mark_drawn(views, time.monotonic() * 1000)
         
-        self.need_redraw = False
+        sine_xy = None
+        if self.show_sine_wave:
+            sine_amp, sine_offset = self.get_sine_wave_params()
+            sine_xy = shared_cache.sine_overlay(sine_amp, sine_offset)
+        
+        # 按设备像素绘制，高分屏上图像不模糊
+        ratio = self.frame_view.devicePixelRatioF()
+        self.frame_sequence += 1
+        snapshot = FrameSnapshot(
+            self.frame_sequence, (self.frame_view.width() * ratio, self.frame_view.height() * ratio),
+            self.canvas.fig.dpi * ratio, chart_type, cycles, appended, self.max_cycles, self.prps_max_cycles,
+            self.use_dbm, self.unit_label, self.get_axis_range(), self.current_color_scheme,
+            self.create_custom_colormap(self.color_schemes[self.current_color_scheme]), sine_xy, density, views,
+            self.lod_method, self.lod_threshold, self.prps_view)
+        
+        if self.frame_renderer is None:
+            self.frame_renderer = FrameRenderThread()
+            self.frame_renderer.frame_ready.connect(self.show_rendered_frame)
+            self.frame_renderer.start()
+        self.frame_renderer.submit(snapshot)
+    
+    def show_rendered_frame(self, image, sequence, costs):
+        """显示后台绘制好的一帧，并记录各图的绘制耗时"""
+        for view, cost_ms in costs.items():
+            self.frame_scheduler.record_cost(view, cost_ms)
+        image.setDevicePixelRatio(self.frame_view.devicePixelRatioF())
+        self.frame_view.show_frame(image, sequence)
+        if self.use_background_render() and self.chart_stack.currentWidget() is not self.frame_view:
+            self.chart_stack.setCurrentWidget(self.frame_view)
+    
+    def update_frame_interval_bounds(self, *args):
+        """更新刷新间隔的范围"""
+        self.frame_scheduler.set_bounds(self.min_interval_spin.value(), self.max_interval_spin.value())
+        self.plot_timer.stop()
+        self.schedule_redraw()
+    
+    def update_frame_pause(self):
+        """窗口最小化或隐藏时暂停重绘，恢复时重绘全部图"""
+        paused = self.isMinimized() or not self.isVisible()
+        if paused == self.frame_scheduler.paused:
+            return
+        self.frame_scheduler.paused = paused
+        if paused:
+            self.plot_timer.stop()
+        else:
+            self.need_redraw = True
+    
+    def changeEvent(self, event):
+        """窗口状态变化（最小化、还原）时暂停或恢复重绘"""
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.update_frame_pause()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_frame_pause()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_frame_pause()
+    
+    def update_lod_settings(self, *args):
+        """更新PRPD散点图的抽稀方法和脉冲保留阈值"""
+        self.lod_method = self.lod_method_combo.currentData()
+        self.lod_threshold = float(dbm_to_mv(self.lod_threshold_spin.value()))
+        self.need_redraw = True
+    
+    def toggle_background_render(self, state):
+        """切换是否在后台线程中绘制实时图表"""
+        self.background_render = (state == Qt.CheckState.Checked.value)
+        self.need_redraw = True
+    
+    def save_chart(self):
+        """保存图表；后台渲染时画布不是最新的，先在界面中绘制一次"""
+        if self.chart_stack.currentWidget() is not self.canvas:
+            self.prpd_renderer.invalidate()
+            self._prps_drawn_state = None
+            self.draw_canvas()
+        self.canvas.toolbar.save_figure()
+    
+    def draw_prpd_incremental(self, accumulated_data):
+        """增量绘制PRPD图，只在设置变化时重建图元
+
+        Args:
+            accumulated_data: 周期数据二维数组（周期数 × 相位点数）
+
+        Returns:
+            bool: 需要完整重绘画布时返回True，否则可以只blit PRPD区域
+        """
+        chart_type = self.chart_type_combo.currentText()
+        prpd_data = accumulated_data[-self.max_cycles:]
+        
+        # 设置变化时重新创建图元
+        config = (chart_type, self.use_dbm, self.current_color_scheme, self.show_sine_wave)
+        needs_full_draw = False
+        if not self.prpd_renderer.is_ready(config):
+            cmap = None
+            if chart_type in ("颜色散点图", "密度图"):
+                cmap = self.create_custom_colormap(self.color_schemes[self.current_color_scheme])
+            density_shape = self.prpd_density.counts.shape if chart_type == "密度图" else None
+            
+            sine_xy = None
+            if self.show_sine_wave:
+                sine_amp, sine_offset = self.get_sine_wave_params()
+                sine_xy = shared_cache.sine_overlay(sine_amp, sine_offset)
+            
+            self.prpd_renderer.setup(config, self.get_axis_range(), self.unit_label, cmap, sine_xy,
+                                     density_shape)
+            needs_full_draw = True
+        
+        # 密度图的计数在周期到达时已经更新，绘制代价与周期数无关
+        if chart_type == "密度图":
+            title = f"PRPD图 ({len(self.prpd_density)}/{self.max_cycles}周期)"
+            if self.prpd_renderer.update_density(self.prpd_density.counts, title):
+                needs_full_draw = True
+            return needs_full_draw
+        
+        # 只更新散点数据
+        x_data, y_data = self.prpd_scatter_points(prpd_data)
+        
+        title = f"PRPD图 ({len(prpd_data)}/{self.max_cycles}周期)"
+        colors = y_data if chart_type == "颜色散点图" else None
+        if self.prpd_renderer.update(x_data, y_data, title, colors):
+            needs_full_draw = True
+        
+        return needs_full_draw
+    
+    def prpd_scatter_points(self, prpd_data):
+        """PRPD散点图的点：按相位方向的像素列数抽稀后转换为显示单位
+
+        Args:
+            prpd_data: 周期数据二维数组（周期数 × 相位点数，毫伏）
+
+        Returns:
+            tuple: (相位数组, 显示单位的幅值数组)
+        """
+        x_data, y_data = decimate_prpd(prpd_data, prpd_phase_columns(self.canvas.axes_2d), self.lod_threshold,
+                                       self.lod_method)
+        return x_data, to_display_unit(y_data, self.use_dbm)
+    
+    def draw_prpd_density(self, ax, counts):
+        """以图像形式绘制PRPD密度图，计数为0的分箱不着色
+
+        Args:
+            ax: 目标坐标轴
+            counts: 相位×幅值计数矩阵
+        """
+        custom_cmap = self.create_custom_colormap(self.color_schemes[self.current_color_scheme])
+        y_min, y_max = self.get_axis_range()
+        return ax.imshow(np.ma.masked_equal(counts, 0), cmap=custom_cmap, origin='lower',
+                         extent=(0, 360, y_min, y_max), aspect='auto', interpolation='nearest',
+                         vmin=1, vmax=max(int(counts.max()), 1))
     
     def draw_prpd(self, accumulated_data):
-        """绘制PRPD图"""
+        """绘制PRPD图
+
+        Args:
+            accumulated_data: 周期数据二维数组（周期数 × 相位点数）
+        """
         # 清除当前2D图
         self.canvas.axes_2d.clear()
         
@@ -1742,38 +3580,21 @@ class MainWindow(QMainWindow):
         chart_type = self.chart_type_combo.currentText()
         
         # 只使用PRPD需要的周期数
-        prpd_data = accumulated_data[-self.max_cycles:] if len(accumulated_data) > self.max_cycles else accumulated_data
+        prpd_data = accumulated_data[-self.max_cycles:]
         
         # 合并所有周期的数据用于绘图
-        all_data = []
-        for cycle_data in prpd_data:
-            all_data.extend(cycle_data)
+        all_data = prpd_data.ravel()
         
-        if not all_data:
+        if len(all_data) == 0:
             return
             
-        # 创建X轴数据（相位）
-        # 对于累积数据，我们需要为每个周期的每个数据点分配相位值
-        phase_per_cycle = 360  # 每个周期的相位范围
-        x_data = []
-        
-        for i, cycle_data in enumerate(prpd_data):
-            cycle_phases = np.linspace(0, phase_per_cycle, len(cycle_data))
-            x_data.extend(cycle_phases)
-        
-        # 根据当前单位设置转换数据
-        if self.use_dbm:
-            display_data = []
-            for cycle_data in prpd_data:
-                display_data.append([self.convert_unit(x, True) for x in cycle_data])
-            
-            # 合并所有周期的转换后数据
-            all_display_data = []
-            for cycle_data in display_data:
-                all_display_data.extend(cycle_data)
+        # 创建X轴数据（相位），所有周期的相位点相同
+        if chart_type in ("散点图", "颜色散点图"):
+            # 散点按PRPD区域的像素宽度抽稀，高于阈值的脉冲全部保留
+            x_data, all_display_data = self.prpd_scatter_points(prpd_data)
         else:
-            display_data = prpd_data
-            all_display_data = all_data
+            # 根据当前单位设置转换数据，一次数组运算完成
+            display_data = to_display_unit(prpd_data, self.use_dbm)
         
         if chart_type == "散点图":
             self.canvas.axes_2d.scatter(x_data, all_display_data, alpha=0.7, s=10)
@@ -1791,23 +3612,24 @@ class MainWindow(QMainWindow):
             #                                                fraction=0.02, pad=0.02, shrink=0.8)
             # self.canvas.colorbar_2d.set_label(self.unit_label)
         elif chart_type == "线图":
-            # 对于线图，我们可能需要按周期分别绘制
+            # 对于线图，我们可能需要按周期分别绘制，所有周期的相位相同
+            cycle_phases = shared_cache.phase_axis(prpd_data.shape[1])
             for i, cycle_data in enumerate(display_data):
-                cycle_phases = np.linspace(0, phase_per_cycle, len(cycle_data))
                 self.canvas.axes_2d.plot(cycle_phases, cycle_data, linewidth=1.0, 
                                      label=f"周期 {i+1}")
             # 如果周期数较多，可以选择不显示图例
             if len(display_data) <= 3:
                 self.canvas.axes_2d.legend(loc='upper right')
+        elif chart_type == "密度图":
+            self.draw_prpd_density(self.canvas.axes_2d, self.prpd_density.counts)
         
         # 绘制参考正弦波
         if self.show_sine_wave:
             # 获取正弦波参数
             sine_amp, sine_offset = self.get_sine_wave_params()
 
-            # 生成正弦波数据
-            x_sine = np.linspace(0, phase_per_cycle, 1000)
-            y_sine = sine_amp * np.sin(x_sine * 2 * np.pi / phase_per_cycle) + sine_offset
+            # 正弦波数据只随单位变化，从缓存中取出
+            x_sine, y_sine = shared_cache.sine_overlay(sine_amp, sine_offset)
 
             # 绘制正弦波
             self.canvas.axes_2d.plot(x_sine, y_sine, 'r-', linewidth=1.5, alpha=0.7, label="参考正弦波")
@@ -1826,96 +3648,86 @@ class MainWindow(QMainWindow):
         self.canvas.axes_2d.grid(True, linestyle='--', alpha=0.7)
     
     def draw_prps(self, accumulated_data):
-        """绘制PRPS三维图"""
-        # 清除当前3D图并重新创建
-        self.canvas.fig.delaxes(self.canvas.axes_3d)
-        self.canvas.axes_3d = self.canvas.fig.add_subplot(111, projection='3d')
-        
-        # 移除之前的颜色条
-        try:
-            if hasattr(self, 'colorbar') and self.colorbar is not None:
-                # 尝试安全地移除颜色条
-                self.colorbar.remove()
-                self.colorbar = None
-        except Exception:
-            # 如果移除失败，直接忽略
-            pass
-        
+        """绘制PRPS三维图，保持同一个3D坐标轴，只为新周期计算表面
+
+        Returns:
+            bool: 重新创建了表面图元（需要重新调整布局）时返回True
+        """
         # 只使用PRPS需要的最新周期数
-        prps_data = accumulated_data[-self.prps_max_cycles:] if len(accumulated_data) > self.prps_max_cycles else accumulated_data
+        prps_data = accumulated_data[-self.prps_max_cycles:]
+        if len(prps_data) == 0:
+            return False
         
-        # 准备数据
-        num_cycles = len(prps_data)
-        if num_cycles == 0:
-            return
+        # 瀑布图与3D图位置相同，只显示当前选择的一个
+        waterfall = self.prps_view in WATERFALL_PRPS_TYPES
+        self.canvas.axes_3d.set_visible(not waterfall)
+        self.canvas.axes_waterfall.set_visible(waterfall)
+        if waterfall:
+            return self.draw_prps_waterfall(prps_data)
+        
+        # 设置变化或坐标轴被清除时重新创建图元
+        config = (self.use_dbm, self.current_color_scheme, self.prps_max_cycles)
+        recreated = False
+        if not self.prps_renderer.is_ready(config):
+            # 创建自定义颜色映射
+            custom_cmap = self.create_custom_colormap(self.color_schemes[self.current_color_scheme])
             
-        # 找到所有周期中最大的数据点数
-        max_points = max(len(cycle_data) for cycle_data in prps_data)
-        
-        # 创建规则网格
-        phase = np.linspace(0, 360, max_points)
-        cycles = np.arange(1, num_cycles + 1)
-        
-        # 创建空的Z值矩阵
-        z_data = np.zeros((num_cycles, max_points))
-        
-        # 填充Z值矩阵
-        for i, cycle_data in enumerate(prps_data):
-            # 对于每个周期，我们需要将数据重采样到max_points个点
-            if len(cycle_data) == max_points:
-                z_data[i, :] = cycle_data
-            else:
-                # 如果周期的数据点数不等于max_points，则需要重采样
-                cycle_phases = np.linspace(0, 360, len(cycle_data))
-                z_data[i, :] = np.interp(phase, cycle_phases, cycle_data)
-        
-        # 根据当前单位设置转换数据
-        if self.use_dbm:
-            # 转换z_data中的每个值
-            for i in range(z_data.shape[0]):
-                for j in range(z_data.shape[1]):
-                    z_data[i, j] = self.convert_unit(z_data[i, j], True)
-        
-        # 创建网格
-        X, Y = np.meshgrid(phase, cycles)
-        
-        # 创建自定义颜色映射
-        custom_cmap = self.create_custom_colormap(self.color_schemes[self.current_color_scheme])
-        
-        # 绘制3D表面
-        surf = self.canvas.axes_3d.plot_surface(X, Y, z_data, cmap=custom_cmap, 
-                                           edgecolor='none', alpha=0.8, shade=True)
-        
-        # 不显示颜色条
-        # 注释掉颜色条相关代码，以隐藏颜色条
-        # self.colorbar = self.canvas.fig.colorbar(surf, ax=self.canvas.axes_3d, 
-        #                                    shrink=0.6, aspect=10, pad=0.02)
-        
-        # 设置图表标题和轴标签，使用更合适的字体大小和位置
-        self.canvas.axes_3d.set_title(f"实时PRPS图 ({num_cycles}个周期)", fontsize=12)
-        self.canvas.axes_3d.set_xlabel("相位", fontsize=10, labelpad=10)
-        self.canvas.axes_3d.set_ylabel("周期", fontsize=10, labelpad=10)
-        self.canvas.axes_3d.set_zlabel(self.unit_label, fontsize=10, labelpad=10)
-        
-        # 强制设置坐标轴范围和刻度
-        self.canvas.axes_3d.set_xlim(0, 360)  # 相位范围固定为0-360度
-        self.canvas.axes_3d.set_ylim(1, num_cycles)  # 周期范围
+            # 根据当前单位设置转换数据
+            convert = mv_to_dbm if self.use_dbm else None
+            
+            # 设置Z轴范围（根据当前单位动态调整）
+            z_min, z_max = self.get_axis_range()
+            self.prps_renderer.setup(config, self.prps_max_cycles, (z_min, z_max),
+                                     self.unit_label, custom_cmap, convert)
+            recreated = True
+        
+        self.prps_renderer.update(prps_data, self.accumulated_data.appended,
+                                  f"实时PRPS图 ({len(prps_data)}个周期)")
+        return recreated
+    
+    def draw_prps_waterfall(self, prps_data):
+        """绘制PRPS热力瀑布图或堆叠线瀑布图，只为新周期转换一次数据
+
+        Returns:
+            bool: 重新创建了图元（需要重新调整布局）时返回True
+        """
+        config = (self.prps_view, self.use_dbm, self.current_color_scheme, self.prps_max_cycles)
+        recreated = False
+        if not self.waterfall_renderer.is_ready(config):
+            custom_cmap = self.create_custom_colormap(self.color_schemes[self.current_color_scheme])
+            z_min, z_max = self.get_axis_range()
+            self.waterfall_renderer.setup(config, self.prps_view, self.prps_max_cycles, (z_min, z_max),
+                                          custom_cmap, mv_to_dbm if self.use_dbm else None)
+            recreated = True
+        
+        self.waterfall_renderer.update(prps_data, self.accumulated_data.appended,
+                                       f"实时PRPS图 ({len(prps_data)}个周期)")
+        return recreated
+    
+    def update_status(self):
+        """更新状态信息"""
+        # 更新消息队列丢弃计数
+        self.dropped_count_label.setText(f"丢弃周期: {self.mqtt_client.dropped_count}")
         
-        # 翻转y轴标签顺序，使其从大到小显示
-        # ax_prps.invert_yaxis()
+        # 更新接收到发出信号的延迟
+        if self.mqtt_client.latency_count > 0:
+            self.latency_label.setText(
+                f"延迟: 平均{self.mqtt_client.latency_avg_ms:.1f}ms / 最大{self.mqtt_client.latency_max_ms:.1f}ms")
         
-        # 设置Z轴范围（根据当前单位动态调整）
-        z_min, z_max = self.get_axis_range()
-        self.canvas.axes_3d.set_zlim(z_min, z_max)
+        # 更新PRPD和PRPS图当前的刷新间隔
+        if self.frame_scheduler.paused:
+            self.frame_rate_label.setText("刷新: 已暂停")
+        else:
+            self.frame_rate_label.setText(f"刷新: PRPD {self.frame_scheduler.interval('prpd'):.0f}ms / "
+                                          f"PRPS {self.frame_scheduler.interval('prps'):.0f}ms")
         
-        # 设置视角和投影方式
-        self.canvas.axes_3d.view_init(elev=30, azim=240)
+        # 更新数据库写入落后于接收的行数
+        if self.db_manager is not None:
+            lag_text = f"待写入: {self.db_manager.write_lag}"
+            if self.db_manager.write_dropped:
+                lag_text += f" (丢弃 {self.db_manager.write_dropped})"
+            self.write_lag_label.setText(lag_text)
         
-        # 调整子图的宽高比，确保3D图不会变形
-        self.canvas.axes_3d.set_box_aspect((1, 0.7, 0.5))
-    
-    def update_status(self):
-        """更新状态信息"""
         # 更新数据库状态
         if self.db_manager is not None and self.db_manager.connected:
             cycle_count = self.db_manager.get_cycle_count()
@@ -1940,6 +3752,10 @@ class MainWindow(QMainWindow):
         # 断开MQTT连接
         self.mqtt_client.disconnect_from_broker()
         
+        # 停止后台绘制线程
+        if self.frame_renderer is not None:
+            self.frame_renderer.stop()
+        
         # 关闭数据库连接
         if self.db_manager is not None:
             self.db_manager.close()
@@ -1952,6 +3768,12 @@ class MainWindow(QMainWindow):
         # 强制重绘
         self.need_redraw = True
 
+    def toggle_incremental_render(self, state):
+        """切换PRPD增量渲染"""
+        self.incremental_render = (state == Qt.CheckState.Checked.value)
+        self.prpd_renderer.invalidate()
+        self.need_redraw = True
+
     def toggle_sine_wave(self, state):
         """切换是否显示参考正弦波"""
         self.show_sine_wave = (state == Qt.CheckState.Checked.value)
@@ -1962,13 +3784,32 @@ class MainWindow(QMainWindow):
         self.save_to_db = (state == Qt.CheckState.Checked.value)
         self.need_redraw = True
 
-    def save_raw_data(self, broker, topic, raw_data):
-        """保存原始数据到数据库（在主线程中执行）"""
-        if self.save_to_db and self.db_manager is not None:
-            try:
-                self.db_manager.save_raw_data(broker, topic, raw_data)
-            except Exception as e:
-                print(f"保存原始数据错误（主线程）: {str(e)}")
+    def toggle_block_storage(self, state):
+        """切换周期数据是否按压缩块存储"""
+        self.block_storage = (state == Qt.CheckState.Checked.value)
+        if self.db_manager is not None:
+            self.db_manager.set_block_storage(self.block_storage_cycles if self.block_storage else 0)
+
+    def update_partitioning(self, text):
+        """切换新数据的分区存储方式"""
+        if self.db_manager is not None:
+            self.db_manager.set_partitioning(self.partition_modes[text])
+            self.update_retention()
+
+    def update_retention(self, *args):
+        """更新分区保留天数和过期分区的处理方式"""
+        if self.db_manager is not None:
+            self.db_manager.set_retention(self.retention_spin.value(),
+                                          self.retention_actions[self.retention_action_combo.currentText()])
+
+    def set_batch_payloads(self, payloads):
+        """记录下一批周期的原始负载，保存到数据库时与周期一一对应"""
+        self.batch_payloads = payloads
+
+    def update_storage_policy(self, text):
+        """切换每条消息保存原始负载、解码后的周期或两者"""
+        if self.db_manager is not None:
+            self.db_manager.set_storage_policy(self.storage_policies[text])
 
     def show_database_view(self):
         """显示数据库查看对话框"""
@@ -1992,6 +3833,9 @@ class MainWindow(QMainWindow):
         # 更新画布的单位标签
         if hasattr(self, 'canvas') and self.canvas.axes_3d:
             self.canvas.axes_3d.set_zlabel(self.unit_label)
+        
+        # 参考正弦波随单位变化，丢弃按原单位缓存的正弦波
+        shared_cache.invalidate("sine")
 
         # 强制重绘
         self.need_redraw = True
@@ -2008,10 +3852,10 @@ class MainWindow(QMainWindow):
         """
         if to_dbm:
             # 毫伏转dBm: 毫伏值*54.545-81.818
-            return value * 54.545 - 81.818
+            return mv_to_dbm(value)
         else:
             # dBm转毫伏: (dBm值+81.818)/54.545
-            return (value + 81.818) / 54.545
+            return dbm_to_mv(value)
     
     def convert_data_for_display(self, data):
         """根据当前单位设置转换数据用于显示
@@ -2022,15 +3866,8 @@ class MainWindow(QMainWindow):
         Returns:
             转换后的数据
         """
-        if self.use_dbm:
-            if isinstance(data, list):
-                return [self.convert_unit(x, True) for x in data]
-            elif isinstance(data, np.ndarray):
-                return np.array([self.convert_unit(x, True) for x in data.flatten()]).reshape(data.shape)
-            else:
-                return self.convert_unit(data, True)
-        else:
-            return data  # 如果使用毫伏，则不需要转换
+        # 列表和数组都按整个数组转换，使用毫伏时不需要转换
+        return to_display_unit(data, self.use_dbm)
 
     def get_axis_range(self):
         """根据当前单位获取轴范围
@@ -2072,13 +3909,13 @@ class MainWindow(QMainWindow):
         """保存周期数据到CSV文件"""
         # 检查是否有足够的数据
         self.data_mutex.lock()
-        if not self.accumulated_data:
+        if len(self.accumulated_data) == 0:
             self.data_mutex.unlock()
             QMessageBox.warning(self, "无数据", "没有可用的周期数据可保存。")
             return
         
-        # 复制数据，避免在保存过程中数据被修改
-        data_to_save = self.accumulated_data.copy()
+        # 只拷贝需要导出的周期，文件对话框打开期间缓冲区仍会继续写入
+        data_to_save = self.accumulated_data.snapshot(self.csv_export_cycles)
         self.data_mutex.unlock()
         
         # 生成默认文件名（年月日时分秒.csv）
@@ -2157,7 +3994,7 @@ class MainWindow(QMainWindow):
     def auto_save_image(self):
         """自动保存PRPD和PRPS图像"""
         # 检查是否需要保存任何图像
-        if not (self.auto_save_prpd or self.auto_save_prps) or not self.accumulated_data:
+        if not (self.auto_save_prpd or self.auto_save_prps) or len(self.accumulated_data) == 0:
             return
         
         try:
@@ -2166,8 +4003,8 @@ class MainWindow(QMainWindow):
             
             # 获取当前数据
             self.data_mutex.lock()
-            prpd_data = self.accumulated_data[-self.max_cycles:] if len(self.accumulated_data) > self.max_cycles else self.accumulated_data.copy()
-            prps_data = self.accumulated_data[-self.prps_max_cycles:] if len(self.accumulated_data) > self.prps_max_cycles else self.accumulated_data.copy()
+            prpd_data = self.accumulated_data.last(self.max_cycles)
+            prps_data = self.accumulated_data.last(self.prps_max_cycles)
             self.data_mutex.unlock()
             
             # 根据用户选择保存PRPD图
@@ -2213,28 +4050,12 @@ class MainWindow(QMainWindow):
         fig_prpd = Figure(figsize=(10, 6), dpi=100)
         ax_prpd = fig_prpd.add_subplot(111)
         
-        # 合并所有周期的数据用于绘图
-        all_data = []
-        x_data = []
-        
-        for cycle_data in prpd_data:
-            all_data.extend(cycle_data)
-            cycle_phases = np.linspace(0, 360, len(cycle_data))
-            x_data.extend(cycle_phases)
+        # 所有周期的相位点相同，直接平铺一个周期的相位
+        x_data = shared_cache.phase_tile(prpd_data.shape[1], len(prpd_data))
         
-        # 根据当前单位设置转换数据
-        if self.use_dbm:
-            display_data = []
-            for cycle_data in prpd_data:
-                display_data.append([self.convert_unit(x, True) for x in cycle_data])
-            
-            # 合并所有周期的转换后数据
-            all_display_data = []
-            for cycle_data in display_data:
-                all_display_data.extend(cycle_data)
-        else:
-            display_data = prpd_data
-            all_display_data = all_data
+        # 根据当前单位设置转换数据，一次数组运算完成
+        display_data = to_display_unit(prpd_data, self.use_dbm)
+        all_display_data = display_data.ravel()
         
         # 根据当前图表类型绘制
         chart_type = self.chart_type_combo.currentText()
@@ -2254,19 +4075,23 @@ class MainWindow(QMainWindow):
             # colorbar = fig_prpd.colorbar(scatter, ax=ax_prpd, fraction=0.03, pad=0.04, shrink=0.8)
             # colorbar.set_label(self.unit_label)
         elif chart_type == "线图":
-            # 对于线图，按周期分别绘制
+            # 对于线图，按周期分别绘制，所有周期的相位相同
+            cycle_phases = shared_cache.phase_axis(prpd_data.shape[1])
             for i, cycle_data in enumerate(display_data):
-                cycle_phases = np.linspace(0, 360, len(cycle_data))
                 ax_prpd.plot(cycle_phases, cycle_data, linewidth=1.0)
+        elif chart_type == "密度图":
+            density = PhaseAmplitudeHistogram(len(prpd_data), self.prpd_density.amplitude_range,
+                                              self.prpd_density.phase_bins, self.prpd_density.amplitude_bins)
+            density.extend(prpd_data)
+            self.draw_prpd_density(ax_prpd, density.counts)
         
         # 绘制参考正弦波
         if self.show_sine_wave:
             # 获取正弦波参数
             sine_amp, sine_offset = self.get_sine_wave_params()
 
-            # 生成正弦波数据
-            x_sine = np.linspace(0, 360, 1000)
-            y_sine = sine_amp * np.sin(x_sine * 2 * np.pi / 360) + sine_offset
+            # 正弦波数据只随单位变化，从缓存中取出
+            x_sine, y_sine = shared_cache.sine_overlay(sine_amp, sine_offset)
 
             # 绘制正弦波
             ax_prpd.plot(x_sine, y_sine, 'r-', linewidth=1.5, alpha=0.7, label="参考正弦波")
@@ -2299,35 +4124,17 @@ class MainWindow(QMainWindow):
         if num_cycles == 0:
             return
             
-        # 找到所有周期中最大的数据点数
-        max_points = max(len(cycle_data) for cycle_data in prps_data)
-        
-        # 创建规则网格
-        phase = np.linspace(0, 360, max_points)
-        cycles = np.arange(1, num_cycles + 1)
-        
-        # 创建空的Z值矩阵
-        z_data = np.zeros((num_cycles, max_points))
+        # 环形缓冲区中所有周期的数据点数相同
+        max_points = prps_data.shape[1]
         
-        # 填充Z值矩阵
-        for i, cycle_data in enumerate(prps_data):
-            # 对于每个周期，我们需要将数据重采样到max_points个点
-            if len(cycle_data) == max_points:
-                z_data[i, :] = cycle_data
-            else:
-                # 如果周期的数据点数不等于max_points，则需要重采样
-                cycle_phases = np.linspace(0, 360, len(cycle_data))
-                z_data[i, :] = np.interp(phase, cycle_phases, cycle_data)
+        # 缓冲区视图只读，拷贝一份作为Z值矩阵
+        z_data = np.array(prps_data, dtype=np.float64)
         
         # 根据当前单位设置转换数据
-        if self.use_dbm:
-            # 转换z_data中的每个值
-            for i in range(z_data.shape[0]):
-                for j in range(z_data.shape[1]):
-                    z_data[i, j] = self.convert_unit(z_data[i, j], True)
+        z_data = to_display_unit(z_data, self.use_dbm)
         
-        # 创建网格
-        X, Y = np.meshgrid(phase, cycles)
+        # 规则网格从缓存中取出
+        X, Y = shared_cache.meshgrid(max_points, num_cycles)
         
         # 创建自定义颜色映射
         custom_cmap = self.create_custom_colormap(self.color_schemes[self.current_color_scheme])
@@ -2373,23 +4180,9 @@ class MainWindow(QMainWindow):
         根据给定的颜色列表创建自定义颜色映射
         
         :param colors: 颜色列表，至少包含4种颜色
-        :return: matplotlib颜色映射对象
+        :return: matplotlib颜色映射对象（按颜色方案缓存，各图表共享，不要修改）
         """
-        import matplotlib.colors as mcolors
-        
-        # 确保有足够的颜色
-        if len(colors) < 4:
-            colors = colors + ['#FF0000']  # 默认添加红色
-        
-        # 创建颜色映射
-        n_bins = 100  # 颜色渐变的细腻程度
-        cmap = mcolors.LinearSegmentedColormap.from_list(
-            'custom_colormap', 
-            [mcolors.to_rgba(color) for color in colors[:4]], 
-            N=n_bins
-        )
-        
-        return cmap
+        return shared_cache.colormap(colors)
 
     def get_save_paths(self):
         """获取数据库和图像保存路径"""
@@ -2407,8 +4200,8 @@ class MainWindow(QMainWindow):
             application_path = os.getcwd()
             print(f"获取应用路径出错，使用当前工作目录: {application_path}, 错误: {str(e)}")
         
-        # 保存路径信息
-        self.db_path = os.path.join(application_path, "gis_pd_data.db")
+        # 保存路径信息，数据库路径与数据库管理器实际打开的文件一致
+        self.db_path = self.db_manager.db_path
         self.images_path = os.path.join(application_path, "saved_images")
         
         # 分别为PRPD和PRPS图创建单独的子文件夹
@@ -0,0 +1,816 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图表渲染模块：实时PRPD/PRPS图的增量渲染
+
+图元只在设置变化时创建一次，之后每帧只更新数据；
+PRPD图在坐标轴范围未变化时使用缓存的背景进行blit，避免重绘整个画布；
+PRPS图保持同一个3D坐标轴，每个新周期只计算一次对应的表面条带，
+到刷新时间时同样只重绘并blit画布上PRPD数据区域右侧的PRPS区域，两个图按各自的间隔刷新；
+也可以改为绘制较快的二维热力瀑布图或堆叠线瀑布图，用于显示几百个周期。
+OffscreenFrameRenderer在后台线程中用不显示的Agg画布绘制一帧，
+界面线程只显示绘制好的RGBA图像。
+"""
+
+import time
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
+from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+
+from gis_pd_buffers import CycleRingBuffer
+from gis_pd_render_cache import shared_cache
+from gis_pd_lod import DEFAULT_LOD_METHOD, DEFAULT_LOD_THRESHOLD, decimate_prpd
+from gis_pd_scheduler import FRAME_VIEWS
+from gis_pd_units import mv_to_dbm, to_display_unit
+
+# 实时图表中PRPD和PRPS坐标轴的位置 [left, bottom, width, height]，两者均分画布
+PRPD_AXES_POSITION = [0.08, 0.1, 0.38, 0.8]
+PRPS_AXES_POSITION = [0.58, 0.1, 0.38, 0.8]
+PRPS_BOX_ASPECT = (1, 0.7, 0.5)
+
+# 使用IncrementalPRPDRenderer的PRPD图表类型，其余类型（线图）每帧重建图元
+INCREMENTAL_PRPD_TYPES = ("散点图", "颜色散点图", "密度图")
+
+# PRPS图的显示方式：三维表面使用IncrementalPRPSRenderer，两种瀑布图使用WaterfallPRPSRenderer
+PRPS_VIEW_TYPES = ("三维表面", "热力瀑布图", "堆叠线瀑布图")
+WATERFALL_PRPS_TYPES = ("热力瀑布图", "堆叠线瀑布图")
+
+
+def prpd_phase_columns(ax):
+    """0到360度相位在PRPD坐标轴上占用的像素列数，缩放后相应增加，用于抽稀散点"""
+    x_min, x_max = ax.get_xlim()
+    return ax.bbox.width * 360 / max(abs(x_max - x_min), 1e-6)
+
+
+class IncrementalPRPDRenderer:
+    """增量PRPD渲染器
+
+    散点图元（密度图模式下为图像）和参考正弦波只创建一次，
+    每帧通过set_offsets/set_array或set_data更新数据。
+    两者都设置为animated，不参与普通重绘，而是在draw_event中叠加绘制，
+    这样就可以缓存不含数据的背景，在坐标轴范围不变时只blit PRPD区域。
+    """
+
+    # 与matplotlib默认自动缩放一致，X轴两侧各留5%边距
+    X_LIMITS = (-18, 378)
+
+    def __init__(self, canvas, ax):
+        """初始化渲染器
+
+        Args:
+            canvas: 图表所在的FigureCanvas
+            ax: PRPD图所在的2D坐标轴
+        """
+        self.canvas = canvas
+        self.ax = ax
+        self.scatter = None
+        self.image = None
+        self.sine_line = None
+        self.config = None  # 创建图元时的设置，变化时需要重新创建
+        self.title = None
+        self._background = None
+        self._background_limits = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def invalidate(self):
+        """使图元失效，下一帧重新创建（例如坐标轴被外部清除后）"""
+        self.scatter = None
+        self.image = None
+        self.sine_line = None
+        self.config = None
+        self.title = None
+        self._background = None
+        self._background_limits = None
+
+    @property
+    def data_artist(self):
+        """当前显示数据的图元（散点或密度图像）"""
+        return self.image if self.image is not None else self.scatter
+
+    def is_ready(self, config):
+        """判断图元是否已按给定设置创建"""
+        return self.data_artist is not None and self.config == config
+
+    def setup(self, config, ylim, ylabel, cmap=None, sine_xy=None, density_shape=None):
+        """清除坐标轴并创建图元
+
+        Args:
+            config: 当前设置，用于判断之后是否需要重新创建
+            ylim: Y轴范围
+            ylabel: Y轴标签
+            cmap: 颜色映射，为None时绘制单色散点图
+            sine_xy: 参考正弦波的(x, y)，为None时不绘制
+            density_shape: 密度图计数矩阵的形状，给出时创建图像而不是散点
+        """
+        ax = self.ax
+        ax.clear()
+
+        empty = np.empty(0)
+        self.scatter = None
+        self.image = None
+        if density_shape is not None:
+            # 计数为0的分箱被遮罩，显示为背景
+            self.image = ax.imshow(np.ma.masked_all(density_shape), cmap=cmap, origin='lower',
+                                   extent=(0, 360, ylim[0], ylim[1]), aspect='auto',
+                                   interpolation='nearest', animated=True)
+        elif cmap is not None:
+            self.scatter = ax.scatter(empty, empty, c=empty, cmap=cmap, alpha=0.8, s=10, animated=True)
+        else:
+            self.scatter = ax.scatter(empty, empty, alpha=0.7, s=10, animated=True)
+
+        self.sine_line = None
+        if sine_xy is not None:
+            self.sine_line, = ax.plot(sine_xy[0], sine_xy[1], 'r-', linewidth=1.5, alpha=0.7,
+                                      label="参考正弦波", animated=True)
+
+        ax.set_xlabel("相位", fontsize=10, labelpad=10)
+        ax.set_ylabel(ylabel, fontsize=10, labelpad=10)
+        ax.set_xlim(*self.X_LIMITS)
+        ax.set_ylim(*ylim)
+        ax.grid(True, linestyle='--', alpha=0.7)
+
+        self.config = config
+        self.title = None
+        self._background = None
+        self._background_limits = None
+
+    def update(self, x_data, y_data, title, colors=None):
+        """更新散点数据
+
+        Args:
+            x_data: 相位数组
+            y_data: 幅值数组
+            title: 图表标题
+            colors: 颜色散点图的着色数值，为None时不着色
+
+        Returns:
+            bool: 标题发生变化，需要完整重绘画布时返回True
+        """
+        self.scatter.set_offsets(np.column_stack((x_data, y_data)))
+        if colors is not None:
+            self.scatter.set_array(np.asarray(colors))
+            self.scatter.autoscale()
+
+        return self._set_title(title)
+
+    def update_density(self, counts, title):
+        """更新密度图计数
+
+        Args:
+            counts: 计数矩阵，形状与创建时的density_shape一致
+            title: 图表标题
+
+        Returns:
+            bool: 标题发生变化，需要完整重绘画布时返回True
+        """
+        self.image.set_data(np.ma.masked_equal(counts, 0))
+        self.image.set_clim(1, max(int(counts.max()), 1))
+        return self._set_title(title)
+
+    def _set_title(self, title):
+        """更新标题，返回是否需要完整重绘"""
+        if title != self.title:
+            # 标题在坐标轴区域之外，无法通过blit更新
+            self.ax.set_title(title, fontsize=12)
+            self.title = title
+            return True
+        return False
+
+    def blit(self):
+        """使用缓存的背景只重绘PRPD区域
+
+        Returns:
+            bool: 成功blit返回True；背景无效或坐标轴范围已变化时返回False，需要完整重绘
+        """
+        if self.data_artist is None or self._background is None:
+            return False
+        if self._background_limits != (self.ax.get_xlim(), self.ax.get_ylim()):
+            return False
+
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.data_artist)
+        if self.sine_line is not None:
+            self.ax.draw_artist(self.sine_line)
+        self.canvas.blit(self.ax.bbox)
+        return True
+
+    def _on_draw(self, event):
+        """完整重绘后缓存背景，并叠加绘制animated图元"""
+        # 坐标轴被外部清除后图元已失效
+        artist = self.data_artist
+        if artist is None or artist not in self.ax.get_children():
+            return
+
+        # 保存图片时画布会临时切换，只有实时画布需要缓存背景
+        if event.canvas is self.canvas:
+            self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+            self._background_limits = (self.ax.get_xlim(), self.ax.get_ylim())
+
+        artist.draw(event.renderer)
+        if self.sine_line is not None:
+            self.sine_line.draw(event.renderer)
+
+
+class IncrementalPRPSRenderer:
+    """增量PRPS渲染器
+
+    三维坐标轴和表面图元只创建一次，表面由相邻周期之间的多边形条带组成。
+    每个条带在对应周期到达时计算一次并缓存在环形缓冲区中，
+    之后每帧只需把缓存的条带拼接到固定的相位/周期网格上，再更新顶点和颜色。
+    多边形的划分和着色与plot_surface相同：相位方向按步长分块，每块的多边形沿两个周期
+    经过块内全部相位点，颜色取周边各点的平均值。plot_surface指定颜色映射时不做光照
+    （shade参数不起作用），因此两者绘制的表面一致。
+    """
+
+    # 与plot_surface默认的ccount一致，相位方向最多保留50列
+    MAX_COLUMNS = 50
+
+    def __init__(self, ax):
+        """初始化渲染器
+
+        Args:
+            ax: PRPS图所在的3D坐标轴
+        """
+        self.ax = ax
+        self.surface = None
+        self.config = None
+        self.title = None
+        self._convert = None
+        self._capacity = 0
+        self._width = 0  # 每个周期的相位点数
+        self._block_columns = None  # 每块多边形依次经过的相位点下标（下侧周期从左到右，上侧周期从右到左）
+        self._block_upper = None  # 每块多边形的各顶点是否在上侧周期
+        self._block_weights = None  # 计算每块颜色时各顶点的权重，补齐的顶点权重为0
+        self._padding = None  # 每块末尾补齐的顶点
+        self._strips = None  # 每个条带各多边形顶点的Z值
+        self._template = None  # 条带多边形顶点的X/Y坐标，Z值每帧填入
+        self._last_row = None  # 最新周期转换后的Z值，用于和下一个周期组成条带
+        self._appended = 0
+        self._num_cycles = 0
+        self._view = None  # 重新创建图元时保留用户旋转后的视角
+
+    def invalidate(self):
+        """使图元和缓存失效，下一帧重新创建"""
+        if self.surface is not None:
+            self._view = (self.ax.elev, self.ax.azim)
+        self.surface = None
+        self.config = None
+        self.title = None
+        self._reset_strips()
+
+    def _reset_strips(self):
+        """清空条带缓存"""
+        self._width = 0
+        self._block_columns = None
+        self._block_upper = None
+        self._block_weights = None
+        self._padding = None
+        self._strips = None
+        self._template = None
+        self._last_row = None
+        self._appended = 0
+        self._num_cycles = 0
+
+    def is_ready(self, config):
+        """判断图元是否已按给定设置创建（坐标轴被外部清除后需要重新创建）"""
+        return (self.surface is not None and self.config == config
+                and self.surface in self.ax.collections)
+
+    def setup(self, config, capacity, zlim, zlabel, cmap, convert=None):
+        """清除坐标轴并创建表面图元
+
+        Args:
+            config: 当前设置，用于判断之后是否需要重新创建
+            capacity: PRPS图显示的最大周期数
+            zlim: Z轴范围
+            zlabel: Z轴标签
+            cmap: 颜色映射
+            convert: 周期数据的单位转换函数，为None时不转换
+        """
+        ax = self.ax
+        if self.surface is not None and self._view is None:
+            self._view = (ax.elev, ax.azim)
+        ax.clear()
+
+        self.surface = Poly3DCollection([], cmap=cmap, edgecolor='none', alpha=0.8)
+        ax.add_collection3d(self.surface, autolim=False)
+
+        ax.set_xlabel("相位", fontsize=10, labelpad=10)
+        ax.set_ylabel("周期", fontsize=10, labelpad=10)
+        ax.set_zlabel(zlabel, fontsize=10, labelpad=10)
+        ax.set_xlim(0, 360)
+        ax.set_zlim(*zlim)
+
+        elev, azim = self._view if self._view is not None else (30, 240)
+        ax.view_init(elev=elev, azim=azim)
+        ax.set_box_aspect((1, 0.7, 0.5))
+
+        self.config = config
+        self.title = None
+        self._convert = convert
+        self._capacity = max(1, int(capacity))
+        self._view = None
+        self._reset_strips()
+
+    def _prepare_columns(self, width):
+        """按周期点数确定相位分块和条带顶点模板"""
+        # 与plot_surface相同的分块方式：每块跨stride个相位间隔，最后一块到最后一个相位点为止
+        stride = max(int(np.ceil(width / self.MAX_COLUMNS)), 1)
+        starts = np.arange(0, max(width - 1, 1), stride)[:, None]
+        # 每块的相位点数，最后一块可能较少
+        counts = np.minimum(starts + stride, max(width - 1, 1)) - starts + 1
+        # 顶点依次为下侧周期的counts个点、上侧周期倒序的counts个点；最后一块在末尾补齐为相同的顶点数，
+        # 补齐的顶点被遮罩，不参与绘制
+        vertex = np.arange(2 * (stride + 1))
+        upper = (vertex >= counts) & (vertex < 2 * counts)
+        self._width = width
+        columns = np.where(upper, starts + 2 * counts - 1 - vertex, starts + vertex)
+        self._block_columns = np.minimum(columns, width - 1)
+        self._block_upper = upper
+        self._padding = vertex >= 2 * counts
+        weights = (~self._padding).astype(np.float64)
+        self._block_weights = weights / weights.sum(axis=1, keepdims=True)
+
+        num_strips = max(1, self._capacity - 1)
+        num_blocks, num_vertices = self._block_columns.shape
+        phase = shared_cache.phase_axis(width)
+
+        # 条带k位于第k+1和第k+2个周期之间，顶点先沿下侧周期从左到右，再沿上侧周期从右到左
+        template = np.zeros((num_strips, num_blocks, num_vertices, 3))
+        template[:, :, :, 0] = phase[self._block_columns]
+        strip_index = np.arange(1, num_strips + 1, dtype=float)[:, None, None]
+        template[:, :, :, 1] = strip_index + upper
+        self._template = template
+        self._strips = CycleRingBuffer(num_strips, width=num_blocks * num_vertices, dtype=np.float64)
+
+    def _append_row(self, row):
+        """转换一个新周期，并与上一个周期组成一个条带"""
+        z = np.asarray(row, dtype=np.float64)
+        if self._convert is not None:
+            z = self._convert(z)
+        if self._last_row is not None:
+            vertices = np.where(self._block_upper, z[self._block_columns], self._last_row[self._block_columns])
+            self._strips.append(vertices.ravel())
+        self._last_row = z
+
+    def update(self, cycles, appended, title):
+        """追加新周期并更新表面
+
+        Args:
+            cycles: 最近的周期数据二维数组（周期数 × 相位点数），最多capacity个
+            appended: 数据源追加的周期总数，用于判断有多少个新周期
+            title: 图表标题
+        """
+        num_cycles = len(cycles)
+        if num_cycles == 0:
+            return
+
+        new_rows = appended - self._appended
+        if (self._strips is None or cycles.shape[1] != self._width
+                or new_rows < 0 or new_rows >= num_cycles):
+            # 首次绘制、点数变化或新周期已填满窗口时，按窗口内全部周期重建条带
+            self._reset_strips()
+            self._prepare_columns(cycles.shape[1])
+            new_rows = num_cycles
+
+        # 只为新到达的周期计算条带
+        for row in cycles[num_cycles - new_rows:]:
+            self._append_row(row)
+        self._appended = appended
+
+        num_strips = min(len(self._strips), num_cycles - 1)
+        if num_strips > 0:
+            num_vertices = self._block_columns.shape[1]
+            vertices = self._strips.last(num_strips).reshape(num_strips, -1, num_vertices)
+            verts = self._template[:num_strips].copy()
+            verts[:, :, :, 2] = vertices
+            if self._padding.any():
+                mask = np.broadcast_to(self._padding[None, :, :, None], verts.shape)
+                verts = np.ma.MaskedArray(verts, mask)
+            self.surface.set_verts(verts.reshape(-1, num_vertices, 3))
+            self.surface.set_array((vertices * self._block_weights).sum(axis=2).ravel())
+            # 与plot_surface一致，颜色范围由窗口内数据的最小/最大值决定
+            self.surface.autoscale()
+        else:
+            self.surface.set_verts([])
+
+        if num_cycles != self._num_cycles:
+            # 只有一个周期时Y轴范围不能为零
+            self.ax.set_ylim(1, max(num_cycles, 2))
+            self._num_cycles = num_cycles
+        if title != self.title:
+            self.ax.set_title(title, fontsize=12)
+            self.title = title
+
+
+class WaterfallPRPSRenderer:
+    """二维PRPS瀑布图渲染器，代替绘制较慢的三维表面
+
+    "热力瀑布图"把周期×相位矩阵绘制为图像，颜色表示幅值，每帧通过set_data更新；
+    "堆叠线瀑布图"每个周期一条折线，按周期依次向上错开，相邻折线部分重叠，形成伪三维效果。
+    每个周期只在到达时转换一次单位（折线还缩放到固定高度），缓存在环形缓冲区中，
+    每帧只需取出缓存的行，绘制几百个周期也不影响实时刷新。颜色范围为幅值轴范围。
+    折线间距小于MIN_LINE_SPACING_PX像素时，相邻周期合并为一条取最大值的折线，不丢失脉冲。
+    """
+
+    RIDGE_HEIGHT = 4.0  # 堆叠线瀑布图中幅值轴范围对应的周期间距数
+    MIN_LINE_SPACING_PX = 2  # 堆叠线瀑布图相邻折线的最小像素间距
+
+    def __init__(self, ax):
+        """初始化渲染器
+
+        Args:
+            ax: PRPS瀑布图所在的2D坐标轴
+        """
+        self.ax = ax
+        self.artist = None  # 热力图为AxesImage，堆叠线为LineCollection
+        self.config = None
+        self.title = None
+        self._view_type = None
+        self._zlim = (0.0, 1.0)
+        self._convert = None
+        self._capacity = 0
+        self._rows = None  # 转换（和缩放）后的周期行
+        self._phase = None
+        self._appended = 0
+        self._num_cycles = 0
+
+    def invalidate(self):
+        """使图元和缓存失效，下一帧重新创建"""
+        self.artist = None
+        self.config = None
+        self.title = None
+        self._rows = None
+
+    def is_ready(self, config):
+        """判断图元是否已按给定设置创建（坐标轴被外部清除后需要重新创建）"""
+        return self.artist is not None and self.config == config and self.artist in self.ax.get_children()
+
+    def setup(self, config, view_type, capacity, zlim, cmap, convert=None):
+        """清除坐标轴并创建图元
+
+        Args:
+            config: 当前设置，用于判断之后是否需要重新创建
+            view_type: WATERFALL_PRPS_TYPES之一
+            capacity: 显示的最大周期数
+            zlim: 幅值轴范围，也是颜色范围
+            cmap: 颜色映射
+            convert: 周期数据的单位转换函数，为None时不转换
+        """
+        ax = self.ax
+        ax.clear()
+        if view_type == "热力瀑布图":
+            self.artist = ax.imshow(np.ma.masked_all((1, 1)), cmap=cmap, origin='lower', aspect='auto',
+                                    interpolation='nearest', extent=(0, 360, 0.5, 1.5),
+                                    vmin=zlim[0], vmax=zlim[1])
+        else:
+            self.artist = LineCollection([], cmap=cmap, linewidths=0.8)
+            self.artist.set_clim(*zlim)
+            ax.add_collection(self.artist, autolim=False)
+            ax.grid(True, linestyle='--', alpha=0.5)
+
+        ax.set_xlabel("相位", fontsize=10, labelpad=10)
+        ax.set_ylabel("周期", fontsize=10, labelpad=10)
+        ax.set_xlim(0, 360)
+
+        self.config = config
+        self.title = None
+        self._view_type = view_type
+        self._zlim = (float(zlim[0]), float(zlim[1]))
+        self._convert = convert
+        self._capacity = max(1, int(capacity))
+        self._rows = None
+        self._num_cycles = 0
+
+    def _convert_rows(self, rows):
+        """转换单位；堆叠线还把幅值轴范围缩放到RIDGE_HEIGHT个周期间距"""
+        rows = np.asarray(rows, dtype=np.float64)
+        if self._convert is not None:
+            rows = self._convert(rows)
+        if self._view_type == "热力瀑布图":
+            return rows
+        z_min, z_max = self._zlim
+        return np.clip((rows - z_min) / max(z_max - z_min, 1e-12), 0, 1) * self.RIDGE_HEIGHT
+
+    def update(self, cycles, appended, title):
+        """追加新周期并更新瀑布图
+
+        Args:
+            cycles: 最近的周期数据二维数组（周期数 × 相位点数），最多capacity个
+            appended: 数据源追加的周期总数，用于判断有多少个新周期
+            title: 图表标题
+        """
+        num_cycles = len(cycles)
+        if num_cycles == 0:
+            return
+
+        new_rows = appended - self._appended
+        if self._rows is None or cycles.shape[1] != self._rows.width or new_rows < 0 or new_rows >= num_cycles:
+            # 首次绘制、点数变化或新周期已填满窗口时，按窗口内全部周期重建缓存
+            self._rows = CycleRingBuffer(self._capacity, width=cycles.shape[1], dtype=np.float32)
+            self._phase = shared_cache.phase_axis(cycles.shape[1])
+            new_rows = num_cycles
+        if new_rows > 0:
+            self._rows.extend(self._convert_rows(cycles[num_cycles - new_rows:]))
+        self._appended = appended
+
+        rows = self._rows.last(num_cycles)
+        if self._view_type == "热力瀑布图":
+            self.artist.set_data(rows)
+            self.artist.set_extent((0, 360, 0.5, num_cycles + 0.5))
+        else:
+            # 第i个周期（从1开始，最早的在下）的折线以i为基线
+            baselines = np.arange(1, num_cycles + 1, dtype=np.float32)
+            max_lines = max(1, int(self.ax.bbox.height / self.MIN_LINE_SPACING_PX))
+            if num_cycles > max_lines:
+                # 折线过密时相邻周期合并为一条，取最大值，基线为这些周期的中间位置
+                starts = np.linspace(0, num_cycles, max_lines, endpoint=False).astype(np.int64)
+                rows = np.maximum.reduceat(rows, starts, axis=0)
+                baselines = np.add.reduceat(baselines, starts) / np.diff(np.r_[starts, num_cycles])
+            baselines = baselines[:, None]
+            segments = np.empty(rows.shape + (2,), dtype=np.float32)
+            segments[..., 0] = self._phase
+            segments[..., 1] = rows + baselines
+            self.artist.set_segments(segments)
+            # 每条折线按该周期的最大幅值着色
+            self.artist.set_array(self._zlim[0] + rows.max(axis=1) / self.RIDGE_HEIGHT
+                                  * (self._zlim[1] - self._zlim[0]))
+
+        if num_cycles != self._num_cycles:
+            if self._view_type == "热力瀑布图":
+                self.ax.set_ylim(0.5, num_cycles + 0.5)
+            else:
+                self.ax.set_ylim(0, num_cycles + self.RIDGE_HEIGHT + 1)
+            self._num_cycles = num_cycles
+        if title != self.title:
+            self.ax.set_title(title, fontsize=12)
+            self.title = title
+
+
+class PRPSPanelBlitter:
+    """PRPS区域的独立重绘
+
+    PRPS的3D坐标轴和瀑布图坐标轴都设置为animated，不参与普通重绘，而是在draw_event中叠加绘制，
+    这样就可以缓存PRPD数据区域右侧不含PRPS图的背景。PRPS图到刷新时间时只重绘这两个坐标轴中
+    显示的一个并blit该区域，与PRPD数据区域的blit互不影响，接收数据时不需要重绘整个画布。
+    画布较窄、PRPS图的坐标轴标签伸入PRPD数据区域时不缓存背景，每次完整重绘。
+    """
+
+    def __init__(self, canvas, axes, prpd_ax):
+        """初始化
+
+        Args:
+            canvas: 图表所在的FigureCanvas
+            axes: PRPS图的坐标轴（3D坐标轴和瀑布图坐标轴）
+            prpd_ax: PRPD图的坐标轴，其数据区域由IncrementalPRPDRenderer单独blit
+        """
+        self.canvas = canvas
+        self.axes = [ax for ax in axes if ax is not None]
+        self.prpd_ax = prpd_ax
+        for ax in self.axes:
+            ax.set_animated(True)
+        self.bbox = None  # 上次完整重绘时PRPS区域的像素范围
+        self._background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def invalidate(self):
+        """丢弃缓存的背景，下一次需要完整重绘"""
+        self.bbox = None
+        self._background = None
+
+    def blit(self):
+        """使用缓存的背景只重绘PRPS区域
+
+        Returns:
+            bool: 成功blit返回True；背景无效时返回False，需要完整重绘
+        """
+        if self._background is None:
+            return False
+        self.canvas.restore_region(self._background)
+        for ax in self.axes:
+            if ax.get_visible():
+                self.canvas.figure.draw_artist(ax)
+        self.canvas.blit(self.bbox)
+        return True
+
+    def _on_draw(self, event):
+        """完整重绘后缓存PRPS区域的背景，并叠加绘制PRPS坐标轴"""
+        visible = [ax for ax in self.axes if ax.get_visible()]
+        # 保存图片时画布会临时切换，只有实时画布需要缓存背景
+        if event.canvas is self.canvas:
+            self.invalidate()
+            figure_bbox = self.canvas.figure.bbox
+            x0 = np.ceil(self.prpd_ax.bbox.x1) + 1
+            if all(ax.get_tightbbox(event.renderer).x0 >= x0 for ax in visible):
+                self.bbox = Bbox.from_extents(x0, figure_bbox.y0, figure_bbox.x1, figure_bbox.y1)
+                self._background = self.canvas.copy_from_bbox(self.bbox)
+        for ax in visible:
+            ax.draw(event.renderer)
+
+
+class FrameSnapshot:
+    """绘制一帧所需的数据和设置
+
+    在界面线程中创建，之后只读；数组都是拷贝并设为只读，
+    渲染线程使用期间界面线程可以继续追加周期。
+    """
+
+    def __init__(self, sequence, size, dpi, chart_type, cycles, appended, max_cycles, prps_max_cycles,
+                 use_dbm, unit_label, axis_range, color_scheme, cmap, sine_xy=None, density=None,
+                 views=FRAME_VIEWS, lod_method=DEFAULT_LOD_METHOD, lod_threshold=DEFAULT_LOD_THRESHOLD,
+                 prps_view="三维表面"):
+        """初始化
+
+        Args:
+            sequence: 帧序号，递增，用于丢弃过期的帧
+            size: 图像的像素尺寸(宽, 高)
+            dpi: 绘制的分辨率
+            chart_type: PRPD图表类型
+            cycles: 最近的周期数据拷贝（周期数 × 相位点数，毫伏）
+            appended: 缓冲区追加的周期总数
+            max_cycles: PRPD图的最大周期数
+            prps_max_cycles: PRPS图的最大周期数
+            use_dbm: 是否以dBm显示
+            unit_label: 幅值轴标签
+            axis_range: 幅值轴范围
+            color_scheme: 颜色方案名称，颜色方案变化时重新创建图元
+            cmap: 颜色方案对应的颜色映射
+            sine_xy: 参考正弦波的(x, y)，为None时不绘制
+            density: 密度图的(计数矩阵拷贝, 窗口内周期数)，其他图表类型为None
+            views: 需要更新的图（"prpd"、"prps"），其余的图保持上一帧的内容
+            lod_method: PRPD散点图的抽稀方法，见gis_pd_lod.LOD_METHODS
+            lod_threshold: 抽稀时全部保留的脉冲阈值（毫伏）
+            prps_view: PRPS图的显示方式，PRPS_VIEW_TYPES之一
+        """
+        self.sequence = sequence
+        self.size = (max(1, int(size[0])), max(1, int(size[1])))
+        self.dpi = dpi
+        self.chart_type = chart_type
+        self.cycles = cycles
+        self.appended = appended
+        self.max_cycles = max_cycles
+        self.prps_max_cycles = prps_max_cycles
+        self.use_dbm = use_dbm
+        self.unit_label = unit_label
+        self.axis_range = tuple(axis_range)
+        self.color_scheme = color_scheme
+        self.cmap = cmap
+        self.sine_xy = sine_xy
+        self.density = density
+        self.views = frozenset(views)
+        self.lod_method = lod_method
+        self.lod_threshold = lod_threshold
+        self.prps_view = prps_view
+        self.cycles.flags.writeable = False
+        if density is not None:
+            density[0].flags.writeable = False
+
+
+class OffscreenFrameRenderer:
+    """在不显示的Agg画布上绘制实时PRPD/PRPS图
+
+    与界面中的画布布局相同，同样使用增量渲染器复用图元。
+    只能在创建它的线程中使用，每次render返回一帧RGBA像素。
+    PRPD图坐标轴未变化时只重绘PRPD区域，PRPS图只重绘PRPS区域，只有设置或尺寸变化时完整重绘。
+    """
+
+    def __init__(self):
+        self.figure = Figure(dpi=100)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.axes_2d = self.figure.add_axes(PRPD_AXES_POSITION)
+        self.axes_3d = self.figure.add_axes(PRPS_AXES_POSITION, projection='3d')
+        self.axes_3d.set_box_aspect(PRPS_BOX_ASPECT)
+        # 瀑布图与3D坐标轴位置相同，两者只显示一个
+        self.axes_waterfall = self.figure.add_axes(PRPS_AXES_POSITION)
+        self.axes_waterfall.set_visible(False)
+        self.prpd_renderer = IncrementalPRPDRenderer(self.canvas, self.axes_2d)
+        self.prps_renderer = IncrementalPRPSRenderer(self.axes_3d)
+        self.waterfall_renderer = WaterfallPRPSRenderer(self.axes_waterfall)
+        self.prps_blitter = PRPSPanelBlitter(self.canvas, (self.axes_3d, self.axes_waterfall), self.axes_2d)
+        self.last_costs = {}  # 最近一帧各图的绘制耗时（毫秒），完整重绘的耗时计入PRPS图（没有时计入PRPD图）
+        self._drawn = False
+
+    def render(self, snapshot):
+        """绘制一帧
+
+        Args:
+            snapshot: FrameSnapshot
+
+        Returns:
+            np.ndarray: 高 × 宽 × 4的uint8 RGBA像素（拷贝）
+        """
+        width, height = snapshot.size
+        needs_full_draw = not self._drawn
+        if (self.figure.dpi, tuple(self.canvas.get_width_height())) != (snapshot.dpi, (width, height)):
+            self.figure.set_dpi(snapshot.dpi)
+            self.figure.set_size_inches(width / snapshot.dpi, height / snapshot.dpi)
+            needs_full_draw = True
+
+        costs = {}
+        start = time.perf_counter()
+        if "prpd" in snapshot.views:
+            prpd_data = snapshot.cycles[-snapshot.max_cycles:]
+            if snapshot.chart_type in INCREMENTAL_PRPD_TYPES:
+                needs_full_draw |= self._draw_prpd_incremental(snapshot, prpd_data)
+            else:
+                self._draw_prpd_lines(snapshot, prpd_data)
+                needs_full_draw = True
+            costs["prpd"] = (time.perf_counter() - start) * 1000
+        if "prps" in snapshot.views:
+            start = time.perf_counter()
+            self._draw_prps(snapshot)
+            costs["prps"] = (time.perf_counter() - start) * 1000
+
+        # 两个图分别blit各自的区域，blit的耗时计入各自的图
+        for view, blitter in (("prpd", self.prpd_renderer), ("prps", self.prps_blitter)):
+            if needs_full_draw or view not in costs:
+                continue
+            start = time.perf_counter()
+            needs_full_draw = not blitter.blit()
+            costs[view] += (time.perf_counter() - start) * 1000
+
+        if needs_full_draw:
+            start = time.perf_counter()
+            self.canvas.draw()
+            self._drawn = True
+            view = "prps" if "prps" in costs else "prpd"
+            if view in costs:
+                costs[view] += (time.perf_counter() - start) * 1000
+        self.last_costs = costs
+        return np.array(self.canvas.buffer_rgba())
+
+    def _draw_prpd_incremental(self, snapshot, prpd_data):
+        """散点图、颜色散点图和密度图只更新数据
+
+        Returns:
+            bool: 重新创建了图元或标题变化，需要完整重绘时返回True
+        """
+        chart_type = snapshot.chart_type
+        config = (chart_type, snapshot.use_dbm, snapshot.color_scheme, snapshot.sine_xy is not None,
+                  snapshot.axis_range)
+        if not self.prpd_renderer.is_ready(config):
+            cmap = snapshot.cmap if chart_type in ("颜色散点图", "密度图") else None
+            density_shape = snapshot.density[0].shape if chart_type == "密度图" else None
+            self.prpd_renderer.setup(config, snapshot.axis_range, snapshot.unit_label, cmap, snapshot.sine_xy,
+                                     density_shape)
+            recreated = True
+        else:
+            recreated = False
+
+        if chart_type == "密度图":
+            counts, window_cycles = snapshot.density
+            return self.prpd_renderer.update_density(
+                counts, f"PRPD图 ({window_cycles}/{snapshot.max_cycles}周期)") or recreated
+
+        # 按相位方向的像素列数抽稀，只转换保留的点
+        x_data, y_data = decimate_prpd(prpd_data, prpd_phase_columns(self.axes_2d), snapshot.lod_threshold,
+                                       snapshot.lod_method)
+        y_data = to_display_unit(y_data, snapshot.use_dbm)
+        colors = y_data if chart_type == "颜色散点图" else None
+        return self.prpd_renderer.update(
+            x_data, y_data, f"PRPD图 ({len(prpd_data)}/{snapshot.max_cycles}周期)", colors) or recreated
+
+    def _draw_prpd_lines(self, snapshot, prpd_data):
+        """线图按周期绘制多条线，每帧重建图元"""
+        self.prpd_renderer.invalidate()
+        ax = self.axes_2d
+        ax.clear()
+        display_data = to_display_unit(prpd_data, snapshot.use_dbm)
+        phases = shared_cache.phase_axis(prpd_data.shape[1])
+        for i, cycle_data in enumerate(display_data):
+            ax.plot(phases, cycle_data, linewidth=1.0, label=f"周期 {i+1}")
+        if len(display_data) <= 3:
+            ax.legend(loc='upper right')
+        if snapshot.sine_xy is not None:
+            ax.plot(snapshot.sine_xy[0], snapshot.sine_xy[1], 'r-', linewidth=1.5, alpha=0.7, label="参考正弦波")
+        ax.set_title(f"PRPD图 ({len(prpd_data)}/{snapshot.max_cycles}周期)", fontsize=12)
+        ax.set_xlabel("相位", fontsize=10, labelpad=10)
+        ax.set_ylabel(snapshot.unit_label, fontsize=10, labelpad=10)
+        ax.set_ylim(*snapshot.axis_range)
+        ax.grid(True, linestyle='--', alpha=0.7)
+
+    def _draw_prps(self, snapshot):
+        """PRPS图只为新周期计算表面条带或瀑布图的行"""
+        prps_data = snapshot.cycles[-snapshot.prps_max_cycles:]
+        waterfall = snapshot.prps_view in WATERFALL_PRPS_TYPES
+        self.axes_3d.set_visible(not waterfall)
+        self.axes_waterfall.set_visible(waterfall)
+        if waterfall:
+            config = (snapshot.prps_view, snapshot.use_dbm, snapshot.color_scheme, snapshot.prps_max_cycles,
+                      snapshot.axis_range)
+            if not self.waterfall_renderer.is_ready(config):
+                self.waterfall_renderer.setup(config, snapshot.prps_view, snapshot.prps_max_cycles,
+                                              snapshot.axis_range, snapshot.cmap,
+                                              mv_to_dbm if snapshot.use_dbm else None)
+            self.waterfall_renderer.update(prps_data, snapshot.appended, f"实时PRPS图 ({len(prps_data)}个周期)")
+            return
+
+        config = (snapshot.use_dbm, snapshot.color_scheme, snapshot.prps_max_cycles, snapshot.axis_range)
+        if not self.prps_renderer.is_ready(config):
+            self.prps_renderer.setup(config, snapshot.prps_max_cycles, snapshot.axis_range, snapshot.unit_label,
+                                     snapshot.cmap, mv_to_dbm if snapshot.use_dbm else None)
+        self.prps_renderer.update(prps_data, snapshot.appended, f"实时PRPS图 ({len(prps_data)}个周期)")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+绘图资源缓存模块：在实时图表、历史数据对话框和图像导出之间共享不随数据变化的绘图资源
+
+颜色映射按颜色方案、参考正弦波按当前单位下的振幅/偏移量、相位轴按每周期点数、
+相位×周期网格按点数和周期数缓存，每帧不再重新创建。返回的数组都是只读的，
+可以在界面线程和后台绘制线程之间共享。网格按最大周期数缓存，
+较少的周期数直接取前几行的视图。设置变化时由调用方用invalidate释放不再需要的资源。
+"""
+
+import threading
+
+import matplotlib.colors as mcolors
+import numpy as np
+
+COLORMAP_BINS = 100  # 颜色渐变的细腻程度
+SINE_POINTS = 1000  # 参考正弦波的点数
+MAX_ENTRIES = 16  # 每类资源最多缓存的条目数，超过时丢弃最早的条目
+RESOURCE_KINDS = ("colormap", "sine", "phase", "grid")
+
+
+def build_colormap(colors):
+    """根据颜色列表创建自定义颜色映射，颜色不足4种时末尾补红色"""
+    colors = list(colors)
+    if len(colors) < 4:
+        colors = colors + ['#FF0000']
+    cmap = mcolors.LinearSegmentedColormap.from_list(
+        'custom_colormap', [mcolors.to_rgba(color) for color in colors[:4]], N=COLORMAP_BINS)
+    # 预先生成查找表，之后多个线程同时使用时不需要再初始化
+    cmap(0.0)
+    return cmap
+
+
+def _readonly(*arrays):
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays if len(arrays) > 1 else arrays[0]
+
+
+class RenderResourceCache:
+    """绘图资源缓存，线程安全"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {kind: {} for kind in RESOURCE_KINDS}
+
+    def _get(self, kind, key, build):
+        """取出缓存的资源，不存在时创建"""
+        entries = self._entries[kind]
+        with self._lock:
+            value = entries.get(key)
+        if value is not None:
+            return value
+        value = build()
+        with self._lock:
+            if key not in entries and len(entries) >= self.max_entries:
+                del entries[next(iter(entries))]
+            entries[key] = value
+        return value
+
+    def colormap(self, colors):
+        """颜色方案对应的颜色映射
+
+        Args:
+            colors: 颜色列表
+        """
+        return self._get("colormap", tuple(colors), lambda: build_colormap(colors))
+
+    def sine_overlay(self, amplitude, offset):
+        """参考正弦波的(x, y)
+
+        Args:
+            amplitude: 振幅（显示单位）
+            offset: 偏移量（显示单位）
+        """
+        def build():
+            x = np.linspace(0, 360, SINE_POINTS)
+            return _readonly(x, amplitude * np.sin(x * 2 * np.pi / 360) + offset)
+        return self._get("sine", (float(amplitude), float(offset)), build)
+
+    def phase_axis(self, width):
+        """每周期width个点均匀分布在0到360度的相位"""
+        return self._get("phase", int(width), lambda: _readonly(np.linspace(0, 360, int(width))))
+
+    def _grid(self, width, count):
+        """按width缓存的(X, Y)网格，行数不少于count"""
+        width, count = int(width), max(1, int(count))
+        grid = self._get("grid", width, lambda: self._build_grid(width, count))
+        if len(grid[0]) < count:
+            grid = self._build_grid(width, count)
+            with self._lock:
+                self._entries["grid"][width] = grid
+        return grid
+
+    def _build_grid(self, width, count):
+        x, y = np.meshgrid(self.phase_axis(width), np.arange(1, count + 1))
+        return _readonly(x, y)
+
+    def meshgrid(self, width, count):
+        """PRPS三维图的相位×周期网格(X, Y)，周期从1开始
+
+        Returns:
+            tuple: 两个形状为(count, width)的只读数组
+        """
+        x, y = self._grid(width, count)
+        return x[:count], y[:count]
+
+    def phase_tile(self, width, count):
+        """count个周期依次排列的相位，与周期矩阵按行展开后的采样点一一对应"""
+        x, _ = self._grid(width, count)
+        return x[:count].ravel()
+
+    def invalidate(self, *kinds):
+        """丢弃指定类型（默认全部）的缓存资源
+
+        Args:
+            kinds: RESOURCE_KINDS中的类型名称
+        """
+        with self._lock:
+            for kind in kinds or RESOURCE_KINDS:
+                self._entries[kind].clear()
+
+
+# 所有绘图代码共享的缓存
+shared_cache = RenderResourceCache()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+汇总统计模块：写入周期数据的同时按1秒、1分钟、1小时分桶汇总
+
+每个桶保存周期数、脉冲数、每个相位分箱的最大幅值/平均幅值/采样点数，
+以及相位×幅值二维计数。长时间范围的趋势图只需读取少量汇总行，
+不必加载原始周期。幅值按毫伏统计，范围对应-50到0 dBm。
+"""
+
+import zlib
+
+import numpy as np
+
+from gis_pd_units import dbm_to_mv
+
+ROLLUP_RESOLUTIONS = (1, 60, 3600)  # 分桶时长（秒），从细到粗
+ROLLUP_PHASE_BINS = 72  # 相位方向每5度一格
+ROLLUP_AMPLITUDE_BINS = 50
+ROLLUP_AMPLITUDE_RANGE = (float(dbm_to_mv(-50)), float(dbm_to_mv(0)))
+PULSE_THRESHOLD = float(dbm_to_mv(-40))  # 采样值从阈值以下升到阈值以上记为一个脉冲
+MIN_TREND_BUCKETS = 500  # 选择分辨率时希望至少覆盖的桶数，约为图表的宽度
+
+ROLLUP_COLUMNS = ("resolution, start_us, cycle_count, pulse_count, "
+                  "max_amplitude, mean_amplitude, sample_count, histogram")
+
+_phase_index_cache = {}
+
+
+def _phase_index(width):
+    """每个采样点所在的相位分箱，按周期点数缓存"""
+    index = _phase_index_cache.get(width)
+    if index is None:
+        index = np.arange(width) * ROLLUP_PHASE_BINS // width
+        _phase_index_cache[width] = index
+    return index
+
+
+def summarize_cycle(values):
+    """计算一个周期的汇总量
+
+    Args:
+        values: 周期数据（毫伏）
+
+    Returns:
+        tuple: (每个相位分箱的最大值, 和, 采样点数, 脉冲数, 二维计数的一维数组)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    phase_index = _phase_index(len(values))
+
+    maxima = np.full(ROLLUP_PHASE_BINS, -np.inf)
+    np.maximum.at(maxima, phase_index, values)
+    sums = np.bincount(phase_index, weights=values, minlength=ROLLUP_PHASE_BINS)
+    samples = np.bincount(phase_index, minlength=ROLLUP_PHASE_BINS)
+
+    above = values > PULSE_THRESHOLD
+    pulses = int(np.count_nonzero(above[1:] & ~above[:-1])) + int(above[:1].sum())
+
+    low, high = ROLLUP_AMPLITUDE_RANGE
+    amplitude_index = np.floor((values - low) * (ROLLUP_AMPLITUDE_BINS / (high - low))).astype(np.int64)
+    amplitude_index[values == high] = ROLLUP_AMPLITUDE_BINS - 1
+    inside = (amplitude_index >= 0) & (amplitude_index < ROLLUP_AMPLITUDE_BINS)
+    histogram = np.bincount(amplitude_index[inside] * ROLLUP_PHASE_BINS + phase_index[inside],
+                            minlength=ROLLUP_AMPLITUDE_BINS * ROLLUP_PHASE_BINS)
+    return maxima, sums, samples, pulses, histogram
+
+
+class RollupBucket:
+    """一个时间桶的汇总量"""
+
+    def __init__(self, resolution, start_us):
+        self.resolution = resolution
+        self.start_us = start_us
+        self.cycle_count = 0
+        self.pulse_count = 0
+        self.maxima = np.full(ROLLUP_PHASE_BINS, -np.inf)
+        self.sums = np.zeros(ROLLUP_PHASE_BINS)
+        self.samples = np.zeros(ROLLUP_PHASE_BINS, dtype=np.int64)
+        self.histogram = np.zeros(ROLLUP_AMPLITUDE_BINS * ROLLUP_PHASE_BINS, dtype=np.int64)
+
+    def add(self, summary):
+        """加入一个周期的汇总量（summarize_cycle的结果）"""
+        maxima, sums, samples, pulses, histogram = summary
+        self.cycle_count += 1
+        self.pulse_count += pulses
+        np.maximum(self.maxima, maxima, out=self.maxima)
+        self.sums += sums
+        self.samples += samples
+        self.histogram += histogram
+
+    def merge(self, other):
+        """合并同一时间桶的另一部分汇总量"""
+        self.cycle_count += other.cycle_count
+        self.pulse_count += other.pulse_count
+        np.maximum(self.maxima, other.maxima, out=self.maxima)
+        self.sums += other.sums
+        self.samples += other.samples
+        self.histogram += other.histogram
+
+    def to_row(self):
+        """转换为rollups表的一行，没有采样点的相位分箱的最大值和平均值为NaN"""
+        has_samples = self.samples > 0
+        maxima = np.where(has_samples, self.maxima, np.nan).astype('<f4')
+        means = np.divide(self.sums, self.samples, out=np.full(ROLLUP_PHASE_BINS, np.nan),
+                          where=has_samples).astype('<f4')
+        return (self.resolution, self.start_us, self.cycle_count, self.pulse_count,
+                maxima.tobytes(), means.tobytes(), self.samples.astype('<u4').tobytes(),
+                zlib.compress(self.histogram.astype('<u4').tobytes(), 6))
+
+    @classmethod
+    def from_row(cls, row):
+        """从rollups表的一行还原"""
+        resolution, start_us, cycle_count, pulse_count, maxima, means, samples, histogram = row
+        bucket = cls(resolution, start_us)
+        bucket.cycle_count = cycle_count
+        bucket.pulse_count = pulse_count
+        bucket.samples = np.frombuffer(samples, dtype='<u4').astype(np.int64)
+        bucket.maxima = np.nan_to_num(np.frombuffer(maxima, dtype='<f4').astype(np.float64), nan=-np.inf)
+        bucket.sums = np.nan_to_num(np.frombuffer(means, dtype='<f4').astype(np.float64)) * bucket.samples
+        bucket.histogram = np.frombuffer(zlib.decompress(histogram), dtype='<u4').astype(np.int64)
+        return bucket
+
+
+class RollupAccumulator:
+    """在写入线程中按时间顺序累积各分辨率的当前时间桶
+
+    周期的时间戳进入下一个桶时，上一个桶作为完成的行返回。
+    """
+
+    def __init__(self, resolutions=ROLLUP_RESOLUTIONS):
+        self.resolutions = tuple(resolutions)
+        self._buckets = dict.fromkeys(self.resolutions)
+
+    def add(self, timestamp_us, values):
+        """加入一个周期
+
+        Args:
+            timestamp_us: 周期的微秒时间戳
+            values: 周期数据（毫伏）
+
+        Returns:
+            list: 因此完成的rollups表行
+        """
+        summary = summarize_cycle(values)
+        rows = []
+        for resolution in self.resolutions:
+            period_us = resolution * 1_000_000
+            start_us = timestamp_us - timestamp_us % period_us
+            bucket = self._buckets[resolution]
+            if bucket is not None and bucket.start_us != start_us:
+                rows.append(bucket.to_row())
+                bucket = None
+            if bucket is None:
+                bucket = self._buckets[resolution] = RollupBucket(resolution, start_us)
+            bucket.add(summary)
+        return rows
+
+    def take_all(self):
+        """取出所有未完成的桶，之后同一时间桶的数据会在写入时合并"""
+        rows = [bucket.to_row() for bucket in self._buckets.values() if bucket is not None]
+        self._buckets = dict.fromkeys(self.resolutions)
+        return rows
+
+
+def write_rollup(conn, row):
+    """写入一行汇总，数据库中已有同一时间桶时先合并（例如程序重启前写入的部分）"""
+    existing = conn.execute(f"SELECT {ROLLUP_COLUMNS} FROM rollups WHERE resolution = ? AND start_us = ?",
+                            row[:2]).fetchone()
+    if existing is not None:
+        bucket = RollupBucket.from_row(existing)
+        bucket.merge(RollupBucket.from_row(row))
+        row = bucket.to_row()
+    conn.execute(f"INSERT OR REPLACE INTO rollups ({ROLLUP_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+
+def choose_resolution(start_us, end_us, min_buckets=MIN_TREND_BUCKETS):
+    """选择仍能覆盖min_buckets个桶的最粗分辨率，时间范围太短时使用最细的分辨率"""
+    span_seconds = max(0, end_us - start_us) / 1_000_000
+    for resolution in sorted(ROLLUP_RESOLUTIONS, reverse=True):
+        if span_seconds / resolution >= min_buckets:
+            return resolution
+    return min(ROLLUP_RESOLUTIONS)
+
+
+def load_rollups(conn, resolution, start_us, end_us, with_histogram=False):
+    """读取时间范围内的汇总
+
+    Args:
+        conn: 只读连接
+        resolution: 分桶时长（秒）
+        start_us: 起始微秒时间戳
+        end_us: 结束微秒时间戳（包含）
+        with_histogram: 是否同时合计二维计数
+
+    Returns:
+        dict: start_us、cycle_count、pulse_count（一维数组），max_amplitude、mean_amplitude
+            （桶数×相位分箱数，毫伏），with_histogram时还有histogram（幅值分箱数×相位分箱数）
+    """
+    columns = "start_us, cycle_count, pulse_count, max_amplitude, mean_amplitude"
+    if with_histogram:
+        columns += ", histogram"
+    rows = conn.execute(
+        f"SELECT {columns} FROM rollups WHERE resolution = ? AND start_us BETWEEN ? AND ? ORDER BY start_us",
+        (resolution, start_us - start_us % (resolution * 1_000_000), end_us)
+    ).fetchall()
+
+    result = {
+        "start_us": np.array([row[0] for row in rows], dtype=np.int64),
+        "cycle_count": np.array([row[1] for row in rows], dtype=np.int64),
+        "pulse_count": np.array([row[2] for row in rows], dtype=np.int64),
+        "max_amplitude": np.frombuffer(b''.join(row[3] for row in rows), dtype='<f4').reshape(-1, ROLLUP_PHASE_BINS),
+        "mean_amplitude": np.frombuffer(b''.join(row[4] for row in rows), dtype='<f4').reshape(-1, ROLLUP_PHASE_BINS),
+    }
+    if with_histogram:
+        histogram = np.zeros(ROLLUP_AMPLITUDE_BINS * ROLLUP_PHASE_BINS, dtype=np.int64)
+        for row in rows:
+            histogram += np.frombuffer(zlib.decompress(row[5]), dtype='<u4')
+        result["histogram"] = histogram.reshape(ROLLUP_AMPLITUDE_BINS, ROLLUP_PHASE_BINS)
+    return result
+
+
+def concat_rollups(parts):
+    """合并从多个数据库文件读取的汇总（load_rollups的结果），按时间排序"""
+    if not parts:
+        return None
+    parts = [part for part in parts if len(part["start_us"])] or parts[:1]
+    if len(parts) == 1:
+        return parts[0]
+    order = np.argsort(np.concatenate([part["start_us"] for part in parts]), kind="stable")
+    result = {}
+    for key in parts[0]:
+        if key == "histogram":
+            result[key] = sum(part[key] for part in parts)
+        else:
+            result[key] = np.concatenate([part[key] for part in parts])[order]
+    return result
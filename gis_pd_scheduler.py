@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧调度模块：按实际绘制耗时调整PRPD和PRPS图的刷新间隔
+
+每个图分别记录绘制耗时（指数滑动平均），刷新间隔为耗时除以该图允许占用的时间比例，
+并限制在设置的最短和最长间隔之间。绘制较慢的PRPS三维图因此比PRPD图刷新得少，
+绘制耗时超过间隔时间隔随之变长，不会积压。没有新数据时不需要定时唤醒，
+窗口最小化或隐藏时暂停。时间均以毫秒为单位，由调用方传入。
+"""
+
+FRAME_VIEWS = ("prpd", "prps")
+DEFAULT_MIN_INTERVAL_MS = 100
+DEFAULT_MAX_INTERVAL_MS = 2000
+# 每个图的绘制最多占用的时间比例，PRPS图占用较少，绘制较慢时刷新得更少
+DEFAULT_LOAD_SHARE = {"prpd": 0.25, "prps": 0.15}
+COST_SMOOTHING = 0.3  # 绘制耗时滑动平均中新测量值的权重
+
+
+class FrameScheduler:
+    """PRPD和PRPS图的刷新调度
+
+    有新数据或设置变化时mark_dirty，定时器在next_delay毫秒后触发，
+    due_views给出已到刷新时间的图，绘制后用mark_drawn和record_cost记录。
+    """
+
+    def __init__(self, min_interval_ms=DEFAULT_MIN_INTERVAL_MS, max_interval_ms=DEFAULT_MAX_INTERVAL_MS,
+                 load_share=None):
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max(min_interval_ms, max_interval_ms)
+        self.load_share = dict(DEFAULT_LOAD_SHARE if load_share is None else load_share)
+        self.paused = False
+        self._cost = dict.fromkeys(FRAME_VIEWS)  # 绘制耗时的滑动平均，尚未测量时为None
+        self._dirty = dict.fromkeys(FRAME_VIEWS, False)
+        self._last_drawn = dict.fromkeys(FRAME_VIEWS, float("-inf"))
+
+    def set_bounds(self, min_interval_ms, max_interval_ms):
+        """设置刷新间隔的范围，最长间隔小于最短间隔时取最短间隔"""
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max(min_interval_ms, max_interval_ms)
+
+    @property
+    def dirty(self):
+        """是否有需要重绘的图"""
+        return any(self._dirty.values())
+
+    def mark_dirty(self, views=FRAME_VIEWS):
+        """标记需要重绘的图"""
+        for view in views:
+            self._dirty[view] = True
+
+    def clear(self, views=FRAME_VIEWS):
+        """取消重绘标记"""
+        for view in views:
+            self._dirty[view] = False
+
+    def record_cost(self, view, cost_ms):
+        """记录一次绘制的耗时"""
+        previous = self._cost[view]
+        self._cost[view] = cost_ms if previous is None else previous + COST_SMOOTHING * (cost_ms - previous)
+
+    def cost(self, view):
+        """绘制耗时的滑动平均，尚未测量时为None"""
+        return self._cost[view]
+
+    def interval(self, view):
+        """图的当前刷新间隔"""
+        cost = self._cost[view]
+        interval = self.min_interval_ms if cost is None else cost / self.load_share[view]
+        return min(max(interval, self.min_interval_ms), self.max_interval_ms)
+
+    def due_views(self, now_ms):
+        """需要重绘且已到刷新时间的图，暂停时为空"""
+        if self.paused:
+            return ()
+        return tuple(view for view in FRAME_VIEWS
+                     if self._dirty[view] and now_ms - self._last_drawn[view] >= self.interval(view))
+
+    def mark_drawn(self, views, now_ms):
+        """记录图已重绘"""
+        for view in views:
+            self._dirty[view] = False
+            self._last_drawn[view] = now_ms
+
+    def next_delay(self, now_ms):
+        """距离下一个需要重绘的图到刷新时间的毫秒数；暂停或没有需要重绘的图时为None"""
+        if self.paused:
+            return None
+        delays = [self._last_drawn[view] + self.interval(view) - now_ms for view in FRAME_VIEWS if self._dirty[view]]
+        if not delays:
+            return None
+        return max(0.0, min(delays))
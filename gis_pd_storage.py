@@ -0,0 +1,921 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据存储模块：在独立线程中批量写入SQLite
+
+GUI线程只负责把待写入的行放入有界队列，写入线程按行数或时间
+把多行合并到一个事务中用executemany写入，避免每行一次commit/fsync。
+WAL模式下查询使用独立的只读连接，长时间的查询不会阻塞写入。
+启用块存储时，连续的周期被打包压缩为cycle_blocks表中的一行。
+启用分区存储时，数据按时间戳写入每天或每小时一个的数据库文件，
+超过保留期限的分区文件被压缩或删除。
+写入周期数据的同时维护1秒、1分钟、1小时的汇总统计。
+原始负载以字节保存；只保存原始负载时，读取周期数据时再解码。
+"""
+
+import datetime
+import os
+import pathlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from gis_pd_codec import decode_cycle, decode_cycle_block, encode_cycle_block
+from gis_pd_decoder import decode_payload
+from gis_pd_rollups import ROLLUP_RESOLUTIONS, RollupAccumulator, write_rollup
+
+# WAL模式下的连接参数
+WAL_SYNCHRONOUS = "NORMAL"  # WAL模式下NORMAL已能保证数据库一致，只在检查点时fsync
+CACHE_SIZE_KB = 16 * 1024  # 每个连接的页缓存大小
+MMAP_SIZE = 256 * 1024 * 1024  # 内存映射读取的最大字节数
+
+# 各数据表的插入语句
+INSERT_STATEMENTS = {
+    "cycle_data": "INSERT INTO cycle_data (timestamp, ts_us, cycle_number, data) VALUES (?, ?, ?, ?)",
+    "raw_data": ("INSERT INTO raw_data (timestamp, ts_us, broker, topic, raw_data, cycle_number) "
+                 "VALUES (?, ?, ?, ?, ?, ?)"),
+    "cycle_blocks": ("INSERT INTO cycle_blocks (start_time, start_us, end_time, end_us, first_cycle, "
+                     "cycle_count, min_value, max_value, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"),
+}
+# cycle_blocks行中周期数（cycle_count）的位置
+BLOCK_COUNT_COLUMN = 5
+
+# 存储策略：每条消息保存原始负载（读取时解码）、解码后的周期，或两者都保存
+STORAGE_POLICIES = ("raw", "decoded", "both")
+
+# 计数名称 -> (数据表, 统计表达式)，cycle_blocks统计的是块中的周期数，
+# raw_cycles统计只保存了原始负载（带周期编号）的周期
+COUNTED_TABLES = {
+    "cycle_data": ("cycle_data", "COUNT(*)"),
+    "raw_data": ("raw_data", "COUNT(*)"),
+    "cycle_blocks": ("cycle_blocks", "COALESCE(SUM(cycle_count), 0)"),
+    "raw_cycles": ("raw_data", "COUNT(cycle_number)"),
+}
+# 写入线程在插入的同一事务中更新计数
+COUNT_UPDATE = ("UPDATE table_counts SET row_count = row_count + ?, "
+                "last_id = (SELECT MAX(id) FROM {table}) WHERE name = ?")
+
+# 数据库中时间戳文本的格式
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+# 由时间戳文本列计算微秒整数的SQL表达式，与timestamp_to_us的结果一致
+TIMESTAMP_US_SQL = ("CAST(strftime('%s', {column}) AS INTEGER) * 1000000 "
+                    "+ CAST(substr({column}, 21, 6) AS INTEGER)")
+
+
+def datetime_to_us(moment):
+    """datetime转换为微秒整数（按UTC解释，与SQLite的strftime一致）"""
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+def timestamp_to_us(timestamp):
+    """时间戳文本转换为微秒整数，也接受不带微秒的"年-月-日 时:分:秒"文本"""
+    timestamp_format = TIMESTAMP_FORMAT if '.' in timestamp else TIMESTAMP_FORMAT[:-3]
+    return datetime_to_us(datetime.datetime.strptime(timestamp, timestamp_format))
+
+
+def us_to_timestamp(us):
+    """微秒整数转换为时间戳文本"""
+    return (_EPOCH + datetime.timedelta(microseconds=int(us))).strftime(TIMESTAMP_FORMAT)
+
+
+def now_timestamp():
+    """当前时刻的时间戳文本和微秒整数
+
+    Returns:
+        tuple: (时间戳文本, 微秒整数)
+    """
+    now = datetime.datetime.now()
+    return now.strftime(TIMESTAMP_FORMAT), datetime_to_us(now)
+
+
+def ensure_time_column(conn, table, text_column, us_column):
+    """为只有时间戳文本的旧表增加微秒整数列并按文本回填，然后建立索引
+
+    新建的表已包含该列，只会建立索引；可以重复调用。
+
+    Args:
+        conn: 可写连接，调用方负责提交
+        table: 数据表名
+        text_column: 时间戳文本列
+        us_column: 微秒整数列
+
+    Returns:
+        int: 回填的行数
+    """
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if us_column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {us_column} INTEGER")
+    cursor = conn.execute(
+        f"UPDATE {table} SET {us_column} = {TIMESTAMP_US_SQL.format(column=text_column)} "
+        f"WHERE {us_column} IS NULL"
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{us_column} ON {table} ({us_column})")
+    return max(cursor.rowcount, 0)
+
+
+def create_schema(conn):
+    """创建数据表和索引，旧数据库在这里加列并回填微秒时间戳
+
+    Args:
+        conn: 可写连接，调用方负责提交
+
+    Returns:
+        dict: 各表的计数（见load_table_counts）
+    """
+    # 周期数据表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cycle_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            cycle_number INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            ts_us INTEGER
+        )
+    ''')
+
+    # 周期块表：每行保存连续多个周期的压缩数据，以及时间和幅值范围
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cycle_blocks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            first_cycle INTEGER NOT NULL,
+            cycle_count INTEGER NOT NULL,
+            min_value REAL NOT NULL,
+            max_value REAL NOT NULL,
+            data BLOB NOT NULL,
+            start_us INTEGER,
+            end_us INTEGER
+        )
+    ''')
+
+    # 汇总统计表：每个分辨率的每个时间桶一行
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollups (
+            resolution INTEGER NOT NULL,
+            start_us INTEGER NOT NULL,
+            cycle_count INTEGER NOT NULL,
+            pulse_count INTEGER NOT NULL,
+            max_amplitude BLOB NOT NULL,
+            mean_amplitude BLOB NOT NULL,
+            sample_count BLOB NOT NULL,
+            histogram BLOB NOT NULL,
+            PRIMARY KEY (resolution, start_us)
+        ) WITHOUT ROWID
+    ''')
+
+    # 原始数据表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS raw_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            broker TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            raw_data BLOB NOT NULL,
+            ts_us INTEGER,
+            cycle_number INTEGER
+        )
+    ''')
+
+    # 微秒整数时间戳及其索引，按时间范围和最新N条的查询只需读取索引
+    ensure_time_column(conn, "cycle_data", "timestamp", "ts_us")
+    ensure_time_column(conn, "raw_data", "timestamp", "ts_us")
+    ensure_time_column(conn, "cycle_blocks", "start_time", "start_us")
+    ensure_time_column(conn, "cycle_blocks", "end_time", "end_us")
+    conn.execute("DROP INDEX IF EXISTS idx_cycle_blocks_time")
+
+    # 只保存原始负载的消息带有周期编号，读取周期数据时解码；同时保存了解码周期的为NULL
+    if "cycle_number" not in [row[1] for row in conn.execute("PRAGMA table_info(raw_data)")]:
+        conn.execute("ALTER TABLE raw_data ADD COLUMN cycle_number INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_raw_data_cycles ON raw_data (ts_us) "
+                 "WHERE cycle_number IS NOT NULL")
+
+    # 各表计数保存在table_counts表中，之后由写入线程随插入更新
+    return load_table_counts(conn)
+
+
+def read_table_counts(db_path):
+    """以只读方式读取数据库文件中保存的各表计数，用于已不再写入的分区
+
+    Args:
+        db_path: 数据库文件路径
+
+    Returns:
+        dict: 计数名称到计数的映射
+    """
+    conn = open_read_connection(db_path)
+    try:
+        try:
+            counts = dict(conn.execute("SELECT name, row_count FROM table_counts"))
+        except sqlite3.OperationalError:
+            counts = {}
+        for name, (table, expression) in COUNTED_TABLES.items():
+            if name not in counts:
+                counts[name] = conn.execute(f"SELECT {expression} FROM {table}").fetchone()[0]
+        return counts
+    finally:
+        conn.close()
+
+
+def load_table_counts(conn):
+    """读取table_counts表中保存的计数，并补上此后由其他程序写入的行
+
+    table_counts表记录每个表的计数和计入时的最大id，启动时只需统计
+    id更大的行（通常没有），不必扫描整个表。
+
+    Args:
+        conn: 可写连接，调用方负责提交
+
+    Returns:
+        dict: 计数名称到计数的映射
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_counts (
+            name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL,
+            last_id INTEGER NOT NULL
+        )
+    ''')
+    counts = {}
+    for name, (table, expression) in COUNTED_TABLES.items():
+        stored = conn.execute("SELECT row_count, last_id FROM table_counts WHERE name = ?", (name,)).fetchone()
+        row_count, last_id = stored if stored is not None else (0, 0)
+        new_count, max_id = conn.execute(
+            f"SELECT {expression}, MAX(id) FROM {table} WHERE id > ?", (last_id,)).fetchone()
+        counts[name] = row_count + new_count
+        conn.execute("INSERT OR REPLACE INTO table_counts (name, row_count, last_id) VALUES (?, ?, ?)",
+                     (name, counts[name], max_id if max_id is not None else last_id))
+    return counts
+
+
+def configure_connection(conn, wal=True):
+    """为连接设置日志模式和性能参数
+
+    Args:
+        conn: sqlite3连接
+        wal: 为True时启用WAL模式和synchronous=NORMAL
+    """
+    if wal:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={WAL_SYNCHRONOUS}")
+    # 负数表示以KB为单位
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+
+
+def open_read_connection(db_path):
+    """打开只读连接，用于历史查询、导出和状态统计
+
+    Args:
+        db_path: 数据库文件路径
+
+    Returns:
+        sqlite3.Connection: 只读连接，可以在创建它的线程以外关闭
+    """
+    uri = pathlib.Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    configure_connection(conn, wal=False)
+    return conn
+
+
+class CycleBlockBuilder:
+    """把连续的周期累积为压缩块
+
+    每个块最多包含block_cycles个周期，且块内所有周期的点数相同。
+    """
+
+    def __init__(self, block_cycles=50, compression="zlib"):
+        """初始化
+
+        Args:
+            block_cycles: 每个块的周期数
+            compression: 块的压缩方式，"zlib"或"lzma"
+        """
+        self.block_cycles = max(1, int(block_cycles))
+        self.compression = compression
+        self.started_at = None  # 第一个未成块周期的加入时间（time.monotonic）
+        self.split_key = None  # 按微秒时间戳计算分区的函数，分区变化时结束当前块
+        self._timestamps = []
+        self._cycle_numbers = []
+        self._cycles = []
+
+    @property
+    def pending(self):
+        """尚未成块的周期数"""
+        return len(self._cycles)
+
+    def append(self, row):
+        """加入一个cycle_data行
+
+        Args:
+            row: (时间戳文本, 微秒时间戳, 周期编号, 周期数据)
+
+        Returns:
+            list: 因此完成的块，每项为cycle_blocks表的一行
+        """
+        timestamp, timestamp_us, cycle_number, data = row
+        values = decode_cycle(data)
+        blocks = []
+        if self._cycles and (len(values) != len(self._cycles[0]) or (
+                self.split_key is not None and self.split_key(timestamp_us) != self.split_key(self._timestamps[0][1]))):
+            # 点数或分区变化时先结束当前块
+            blocks.append(self.take())
+        if not self._cycles:
+            self.started_at = time.monotonic()
+        self._timestamps.append((timestamp, timestamp_us))
+        self._cycle_numbers.append(cycle_number)
+        self._cycles.append(values)
+        if len(self._cycles) >= self.block_cycles:
+            blocks.append(self.take())
+        return blocks
+
+    def take(self):
+        """把已累积的周期编码为一个块（可能不足block_cycles个）
+
+        Returns:
+            tuple: cycle_blocks表的一行，没有累积的周期时返回None
+        """
+        if not self._cycles:
+            return None
+        cycles = np.vstack(self._cycles)
+        timestamps_us = [timestamp_us for _, timestamp_us in self._timestamps]
+        blob = encode_cycle_block(timestamps_us, self._cycle_numbers, cycles, self.compression)
+        row = self._timestamps[0] + self._timestamps[-1] + (
+            self._cycle_numbers[0], len(cycles), float(cycles.min()), float(cycles.max()), blob)
+        self._timestamps = []
+        self._cycle_numbers = []
+        self._cycles = []
+        self.started_at = None
+        return row
+
+
+# 分区的时间跨度（微秒）和文件名中的时间格式
+PARTITION_PERIODS = {
+    "day": 24 * 3600 * 1_000_000,
+    "hour": 3600 * 1_000_000,
+}
+PARTITION_NAME_FORMATS = {
+    "day": "%Y%m%d",
+    "hour": "%Y%m%d_%H",
+}
+# 超过保留期限的分区的处理方式
+RETENTION_ACTIONS = ("delete", "compress")
+DAY_US = PARTITION_PERIODS["day"]
+
+
+class PartitionLayout:
+    """按时间分区的数据库文件布局
+
+    目录下每个分区一个SQLite文件，文件名为"前缀_年月日.db"（按天）
+    或"前缀_年月日_时.db"（按小时）。两种文件名都会被识别，
+    切换分区方式后之前的分区仍可查询。
+    """
+
+    def __init__(self, directory, prefix="gis_pd_data", period="day"):
+        """初始化
+
+        Args:
+            directory: 分区文件所在目录
+            prefix: 分区文件名前缀
+            period: 写入新数据时的分区方式，"day"或"hour"
+        """
+        if period not in PARTITION_PERIODS:
+            raise ValueError(f"不支持的分区方式: {period}")
+        self.directory = directory
+        self.prefix = prefix
+        self.period = period
+        self.period_us = PARTITION_PERIODS[period]
+        self._pattern = re.compile(rf"^{re.escape(prefix)}_(\d{{8}})(_\d{{2}})?\.db$")
+
+    def partition_start(self, timestamp_us):
+        """时间戳所在分区的起始时间（微秒）"""
+        return timestamp_us - timestamp_us % self.period_us
+
+    def path_for(self, timestamp_us):
+        """时间戳所在分区的文件路径"""
+        start = _EPOCH + datetime.timedelta(microseconds=self.partition_start(timestamp_us))
+        name = start.strftime(PARTITION_NAME_FORMATS[self.period])
+        return os.path.join(self.directory, f"{self.prefix}_{name}.db")
+
+    def list_partitions(self):
+        """列出目录中已有的分区
+
+        Returns:
+            list: (起始微秒, 结束微秒, 文件路径)列表，按起始时间排序；结束时间不包含在分区内
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        partitions = []
+        for name in names:
+            match = self._pattern.match(name)
+            if match is None:
+                continue
+            period = "hour" if match.group(2) else "day"
+            start = datetime.datetime.strptime(match.group(1) + (match.group(2) or ""),
+                                               PARTITION_NAME_FORMATS[period])
+            start_us = datetime_to_us(start)
+            partitions.append((start_us, start_us + PARTITION_PERIODS[period],
+                               os.path.join(self.directory, name)))
+        partitions.sort()
+        return partitions
+
+    def overlapping(self, start_us=None, end_us=None):
+        """与时间范围[start_us, end_us]有交集的分区，为None时不限制"""
+        return [partition for partition in self.list_partitions()
+                if (start_us is None or partition[1] > start_us) and (end_us is None or partition[0] <= end_us)]
+
+
+def open_partition(db_path, wal=True):
+    """打开（必要时创建）分区文件的写入连接并创建数据表
+
+    Returns:
+        sqlite3.Connection: 写入连接
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    create_schema(conn)
+    conn.commit()
+    configure_connection(conn, wal)
+    return conn
+
+
+def compress_partition(db_path, block_cycles=50, compression="lzma", batch_rows=1000):
+    """把分区中按行存储的周期数据打包为周期块，然后整理数据库文件
+
+    已经压缩过的分区没有按行存储的周期，不会被改动。
+
+    Args:
+        db_path: 分区文件路径
+        block_cycles: 每块的周期数
+        compression: 块的压缩方式
+        batch_rows: 每次读取的行数
+
+    Returns:
+        int: 打包的周期数
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        create_schema(conn)
+        builder = CycleBlockBuilder(block_cycles, compression)
+        moved = 0
+        last_key = (-1, -1)
+        with conn:
+            while True:
+                rows = conn.execute(
+                    "SELECT timestamp, ts_us, cycle_number, data, id FROM cycle_data "
+                    "WHERE (ts_us, id) > (?, ?) ORDER BY ts_us, id LIMIT ?",
+                    last_key + (batch_rows,)).fetchall()
+                if not rows:
+                    break
+                last_key = (rows[-1][1], rows[-1][4])
+                blocks = []
+                for row in rows:
+                    blocks.extend(builder.append(row[:4]))
+                conn.executemany(INSERT_STATEMENTS["cycle_blocks"], blocks)
+                moved += len(rows)
+            if builder.pending:
+                conn.execute(INSERT_STATEMENTS["cycle_blocks"], builder.take())
+            if moved:
+                conn.execute("DELETE FROM cycle_data")
+                conn.execute("UPDATE table_counts SET row_count = 0 WHERE name = 'cycle_data'")
+                conn.execute(COUNT_UPDATE.format(table="cycle_blocks"), (moved, "cycle_blocks"))
+        if moved:
+            conn.execute("VACUUM")
+        return moved
+    finally:
+        conn.close()
+
+
+def remove_database_file(db_path):
+    """删除数据库文件及其WAL和共享内存文件
+
+    Raises:
+        OSError: 文件仍被占用等原因无法删除
+    """
+    os.remove(db_path)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+
+def apply_retention(layout, retention_days, action="delete", now_us=None):
+    """压缩或删除整个时间范围都早于保留期限的分区
+
+    Args:
+        layout: PartitionLayout
+        retention_days: 保留天数，小于等于0时不处理
+        action: "delete"删除分区文件，"compress"把分区打包为周期块
+        now_us: 当前时间（微秒），为None时取当前时刻
+
+    Returns:
+        dict: 各表计数的变化量
+    """
+    if action not in RETENTION_ACTIONS:
+        raise ValueError(f"不支持的分区处理方式: {action}")
+    deltas = dict.fromkeys(COUNTED_TABLES, 0)
+    if retention_days <= 0:
+        return deltas
+    if now_us is None:
+        now_us = now_timestamp()[1]
+    cutoff = now_us - int(retention_days * DAY_US)
+    for _, end_us, path in layout.list_partitions():
+        if end_us > cutoff:
+            continue
+        try:
+            if action == "delete":
+                counts = read_table_counts(path)
+                remove_database_file(path)
+                for table in deltas:
+                    deltas[table] -= counts[table]
+                print(f"已删除过期分区: {path}")
+            else:
+                moved = compress_partition(path)
+                if moved:
+                    deltas["cycle_data"] -= moved
+                    deltas["cycle_blocks"] += moved
+                    print(f"已压缩过期分区: {path} ({moved}个周期)")
+        except (OSError, sqlite3.Error) as e:
+            # 文件被占用时下次再处理
+            print(f"处理过期分区错误: {path}, {str(e)}")
+    return deltas
+
+
+def expand_cycle_block(block_id, blob, start_us=None, end_us=None):
+    """把一个块展开为与cycle_data表相同格式的行
+
+    Args:
+        block_id: 块在cycle_blocks表中的id
+        blob: 块数据
+        start_us: 只保留不早于此微秒时间戳的周期，为None时不限制
+        end_us: 只保留不晚于此微秒时间戳的周期，为None时不限制
+
+    Returns:
+        list: (id, 时间戳, 周期编号, 周期数据数组)列表，id形如"块12-3"
+    """
+    timestamps_us, cycle_numbers, cycles = decode_cycle_block(blob)
+    rows = []
+    for i, timestamp_us in enumerate(timestamps_us):
+        if (start_us is not None and timestamp_us < start_us) or (end_us is not None and timestamp_us > end_us):
+            continue
+        rows.append((f"块{block_id}-{i + 1}", us_to_timestamp(timestamp_us), int(cycle_numbers[i]), cycles[i]))
+    return rows
+
+
+def raw_payload_bytes(raw_data):
+    """raw_data表中的负载转换为bytes，旧版本以十六进制文本保存"""
+    if isinstance(raw_data, str):
+        return bytes.fromhex(raw_data)
+    return bytes(raw_data)
+
+
+def expand_raw_cycles(rows):
+    """把只保存了原始负载的消息解码为与cycle_data表相同格式的行
+
+    Args:
+        rows: (id, 时间戳, 周期编号, 原始负载)列表
+
+    Returns:
+        list: (id, 时间戳, 周期编号, 周期数据数组)列表，id形如"原始12"
+    """
+    return [(f"原始{raw_id}", timestamp, cycle_number, decode_payload(raw_payload_bytes(payload)))
+            for raw_id, timestamp, cycle_number, payload in rows]
+
+
+# 通知写入线程退出的标记
+_STOP = object()
+# 通知写入线程立即提交当前批次的标记
+_FLUSH = object()
+
+
+class DatabaseWriter(threading.Thread):
+    """SQLite批量写入线程
+
+    写入线程使用自己的数据库连接。队列满时新的行会被丢弃并计数，
+    不会阻塞GUI线程；关闭时先写完队列中剩余的行再退出。
+    启用分区存储时每行按其微秒时间戳写入对应的分区文件，
+    开始写入新分区时在后台线程中处理超过保留期限的分区。
+    最细的汇总统计随数据写入分区，较粗的汇总总是写入主数据库，分区被删除后长期趋势仍然保留。
+    """
+
+    # 同时保持打开的分区写入连接数（当前分区和刚结束的分区）
+    MAX_PARTITION_CONNECTIONS = 2
+
+    def __init__(self, db_path, maxsize=10000, batch_size=500, flush_interval=1.0, wal=True,
+                 block_cycles=0, block_interval=10.0, block_compression="zlib", row_counts=None,
+                 partitions=None, retention_days=0, retention_action="delete", rollups=True):
+        """初始化写入线程
+
+        Args:
+            db_path: 数据库文件路径
+            maxsize: 待写入队列的最大行数
+            batch_size: 每个事务最多写入的行数
+            flush_interval: 有待写入的行时，最长等待多少秒提交一次
+            wal: 是否以WAL模式写入
+            block_cycles: 大于0时周期数据以压缩块写入cycle_blocks表，每块包含的周期数
+            block_interval: 未满的块最长等待多少秒写入
+            block_compression: 块的压缩方式，"zlib"或"lzma"
+            row_counts: 各表已有的计数（load_table_counts的结果），之后随写入累加
+            partitions: PartitionLayout，为None时全部写入db_path
+            retention_days: 分区保留天数，小于等于0时不处理过期分区
+            retention_action: 过期分区的处理方式，"delete"或"compress"
+            rollups: 是否维护汇总统计
+        """
+        super().__init__(name="DatabaseWriter", daemon=True)
+        self.db_path = db_path
+        self.wal = wal
+        self.block_cycles = block_cycles
+        self.block_interval = block_interval
+        self._blocks = CycleBlockBuilder(max(1, block_cycles), block_compression)
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=maxsize)
+
+        self.submitted_count = 0  # 已进入队列的行数
+        self.written_count = 0  # 已提交到数据库的行数
+        self.dropped_count = 0  # 队列满时丢弃的行数
+        self.error_count = 0  # 写入失败的行数
+        self.row_counts = dict.fromkeys(COUNTED_TABLES, 0)  # 数据库中各表的计数，与table_counts表一致
+        self.row_counts.update(row_counts or {})
+        self.last_commit_time = None
+
+        self.partitions = None
+        self.retention_days = retention_days
+        self.retention_action = retention_action
+        self._partition_connections = {}  # 分区文件路径 -> 写入连接，只在写入线程中使用
+        self._rollups = RollupAccumulator() if rollups else None
+        self._retention_thread = None
+        self.set_partitioning(partitions)
+
+        self._condition = threading.Condition()
+        self._closed = False
+
+    @property
+    def pending(self):
+        """已提交但尚未写入数据库的行数，即持久化落后于接收的程度"""
+        return self.submitted_count - self.written_count - self.error_count
+
+    def submit(self, table, row):
+        """提交一行待写入的数据
+
+        Args:
+            table: 数据表名，必须是INSERT_STATEMENTS中的表
+            row: 与插入语句参数对应的元组
+
+        Returns:
+            bool: 成功放入队列返回True，队列已满或已关闭返回False
+        """
+        if table not in INSERT_STATEMENTS:
+            raise ValueError(f"未知的数据表: {table}")
+        if self._closed:
+            return False
+        # 持有锁直到计数更新，写入线程不会在计数之前把这一行记为已写入
+        with self._condition:
+            # 存储方式在提交时确定，之后切换不影响已提交的行
+            to_block = table == "cycle_data" and bool(self.block_cycles)
+            try:
+                self.queue.put_nowait((table, row, to_block))
+            except queue.Full:
+                self.dropped_count += 1
+                return False
+            self.submitted_count += 1
+        return True
+
+    def set_block_storage(self, block_cycles):
+        """切换之后提交的周期数据的存储方式，已累积但未成块的周期仍会按时写入
+
+        Args:
+            block_cycles: 每块的周期数，为0时按行写入cycle_data表
+        """
+        if block_cycles:
+            self._blocks.block_cycles = int(block_cycles)
+        self.block_cycles = block_cycles
+
+    def set_partitioning(self, partitions):
+        """切换之后写入的数据是否按时间分区
+
+        Args:
+            partitions: PartitionLayout，为None时全部写入db_path
+        """
+        self.partitions = partitions
+        self._blocks.split_key = partitions.partition_start if partitions is not None else None
+
+    def set_retention(self, retention_days, action="delete"):
+        """设置分区保留期限，并立即在后台处理一次过期分区
+
+        Args:
+            retention_days: 保留天数，小于等于0时不处理
+            action: "delete"或"compress"
+        """
+        if action not in RETENTION_ACTIONS:
+            raise ValueError(f"不支持的分区处理方式: {action}")
+        self.retention_days = retention_days
+        self.retention_action = action
+        self.start_retention()
+
+    def start_retention(self):
+        """在后台线程中处理过期分区，已在处理时不重复启动
+
+        Returns:
+            threading.Thread: 处理线程，不需要处理时返回None
+        """
+        if self.partitions is None or self.retention_days <= 0:
+            return None
+        if self._retention_thread is not None and self._retention_thread.is_alive():
+            return self._retention_thread
+        self._retention_thread = threading.Thread(target=self._run_retention, name="PartitionRetention",
+                                                  daemon=True)
+        self._retention_thread.start()
+        return self._retention_thread
+
+    def _run_retention(self):
+        """处理过期分区并更新计数"""
+        partitions = self.partitions
+        if partitions is None:
+            return
+        deltas = apply_retention(partitions, self.retention_days, self.retention_action)
+        with self._condition:
+            for table, delta in deltas.items():
+                self.row_counts[table] += delta
+
+    def flush(self, timeout=None):
+        """等待当前已提交的行全部写入数据库（包括未满的块）
+
+        Args:
+            timeout: 最长等待秒数，为None时一直等待
+
+        Returns:
+            bool: 全部写入返回True，超时返回False
+        """
+        if self.is_alive() and not self._closed:
+            try:
+                self.queue.put_nowait(_FLUSH)
+            except queue.Full:
+                pass  # 队列已满时批次很快会因行数达到上限而提交
+        with self._condition:
+            target = self.submitted_count
+            return self._condition.wait_for(
+                lambda: self.written_count + self.error_count >= target or not self.is_alive(),
+                timeout)
+
+    def close(self, timeout=None):
+        """写完剩余的行后停止线程
+
+        Args:
+            timeout: 等待线程退出的最长秒数
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self.is_alive():
+            # 使用阻塞put，保证退出标记排在所有已提交的行之后
+            self.queue.put(_STOP)
+            self.join(timeout)
+
+    def run(self):
+        """写入线程主循环"""
+        conn = sqlite3.connect(self.db_path)
+        configure_connection(conn, self.wal)
+        batch = []
+        deadline = None
+        self.start_retention()
+        try:
+            while True:
+                # 等待到批次提交时间或未满块的写入时间
+                wake_times = [deadline] if deadline is not None else []
+                if self._blocks.pending:
+                    wake_times.append(self._blocks.started_at + self.block_interval)
+                timeout = max(0.0, min(wake_times) - time.monotonic()) if wake_times else None
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+                force_block = item is _FLUSH
+                if item is not None and not force_block:
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+
+                now = time.monotonic()
+                if self._blocks.pending and now - self._blocks.started_at >= self.block_interval:
+                    force_block = True
+
+                # 达到批量行数或等待时间后提交一个事务；flush时立即提交
+                if force_block or (batch and (len(batch) >= self.batch_size or now >= deadline)):
+                    self._write_batch(conn, batch, force_block)
+                    batch = []
+                    deadline = None
+        finally:
+            self._write_batch(conn, batch, True)
+            conn.close()
+            for partition_conn in self._partition_connections.values():
+                partition_conn.close()
+            self._partition_connections = {}
+            with self._condition:
+                self._condition.notify_all()
+
+    def _write_batch(self, conn, batch, force_block=False):
+        """在一个事务中写入一批行
+
+        Args:
+            conn: 写入连接
+            batch: (表名, 行, 是否写入周期块)列表
+            force_block: 是否把未满的块也写入
+        """
+        partitions = self.partitions
+        groups = {}  # 数据库文件路径 -> (表名 -> 行列表, 计数名称 -> 增加的计数)
+
+        def add(table, row, count):
+            # 各表的行在第2列都是微秒时间戳，块按起始时间归入分区
+            path = self.db_path if partitions is None else partitions.path_for(row[1])
+            rows_by_table, counts = groups.setdefault(path, ({}, {}))
+            rows_by_table.setdefault(table, []).append(row)
+            counts[table] = counts.get(table, 0) + count  # 块按其中的周期数计
+            if table == "raw_data" and row[5] is not None:
+                counts["raw_cycles"] = counts.get("raw_cycles", 0) + 1
+
+        def add_rollups(rollup_rows):
+            # 汇总统计不计入行数
+            for row in rollup_rows:
+                resolution, start_us = row[:2]
+                if partitions is None or resolution > ROLLUP_RESOLUTIONS[0]:
+                    path = self.db_path
+                else:
+                    path = partitions.path_for(start_us)
+                rows_by_table, _ = groups.setdefault(path, ({}, {}))
+                rows_by_table.setdefault("rollups", []).append(row)
+
+        for table, row, to_block in batch:
+            if table == "cycle_data" and self._rollups is not None:
+                add_rollups(self._rollups.add(row[1], decode_cycle(row[3])))
+            elif table == "raw_data" and row[5] is not None and self._rollups is not None:
+                # 只保存原始负载的消息，汇总统计在写入时解码
+                add_rollups(self._rollups.add(row[1], decode_payload(raw_payload_bytes(row[4]))))
+            if to_block:
+                for block in self._blocks.append(row):
+                    add("cycle_blocks", block, block[BLOCK_COUNT_COLUMN])
+            else:
+                add(table, row, 1)
+        if force_block and self._blocks.pending:
+            block = self._blocks.take()
+            add("cycle_blocks", block, block[BLOCK_COUNT_COLUMN])
+        if force_block and self._rollups is not None:
+            # 未完成的时间桶先写入，之后的数据写入时与之合并
+            add_rollups(self._rollups.take_all())
+
+        # 每个数据库文件一个事务
+        for path, (rows_by_table, counts) in groups.items():
+            # 本事务提交后计为已写入的行数，raw_cycles与raw_data是同一批行
+            committed = sum(count for name, count in counts.items() if name in INSERT_STATEMENTS)
+            try:
+                target = conn if path == self.db_path else self._partition_connection(path)
+                with target:
+                    for table, rows in rows_by_table.items():
+                        if table == "rollups":
+                            for row in rows:
+                                write_rollup(target, row)
+                            continue
+                        target.executemany(INSERT_STATEMENTS[table], rows)
+                    for name, count in counts.items():
+                        target.execute(COUNT_UPDATE.format(table=COUNTED_TABLES[name][0]), (count, name))
+                written, failed = committed, 0
+            except (sqlite3.Error, OSError) as e:
+                print(f"批量写入数据库错误: {str(e)}")
+                written, failed = 0, committed
+
+            with self._condition:
+                if written:
+                    for name, count in counts.items():
+                        self.row_counts[name] += count
+                self.written_count += written
+                self.error_count += failed
+                self.last_commit_time = time.time()
+                self._condition.notify_all()
+
+    def _partition_connection(self, path):
+        """获取分区文件的写入连接，第一次写入新分区时创建文件并处理过期分区"""
+        conn = self._partition_connections.get(path)
+        if conn is not None:
+            return conn
+        is_new = not os.path.exists(path)
+        conn = open_partition(path, self.wal)
+        self._partition_connections[path] = conn
+        # 文件名按时间排序，关闭最早的其他分区连接
+        while len(self._partition_connections) > self.MAX_PARTITION_CONNECTIONS:
+            oldest = min(other for other in self._partition_connections if other != path)
+            self._partition_connections.pop(oldest).close()
+        if is_new:
+            self.start_retention()
+        return conn
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单位转换模块：毫伏(mV)与dBm之间的整个数组转换
+
+所有函数都接受标量、列表或任意形状的数组，一次向量化运算完成转换。
+"""
+
+import numpy as np
+
+# 毫伏转dBm: 毫伏值*54.545-81.818
+DBM_PER_MV = 54.545
+DBM_OFFSET = -81.818
+
+
+def mv_to_dbm(values):
+    """毫伏值转换为dBm
+
+    Args:
+        values: 标量、列表或数组
+
+    Returns:
+        标量输入返回标量，其余返回同形状的数组
+    """
+    if isinstance(values, (list, tuple)):
+        values = np.asarray(values, dtype=np.float64)
+    return values * DBM_PER_MV + DBM_OFFSET
+
+
+def dbm_to_mv(values):
+    """dBm值转换为毫伏
+
+    Args:
+        values: 标量、列表或数组
+
+    Returns:
+        标量输入返回标量，其余返回同形状的数组
+    """
+    if isinstance(values, (list, tuple)):
+        values = np.asarray(values, dtype=np.float64)
+    return (values - DBM_OFFSET) / DBM_PER_MV
+
+
+def to_display_unit(values, use_dbm):
+    """将毫伏数据转换为显示单位
+
+    Args:
+        values: 毫伏值，标量、列表或数组
+        use_dbm: 为True时转换为dBm，否则保持毫伏
+
+    Returns:
+        数组输入时返回同形状的数组；使用毫伏时不做拷贝
+    """
+    if isinstance(values, (list, tuple)):
+        values = np.asarray(values, dtype=np.float64)
+    return mv_to_dbm(values) if use_dbm else values
+
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+迁移脚本：将cycle_data表中旧版逗号分隔文本格式的周期数据转换为二进制格式
+
+用法: python migrate_cycle_data.py [数据库文件路径] [--vacuum]
+
+已经是二进制格式的行会被跳过，可以重复运行；
+--vacuum在迁移后整理数据库文件，回收文本数据占用的空间。
+"""
+
+import sys
+import os
+import sqlite3
+import time
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_codec import decode_cycle, encode_cycle, is_binary_cycle
+
+BATCH_ROWS = 1000  # 每个事务转换的行数
+
+
+def migrate_cycle_data(db_path, vacuum=False, batch_rows=BATCH_ROWS):
+    """转换数据库中的全部文本周期数据
+
+    Args:
+        db_path: 数据库文件路径
+        vacuum: 迁移后是否执行VACUUM
+        batch_rows: 每个事务转换的行数
+
+    Returns:
+        tuple: (转换的行数, 跳过的行数)
+    """
+    conn = sqlite3.connect(db_path)
+    converted = 0
+    skipped = 0
+    last_id = 0
+    try:
+        while True:
+            rows = conn.execute(
+                "SELECT id, data FROM cycle_data WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_rows)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for row_id, data in rows:
+                if is_binary_cycle(data):
+                    skipped += 1
+                    continue
+                updates.append((encode_cycle(decode_cycle(data)), row_id))
+
+            with conn:
+                conn.executemany("UPDATE cycle_data SET data = ? WHERE id = ?", updates)
+            converted += len(updates)
+
+        if vacuum and converted:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return converted, skipped
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--vacuum"]
+    db_path = args[0] if args else os.path.join(os.path.dirname(os.path.abspath(__file__)), "gis_pd_data.db")
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
+        sys.exit(1)
+
+    size_before = os.path.getsize(db_path)
+    start = time.perf_counter()
+    converted, skipped = migrate_cycle_data(db_path, vacuum="--vacuum" in sys.argv[1:])
+    elapsed = time.perf_counter() - start
+
+    print(f"已转换 {converted} 行，跳过 {skipped} 行（已是二进制格式），耗时 {elapsed:.2f} 秒")
+    print(f"数据库文件大小: {size_before / 1024:.1f} KB -> {os.path.getsize(db_path) / 1024:.1f} KB")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证周期数据二进制编码、旧文本兼容、迁移脚本和压缩周期块
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_codec import (CYCLE_HEADER, encode_cycle, decode_cycle, is_binary_cycle,
+                          DTYPE_UINT16, DTYPE_FLOAT32, encode_cycle_block, decode_cycle_block)
+from gis_pd_decoder import decode_payload
+from migrate_cycle_data import migrate_cycle_data
+
+
+def make_live_cycle(samples=200, seed=0):
+    """生成与MQTT解码结果相同的周期数据"""
+    codes = np.random.default_rng(seed).integers(0, 4096, size=samples + 5, dtype=np.uint16)
+    return decode_payload(codes.astype('>u2').tobytes())
+
+
+def test_live_cycle_uses_codes():
+    """测试实时数据按uint16码值无损编码"""
+    print("=== 测试码值编码 ===")
+    cycle = make_live_cycle()
+    blob = encode_cycle(cycle)
+
+    dtype_code = CYCLE_HEADER.unpack_from(blob)[2]
+    assert dtype_code == DTYPE_UINT16, f"实时数据应以码值存储，实际数据类型: {dtype_code}"
+    assert len(blob) == CYCLE_HEADER.size + 2 * len(cycle), f"编码长度不正确: {len(blob)}"
+    assert np.array_equal(decode_cycle(blob), cycle), "解码结果应与原数据完全一致"
+    print(f"   ✓ {len(cycle)}点编码为{len(blob)}字节，文本需要{len(','.join(map(str, cycle)))}字节")
+
+
+def test_float_fallback_and_legacy_text():
+    """测试非码值数据和旧文本数据"""
+    print("=== 测试float32和旧文本 ===")
+    values = [0.1, 0.25, 1.7]
+    blob = encode_cycle(values)
+    assert CYCLE_HEADER.unpack_from(blob)[2] == DTYPE_FLOAT32, "非码值数据应以float32存储"
+    assert np.allclose(decode_cycle(blob), values), "float32解码结果不正确"
+
+    text = ','.join(map(str, make_live_cycle(20)))
+    assert not is_binary_cycle(text), "文本不应被识别为二进制格式"
+    assert np.array_equal(decode_cycle(text), make_live_cycle(20)), "旧文本应解码为相同数值"
+    assert np.array_equal(decode_cycle(text.encode('ascii')), make_live_cycle(20)), "以字节存储的旧文本也应能解码"
+    print("   ✓ float32和旧文本解码正确")
+
+
+def test_migration():
+    """测试迁移脚本转换文本行并跳过已转换的行"""
+    print("=== 测试迁移 ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "migrate_test.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE cycle_data (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "timestamp TEXT NOT NULL, cycle_number INTEGER NOT NULL, data BLOB NOT NULL)")
+        cycles = [make_live_cycle(100, seed) for seed in range(25)]
+        conn.executemany("INSERT INTO cycle_data (timestamp, cycle_number, data) VALUES ('t', ?, ?)",
+                         [(i, ','.join(map(str, cycle))) for i, cycle in enumerate(cycles)])
+        conn.commit()
+        conn.close()
+
+        converted, skipped = migrate_cycle_data(db_path, batch_rows=10)
+        assert (converted, skipped) == (25, 0), f"应转换25行，实际为: {converted}, 跳过{skipped}"
+        assert migrate_cycle_data(db_path) == (0, 25), "再次运行应跳过全部已转换的行"
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT data FROM cycle_data ORDER BY id").fetchall()
+        conn.close()
+        for (blob,), cycle in zip(rows, cycles):
+            assert CYCLE_HEADER.unpack_from(blob)[2] == DTYPE_UINT16, "迁移后的实时数据应以码值存储"
+            assert np.array_equal(decode_cycle(blob), cycle), "迁移后数据应与原数据一致"
+    print("   ✓ 迁移正确且可重复运行")
+
+
+def test_cycle_block_round_trip():
+    """测试周期块在两种压缩方式和两种变换下无损还原"""
+    print("=== 测试周期块 ===")
+    cycles = np.vstack([make_live_cycle(100, seed % 3) for seed in range(40)])
+    timestamps = 1_700_000_000_000_000 + np.arange(40) * 20_000
+    numbers = np.arange(1, 41)
+
+    for compression in ("zlib", "lzma"):
+        blob = encode_cycle_block(timestamps, numbers, cycles, compression)
+        decoded_times, decoded_numbers, decoded = decode_cycle_block(blob)
+        assert np.array_equal(decoded, cycles), f"{compression}块解码的码值数据应与原数据一致"
+        assert np.array_equal(decoded_times, timestamps) and np.array_equal(decoded_numbers, numbers), \
+            f"{compression}块的时间戳和周期编号应一致"
+        assert len(blob) < cycles.size * 2 / 4, f"{compression}块压缩后应小于码值数据的1/4，实际为{len(blob)}字节"
+    print("   ✓ 码值数据差分压缩后无损还原")
+
+    float_cycles = cycles + 0.01
+    _, _, decoded = decode_cycle_block(encode_cycle_block(timestamps, numbers, float_cycles))
+    assert np.array_equal(decoded, float_cycles.astype(np.float32)), "float32数据异或编码后应无损还原"
+    print("   ✓ float32数据异或编码后无损还原")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_live_cycle_uses_codes()
+        test_float_fallback_and_legacy_text()
+        test_migration()
+        test_cycle_block_round_trip()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
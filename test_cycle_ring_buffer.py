@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证周期环形缓冲区的追加、视图和容量调整，以及PRPD密度统计
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_buffers import CycleRingBuffer, PhaseAmplitudeHistogram, stack_cycles
+
+
+def make_cycle(value, width=6):
+    """生成所有点都等于value的周期"""
+    return np.full(width, value, dtype=np.float32)
+
+
+def test_append_and_last():
+    """测试追加和最近N个周期视图"""
+    print("=== 测试追加和视图 ===")
+    buffer = CycleRingBuffer(4)
+
+    for i in range(10):
+        buffer.append(make_cycle(i))
+
+    assert len(buffer) == 4, f"缓冲区应保存4个周期，实际为: {len(buffer)}"
+    assert buffer.appended == 10, f"追加总数应为10，实际为: {buffer.appended}"
+    assert list(buffer.last()[:, 0]) == [6, 7, 8, 9], f"最近周期应为6-9，实际为: {list(buffer.last()[:, 0])}"
+    assert list(buffer.last(2)[:, 0]) == [8, 9], "最近2个周期应为8和9"
+    assert buffer.total_points == 24, f"数据点总数应为24，实际为: {buffer.total_points}"
+    print("   ✓ 追加和视图正确")
+
+    view = buffer.last()
+    assert view.base is not None, "最近周期应以视图形式返回"
+    assert not view.flags.writeable, "视图应为只读"
+    print("   ✓ 视图零拷贝且只读")
+
+
+def test_resize_keeps_latest():
+    """测试调整容量后保留最新的周期"""
+    print("=== 测试容量调整 ===")
+    buffer = CycleRingBuffer(5)
+    for i in range(7):
+        buffer.append(make_cycle(i))
+
+    buffer.resize(3)
+    assert list(buffer.last()[:, 0]) == [4, 5, 6], f"缩小后应保留4-6，实际为: {list(buffer.last()[:, 0])}"
+
+    buffer.resize(8)
+    buffer.append(make_cycle(7))
+    assert list(buffer.last()[:, 0]) == [4, 5, 6, 7], f"扩大后应保留4-7，实际为: {list(buffer.last()[:, 0])}"
+    print("   ✓ 容量调整正确")
+
+
+def test_width_resample_and_clear():
+    """测试不同长度周期的重采样和清空"""
+    print("=== 测试重采样和清空 ===")
+    buffer = CycleRingBuffer(3)
+    buffer.append(np.linspace(0, 1, 5))
+    buffer.append(np.linspace(0, 1, 9))
+
+    assert buffer.last().shape == (2, 5), f"形状应为(2, 5)，实际为: {buffer.last().shape}"
+    assert np.allclose(buffer.last()[1], np.linspace(0, 1, 5)), "不同长度的周期应按相位重采样"
+
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.appended == 0, "清空后应没有周期"
+    buffer.append(np.zeros(7))
+    assert buffer.width == 7, f"清空后宽度应由新周期决定，实际为: {buffer.width}"
+    print("   ✓ 重采样和清空正确")
+
+
+def test_stack_cycles():
+    """测试把不同长度的周期合并为矩阵"""
+    print("=== 测试合并周期 ===")
+    matrix, widths = stack_cycles([np.ones(4), np.arange(6), np.zeros(4)])
+    assert matrix.shape == (3, 6) and matrix.dtype == np.float32, f"形状应为(3, 6)，实际为: {matrix.shape}"
+    assert widths.tolist() == [4, 6, 4], f"点数不正确: {widths.tolist()}"
+    assert np.isnan(matrix[0, 4:]).all() and np.array_equal(matrix[1], np.arange(6)), "较短的周期末尾应为NaN"
+
+    matrix, widths = stack_cycles([])
+    assert matrix.shape == (0, 0) and len(widths) == 0, "没有周期时应返回空矩阵"
+    print("   ✓ 点数不同的周期末尾填充NaN")
+
+
+def test_density_histogram_window():
+    """测试密度统计随窗口增量加减"""
+    print("=== 测试密度统计 ===")
+    density = PhaseAmplitudeHistogram(3, (0.0, 1.0), phase_bins=4, amplitude_bins=2)
+    for value in [0.1, 0.6, 0.9, 0.2, 1.5]:
+        density.append(make_cycle(value, width=8))
+
+    # 窗口内为0.9、0.2和超出范围的1.5
+    assert len(density) == 3, f"窗口应保存3个周期，实际为: {len(density)}"
+    assert density.counts.tolist() == [[2, 2, 2, 2], [2, 2, 2, 2]], f"计数不正确: {density.counts.tolist()}"
+    print("   ✓ 新周期加入、最早周期减去，超出范围的点不计数")
+
+    rng = np.random.default_rng(0)
+    cycles = rng.random((10, 8))
+    density.rebuild(cycles, window=5)
+    expected, _, _ = np.histogram2d(cycles[-5:].ravel(), np.tile(np.arange(8) // 2, 5),
+                                    bins=(2, 4), range=((0, 1), (0, 4)))
+    assert np.array_equal(density.counts, expected), "重建后的计数应与numpy直方图一致"
+    print("   ✓ 调整窗口后重建正确")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_append_and_last()
+        test_resize_keeps_latest()
+        test_width_resample_and_clear()
+        test_stack_cycles()
+        test_density_histogram_window()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
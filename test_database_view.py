@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证数据库查看对话框的键集分页（合并分区、按行存储、只保存原始负载和周期块中的周期），
+时间范围内的计数，表格模型在后台线程中按页加载，以及历史图表在后台解码并缓存周期矩阵
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_codec import encode_cycle
+from gis_pd_decoder import ADC_SCALE
+from gis_pd_storage import DAY_US, now_timestamp, timestamp_to_us, us_to_timestamp
+
+
+def payload_for(value):
+    """生成一条带帧头帧尾的模拟MQTT负载"""
+    return np.asarray([0, 0, 0, 0] + [value] * 8 + [0], dtype='>u2').tobytes()
+
+
+def fill_database(manager):
+    """在3天的分区和主数据库中写入按行存储、只保存原始负载和周期块中的周期
+
+    Returns:
+        int: 写入的周期数，周期编号为0到周期数-1且互不相同
+    """
+    noon = manager.partition_layout.partition_start(now_timestamp()[1]) + DAY_US // 2  # 避开零点附近
+    number = 0
+    writer = manager.writer
+    for day in (2, 1, 0):
+        manager.set_partitioning(None if day == 1 else "day")  # 中间一天写入主数据库
+        base_us = noon - day * DAY_US
+        for i in range(30):
+            timestamp_us = base_us + (i // 2) * 20_000  # 每两行时间戳相同，验证游标处理相同的时间戳
+            row = (us_to_timestamp(timestamp_us), timestamp_us)
+            if i % 3 == 2:
+                writer.submit("raw_data", row + ("broker", "topic", payload_for(number), number))
+            else:
+                writer.submit("cycle_data", row + (number, encode_cycle([number * ADC_SCALE] * 8)))
+            number += 1
+        manager.set_block_storage(7)
+        for i in range(20):
+            timestamp_us = base_us + 1_000_000 + i * 20_000
+            writer.submit("cycle_data", (us_to_timestamp(timestamp_us), timestamp_us, number,
+                                         encode_cycle([number * ADC_SCALE] * 8)))
+            number += 1
+        manager.flush(5.0)
+        manager.set_block_storage(0)
+    manager.flush(5.0)
+    return number
+
+
+def walk_pages(manager, kind, page_size, **query):
+    """按页读取到末尾，返回全部行"""
+    rows, cursor = [], None
+    while True:
+        page, cursor = manager.get_page(kind, cursor, page_size, **query)
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+
+def test_keyset_pages():
+    """测试分页读取与一次性查询的结果一致且不重复"""
+    print("=== 测试键集分页 ===")
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = DatabaseManager(os.path.join(tmp_dir, "page_test.db"))
+        total = fill_database(manager)
+        assert len(manager.partition_layout.list_partitions()) == 2, "应写入2个分区"
+
+        everything = manager.get_cycle_data_by_time("2000-01-01 00:00:00", "2100-01-01 00:00:00")
+        assert sorted(row[2] for row in everything) == list(range(total)), "一次性查询应包含全部周期"
+
+        newest_first = walk_pages(manager, "cycle", 7)
+        assert sorted(row[2] for row in newest_first) == list(range(total)), "分页读取的周期应不重复、不遗漏"
+        assert [row[1] for row in newest_first] == sorted((row[1] for row in everything), reverse=True), \
+            "从新到旧分页应按时间排序"
+        print(f"   ✓ {total}个周期分{total // 7 + 1}页读取，与一次性查询一致")
+
+        middle = [row for row in everything if 50 <= row[2] < 100]  # 中间一天写入主数据库
+        start_us, end_us = timestamp_to_us(middle[0][1]), timestamp_to_us(middle[-1][1])
+        in_range = walk_pages(manager, "cycle", 9, start_us=start_us, end_us=end_us, descending=False)
+        assert [row[2] for row in in_range] == [row[2] for row in middle], "按时间范围分页应从旧到新返回范围内的周期"
+        assert manager.count_in_range("cycle", start_us, end_us) == len(middle), "时间范围内的计数不正确"
+        assert manager.count_in_range("cycle") == total, "不限时间范围时应统计全部周期"
+        print("   ✓ 按时间范围分页和计数正确")
+
+        raw_rows = walk_pages(manager, "raw", 4)
+        assert len(raw_rows) == manager.count_in_range("raw") == 30, "原始数据分页应返回全部原始数据"
+        manager.close()
+
+
+def wait_for(condition, timeout=10.0):
+    """处理Qt事件直到条件满足"""
+    from PySide6.QtWidgets import QApplication
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        QApplication.processEvents()
+        time.sleep(0.005)
+    return True
+
+
+def test_dialog_model_loads_in_background():
+    """测试数据库查看对话框按页在后台加载，滚动到末尾时加载下一页"""
+    print("=== 测试表格模型 ===")
+    from PySide6.QtCore import QDateTime
+    from PySide6.QtWidgets import QApplication
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager, DatabaseViewDialog, QueryTableModel
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = DatabaseManager(os.path.join(tmp_dir, "model_test.db"))
+        rows = [(us_to_timestamp(1_700_000_000_000_000 + i * 20_000), 1_700_000_000_000_000 + i * 20_000, i,
+                 encode_cycle([ADC_SCALE] * 8)) for i in range(1000)]
+        with manager.conn:
+            manager.conn.executemany("INSERT INTO cycle_data (timestamp, ts_us, cycle_number, data) "
+                                     "VALUES (?, ?, ?, ?)", rows)
+
+        dialog = DatabaseViewDialog(manager)
+        dialog.limit_spin.setValue(500)
+        dialog.query_data()
+        model = dialog.table_model
+        assert wait_for(lambda: not model.loading and model.total is not None), "第一页应在后台加载完成"
+        assert model.rowCount() == QueryTableModel.PAGE_SIZE and model.total == 500, \
+            f"应只加载第一页，实际为: {model.rowCount()}/{model.total}"
+        assert model.rows[0][2] == 999, "最新数据应从最新的周期开始"
+        assert model.data(model.index(0, 3)).startswith(str(np.float32(ADC_SCALE))), "预览应在读取单元格时计算"
+
+        while model.canFetchMore():
+            model.fetchMore()
+            assert wait_for(lambda: not model.loading), "下一页应在后台加载完成"
+        assert model.rowCount() == 500, f"最多加载最新数据数量的行，实际为: {model.rowCount()}"
+        print("   ✓ 按页加载并遵守行数上限")
+
+        dialog.query_type_combo.setCurrentIndex(1)
+        dialog.start_time_edit.setDateTime(QDateTime.fromString(rows[100][0][:19], "yyyy-MM-dd hh:mm:ss"))
+        dialog.end_time_edit.setDateTime(QDateTime.fromString(rows[-1][0][:19], "yyyy-MM-dd hh:mm:ss"))
+        dialog.query_data()
+        assert wait_for(lambda: not model.loading and model.total is not None), "按时间范围的查询应在后台完成"
+        assert [row[2] for row in model.rows[:3]] == [100, 101, 102], "按时间范围应从旧到新"
+        assert model.total == manager.count_in_range("cycle", model.query["start_us"], model.query["end_us"]), \
+            "总行数应为时间范围内的周期数"
+        dialog.reject()
+        assert dialog.query_worker.isFinished(), "关闭对话框后后台线程应结束"
+        manager.close()
+    print("   ✓ 按时间范围查询在后台完成，关闭后线程结束")
+
+
+def record_flush_threads(manager):
+    """记录manager.flush在哪些线程中被调用"""
+    threads = []
+    flush = manager.flush
+
+    def recording_flush(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return flush(*args, **kwargs)
+    manager.flush = recording_flush
+    return threads
+
+
+def test_query_flushes_in_worker():
+    """测试查询和长期趋势在后台线程中等待写入队列落盘，界面线程不等待写入线程"""
+    print("=== 测试查询前落盘 ===")
+    from PySide6.QtWidgets import QApplication
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager, DatabaseViewDialog, HistoricalChartsDialog
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = DatabaseManager(os.path.join(tmp_dir, "flush_test.db"))
+        threads = record_flush_threads(manager)
+        for i in range(5):
+            manager.save_cycle_data(i, [0.1] * 8)  # 不等待写入，由查询负责落盘
+
+        dialog = DatabaseViewDialog(manager)
+        dialog.query_data()
+        model = dialog.table_model
+        assert wait_for(lambda: not model.loading and model.total is not None), "查询应在后台完成"
+        assert model.total == 5 and model.rowCount() == 5, f"查询结果应包含刚提交的周期，实际为: {model.total}"
+        assert threads and threading.main_thread() not in threads, "界面线程不应等待写入线程"
+
+        # 长期趋势在历史数据加载线程中落盘，exec替换为记录打开的对话框
+        opened = []
+        exec_dialog = HistoricalChartsDialog.exec
+        HistoricalChartsDialog.exec = lambda self: opened.append(self)
+        try:
+            threads.clear()
+            dialog.view_long_term_trend()
+        finally:
+            HistoricalChartsDialog.exec = exec_dialog
+        trend = opened[0]
+        assert wait_for(lambda: trend.history_complete), "长期趋势应在后台加载完成"
+        assert threads and threading.main_thread() not in threads, "打开长期趋势时界面线程不应等待写入线程"
+        assert trend.chart_type_combo.currentText() == "长期趋势", "应显示长期趋势"
+        trend.reject()
+        dialog.reject()
+        manager.close()
+    print("   ✓ 查询和长期趋势在后台线程中落盘")
+
+
+def test_history_loader_caches_matrix():
+    """测试历史图表在后台读取并解码周期，修改数据范围只对缓存的矩阵切片"""
+    print("=== 测试历史图表加载 ===")
+    from PySide6.QtWidgets import QApplication
+    from gis_pd_mqtt_gui_ui_revamp import HistoricalChartsDialog, HistoryLoader
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+
+    total = HistoryLoader.CHUNK_ROWS * 2 + 500
+    rows = [(us_to_timestamp(1_700_000_000_000_000 + i * 20_000), 1_700_000_000_000_000 + i * 20_000, i,
+             encode_cycle([i * ADC_SCALE] * (8 if i % 2 else 12))) for i in reversed(range(total))]
+    progress = []
+    dialog = HistoricalChartsDialog(rows[:10], fetch_rows=lambda: rows)
+    dialog.load_progress.valueChanged.connect(lambda done: progress.append((done, dialog.load_progress.maximum())))
+    assert wait_for(lambda: dialog.history_complete), "周期应在后台解码完成"
+    assert progress[-1] == (total, total) and len(progress) >= 3, f"应按批报告进度，实际为: {progress}"
+    assert dialog.range_spin.maximum() == total, "读取完成后数据范围应为全部周期"
+
+    history = dialog.history
+    assert history["cycles"].shape == (total, 12), f"矩阵形状不正确: {history['cycles'].shape}"
+    assert history["cycle_numbers"][0] == 0 and history["cycle_numbers"][-1] == total - 1, "矩阵应从旧到新"
+    assert np.isnan(history["cycles"][1, 8:]).all() and history["widths"][1] == 8, "较短的周期末尾应为NaN"
+    assert np.allclose(history["cycles"][-1, :8], (total - 1) * ADC_SCALE), "最新周期的数据不正确"
+
+    dialog.range_spin.setValue(total)
+    cycles, widths, numbers = dialog.selected_cycles()
+    assert np.shares_memory(cycles, history["cycles"]) and len(numbers) == total, "修改数据范围应只对缓存的矩阵切片"
+    assert dialog.needs_preview() and dialog.detail_timer.isActive(), "数据点较多时应先绘制预览"
+    dialog.chart_type_combo.setCurrentText("PRPS三维图")
+    dialog.draw_detail()
+    dialog.reject()
+    assert dialog.loader.isFinished(), "关闭对话框后后台线程应结束"
+    print(f"   ✓ {total}个周期分批解码并缓存为矩阵，修改范围不再解码")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_keyset_pages()
+        test_dialog_model_loads_in_background()
+        test_query_flushes_in_worker()
+        test_history_loader_caches_matrix()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证数据库批量写入线程的批量提交、关闭时写完和队列满丢弃，
+WAL模式下只读连接与写入并发，压缩块存储的写入和查询，
+旧数据库增加微秒时间戳列的迁移和查询使用索引，内存中维护的行数计数，
+按时间分区的写入、查询和过期分区处理，以及只保存原始负载时读取解码
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_storage import DatabaseWriter
+
+
+def count_rows(db_path, table):
+    """用独立连接统计数据表行数"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_batched_writes_and_close():
+    """测试批量写入、flush和关闭时写完剩余数据"""
+    print("=== 测试批量写入 ===")
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "writer_test.db")
+        manager = DatabaseManager(db_path)
+        assert manager.connected, "数据库应连接成功"
+
+        commits = []
+        original_write = manager.writer._write_batch
+        manager.writer._write_batch = lambda conn, batch, *args: (commits.append(len(batch)),
+                                                                  original_write(conn, batch, *args))
+
+        for i in range(1200):
+            manager.save_cycle_data(i, [0.1, 0.2, 0.3])
+        manager.save_raw_data("broker", "topic", "00ff")
+        assert manager.flush(5.0), "flush应在超时前完成"
+        assert manager.write_lag == 0, f"flush后不应有待写入的行，实际为: {manager.write_lag}"
+        assert count_rows(db_path, "cycle_data") == 1200, "周期数据应全部写入"
+        assert count_rows(db_path, "raw_data") == 1, "原始数据应写入"
+        assert len(commits) < 10 and max(commits) <= 500, f"应按最多500行分批提交，实际批次: {commits}"
+        print(f"   ✓ 1201行分{len(commits)}个事务写入")
+
+        for i in range(10):
+            manager.save_cycle_data(i, [0.5])
+        manager.close()
+        assert count_rows(db_path, "cycle_data") == 1210, "关闭时应写完队列中剩余的行"
+        print("   ✓ 关闭时写完剩余数据")
+
+
+def test_queue_full_drops():
+    """测试队列满时丢弃并计数"""
+    print("=== 测试队列满丢弃 ===")
+    writer = DatabaseWriter(":memory:", maxsize=5)  # 不启动线程，队列不会被取出
+    results = [writer.submit("raw_data", ("t", "b", "topic", "00")) for _ in range(7)]
+
+    assert results.count(False) == 2, f"应有2行提交失败，实际为: {results.count(False)}"
+    assert writer.dropped_count == 2, f"丢弃计数应为2，实际为: {writer.dropped_count}"
+    assert writer.pending == 5, f"待写入行数应为5，实际为: {writer.pending}"
+    print("   ✓ 队列满时丢弃并计数")
+
+
+def test_wal_readers_do_not_block_writer():
+    """测试WAL模式下只读连接在写事务进行中仍可查询"""
+    print("=== 测试WAL只读连接 ===")
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "wal_test.db")
+        manager = DatabaseManager(db_path)
+        mode = manager.get_read_connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal", f"应启用WAL模式，实际为: {mode}"
+
+        manager.save_cycle_data(1, [0.1])
+        manager.flush(5.0)
+
+        # 另一个连接持有未提交的写事务
+        writer_conn = sqlite3.connect(db_path, timeout=0)
+        writer_conn.execute("BEGIN IMMEDIATE")
+        writer_conn.execute("INSERT INTO cycle_data (timestamp, cycle_number, data) VALUES ('t', 2, '0.2')")
+        assert manager.get_cycle_count() == 1, "写事务未提交时读取应看到已提交的数据且不被阻塞"
+        writer_conn.rollback()
+        writer_conn.close()
+        print("   ✓ 写事务进行中仍可查询")
+
+        try:
+            manager.get_read_connection().execute("DELETE FROM cycle_data")
+            assert False, "只读连接不应能修改数据"
+        except sqlite3.OperationalError:
+            pass
+        print("   ✓ 查询连接为只读")
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(manager.get_read_connection()))
+        thread.start()
+        thread.join()
+        assert other[0] is not manager.get_read_connection(), "每个线程应使用各自的只读连接"
+        print("   ✓ 每个线程独立的只读连接")
+        manager.close()
+
+
+def test_block_storage_queries():
+    """测试块存储模式下的写入和按时间/最新数据查询"""
+    print("=== 测试压缩块存储 ===")
+    import numpy as np
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+    from gis_pd_decoder import ADC_SCALE
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "block_test.db")
+        manager = DatabaseManager(db_path, block_cycles=10)
+        cycles = [np.arange(i, i + 20) * np.float32(ADC_SCALE) for i in range(25)]
+        for i, cycle in enumerate(cycles):
+            manager.save_cycle_data(i + 1, cycle)
+        manager.set_block_storage(0)
+        manager.save_cycle_data(26, cycles[0])  # 关闭块存储后按行写入
+        manager.flush(5.0)
+
+        assert count_rows(db_path, "cycle_blocks") == 3, "25个周期应写成3个块（最后一块未满）"
+        assert count_rows(db_path, "cycle_data") == 1, "关闭块存储后应按行写入"
+        assert manager.get_cycle_count() == 26, f"周期总数应为26，实际为: {manager.get_cycle_count()}"
+
+        latest = manager.get_latest_cycle_data(12)
+        assert [row[2] for row in latest] == list(range(26, 14, -1)), f"最新周期顺序不正确: {[row[2] for row in latest]}"
+        assert np.allclose(latest[1][3], cycles[24]), "块中周期数据应与写入时一致"
+
+        start, end = latest[-1][1], latest[1][1]
+        in_range = manager.get_cycle_data_by_time(start, end)
+        assert [row[2] for row in in_range] == list(range(15, 26)), "按时间查询应只返回范围内的周期"
+        manager.close()
+    print("   ✓ 块存储写入和查询正确")
+
+
+def test_timestamp_column_migration():
+    """测试旧数据库打开时回填微秒时间戳，查询使用索引"""
+    print("=== 测试时间戳列迁移 ===")
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+    from gis_pd_storage import timestamp_to_us
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "migrate_test.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE cycle_data (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "timestamp TEXT NOT NULL, cycle_number INTEGER NOT NULL, data BLOB NOT NULL)")
+        conn.execute("CREATE TABLE raw_data (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, "
+                     "broker TEXT NOT NULL, topic TEXT NOT NULL, raw_data BLOB NOT NULL)")
+        timestamps = [f"2024-03-0{day} 12:00:0{day}.{day * 111111:06d}" for day in range(1, 6)]
+        conn.executemany("INSERT INTO cycle_data (timestamp, cycle_number, data) VALUES (?, ?, '0.1,0.2')",
+                         [(timestamp, i) for i, timestamp in enumerate(timestamps)])
+        conn.execute("INSERT INTO raw_data (timestamp, broker, topic, raw_data) VALUES (?, 'b', 't', '00')",
+                     (timestamps[0],))
+        conn.commit()
+        conn.close()
+
+        manager = DatabaseManager(db_path)
+        reader = manager.get_read_connection()
+        backfilled = [row for row in reader.execute("SELECT timestamp, ts_us FROM cycle_data ORDER BY id")]
+        assert all(ts_us == timestamp_to_us(timestamp) for timestamp, ts_us in backfilled), \
+            f"回填的微秒时间戳应与时间戳文本一致: {backfilled}"
+        assert reader.execute("SELECT ts_us FROM raw_data").fetchone()[0] == timestamp_to_us(timestamps[0]), \
+            "原始数据表也应回填"
+        print("   ✓ 旧数据回填微秒时间戳")
+
+        manager.save_cycle_data(99, [0.3])
+        manager.flush(5.0)
+        latest = manager.get_latest_cycle_data(2)
+        assert [row[2] for row in latest] == [99, 4], f"最新周期应按时间排序，实际为: {[row[2] for row in latest]}"
+        in_range = manager.get_cycle_data_by_time("2024-03-02 00:00:00", "2024-03-04 12:00:04")
+        assert [row[2] for row in in_range] == [1, 2], f"按时间查询结果不正确: {[row[2] for row in in_range]}"
+        print("   ✓ 新旧数据合并查询正确")
+
+        for query in ("SELECT id FROM cycle_data ORDER BY ts_us DESC LIMIT 10",
+                      "SELECT id FROM cycle_data WHERE ts_us BETWEEN 0 AND 1 ORDER BY ts_us",
+                      "SELECT id FROM cycle_blocks WHERE start_us <= 1 AND end_us >= 0 ORDER BY start_us"):
+            plan = " ".join(row[-1] for row in reader.execute("EXPLAIN QUERY PLAN " + query))
+            assert "INDEX idx_" in plan and "TEMP B-TREE" not in plan, f"查询应使用索引: {query} -> {plan}"
+        print("   ✓ 查询使用时间戳索引")
+        manager.close()
+
+        # 重复打开不应重复回填
+        manager = DatabaseManager(db_path)
+        assert manager.get_cycle_count() == 6, "重复打开后数据应保持不变"
+        manager.close()
+
+
+def test_row_counters():
+    """测试计数随写入更新、重新打开时从table_counts读取并补上其他程序写入的行"""
+    print("=== 测试行数计数 ===")
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "count_test.db")
+        manager = DatabaseManager(db_path, block_cycles=4)
+        for i in range(10):
+            manager.save_cycle_data(i, [0.1, 0.2])
+        manager.set_block_storage(0)
+        for i in range(3):
+            manager.save_cycle_data(i, [0.1, 0.2])
+        manager.save_raw_data("broker", "topic", "00ff")
+        manager.flush(5.0)
+        assert (manager.get_cycle_count(), manager.get_raw_count()) == (13, 1), \
+            f"计数应为13个周期和1条原始数据，实际为: {manager.get_row_counts()}"
+        assert getattr(manager._local, "conns", None) is None, "获取计数不应查询数据库"
+        manager.close()
+        assert manager.save_cycle_data(0, [0.1]) is False and manager.save_raw_data("broker", "topic", b"") is False, \
+            "未连接时保存应返回False"
+        print("   ✓ 计数随写入更新且不查询数据库")
+
+        # 模拟其他程序（例如旧版本）直接写入的行
+        conn = sqlite3.connect(db_path)
+        conn.executemany("INSERT INTO cycle_data (timestamp, cycle_number, data) VALUES ('t', ?, '0.1')",
+                         [(i,) for i in range(5)])
+        conn.commit()
+        conn.close()
+
+        manager = DatabaseManager(db_path)
+        assert manager.get_row_counts() == {"cycle_data": 8, "raw_data": 1, "cycle_blocks": 10, "raw_cycles": 0}, \
+            f"重新打开后的计数不正确: {manager.get_row_counts()}"
+        stored = dict(manager.get_read_connection().execute("SELECT name, row_count FROM table_counts"))
+        assert stored == manager.get_row_counts(), f"table_counts表应与内存计数一致: {stored}"
+        manager.close()
+    print("   ✓ 重新打开时读取保存的计数并补上新增的行")
+
+
+def test_partitioned_storage():
+    """测试按天分区写入、只打开有交集的分区，以及过期分区的压缩和删除"""
+    print("=== 测试分区存储 ===")
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+    from gis_pd_storage import DAY_US, now_timestamp, us_to_timestamp
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "partition_test.db")
+        manager = DatabaseManager(db_path, partition="day")
+        noon = manager.partition_layout.partition_start(now_timestamp()[1]) + DAY_US // 2  # 避开零点附近
+        days = [noon - 3 * DAY_US, noon - 2 * DAY_US, noon]
+        for day, base_us in enumerate(days):
+            for i in range(5):
+                timestamp_us = base_us + i * 20_000
+                manager.writer.submit("cycle_data", (us_to_timestamp(timestamp_us), timestamp_us,
+                                                     day * 10 + i, encode_test_cycle(i)))
+        manager.flush(5.0)
+
+        partitions = manager.partition_layout.list_partitions()
+        assert len(partitions) == 3, f"应按天写入3个分区，实际为: {[path for _, _, path in partitions]}"
+        assert count_rows(db_path, "cycle_data") == 0, "分区存储时主数据库不应写入周期数据"
+        assert manager.get_cycle_count() == 15, f"计数应包含全部分区，实际为: {manager.get_cycle_count()}"
+        print("   ✓ 按天写入分区文件")
+
+        latest = manager.get_latest_cycle_data(3)
+        assert [row[2] for row in latest] == [24, 23, 22], f"最新周期不正确: {[row[2] for row in latest]}"
+        opened = set(manager._local.conns) - {manager.db_path}
+        assert opened == {partitions[-1][2]}, f"最新数据足够时不应打开更早的分区: {opened}"
+
+        start = us_to_timestamp(days[1] - 1_000_000)[:19]
+        end = us_to_timestamp(days[1] + 1_000_000)[:19]
+        assert [row[2] for row in manager.get_cycle_data_by_time(start, end)] == list(range(10, 15)), \
+            "按时间查询应返回对应分区中的周期"
+        opened = set(manager._local.conns) - {manager.db_path}
+        assert partitions[0][2] not in opened, "时间范围没有交集的分区不应被打开"
+        print("   ✓ 查询只打开需要的分区")
+
+        manager.writer.set_retention(1, "compress")
+        manager.writer._retention_thread.join(10)
+        assert all(count_rows(path, "cycle_data") == 0 for _, _, path in partitions[:2]), "过期分区应被压缩为周期块"
+        assert manager.get_cycle_count() == 15, "压缩后周期总数不变"
+        assert [row[2] for row in manager.get_cycle_data_by_time(start, end)] == list(range(10, 15)), \
+            "压缩后的分区仍可查询"
+        print("   ✓ 过期分区压缩后仍可查询")
+
+        manager.writer.set_retention(1, "delete")
+        manager.writer._retention_thread.join(10)
+        assert len(manager.partition_layout.list_partitions()) == 1, "过期分区应被删除"
+        assert manager.get_cycle_count() == 5, f"删除后计数应为5，实际为: {manager.get_cycle_count()}"
+        manager.close()
+
+        manager = DatabaseManager(db_path)
+        assert manager.get_cycle_count() == 5, "重新打开后计数应包含已有分区"
+        assert len(manager.get_latest_cycle_data(10)) == 5, "不分区时仍可查询已有分区"
+        manager.close()
+    print("   ✓ 过期分区删除并更新计数")
+
+
+def test_storage_policy():
+    """测试存储策略：原始负载以字节保存，只保存原始负载时查询周期数据时解码"""
+    print("=== 测试存储策略 ===")
+    import numpy as np
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+    from gis_pd_decoder import decode_payload
+
+    payloads = [np.asarray([0, 0, 0, 0] + [i] * 16 + [0], dtype='>u2').tobytes() for i in range(1, 7)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "policy_test.db")
+        manager = DatabaseManager(db_path, storage_policy="raw")
+        for i, payload in enumerate(payloads[:4]):
+            manager.save_message(i + 1, decode_payload(payload), payload, "broker", "topic")
+        manager.flush(5.0)
+        assert manager.get_cycle_count() == manager.count_in_range("cycle") == 4, \
+            f"只保存原始负载的周期应计入周期总数，实际为: {manager.get_row_counts()}"
+        manager.set_storage_policy("both")
+        for i, payload in enumerate(payloads[4:]):
+            manager.save_message(i + 5, decode_payload(payload), payload, "broker", "topic")
+        manager.flush(5.0)
+
+        assert count_rows(db_path, "raw_data") == 6 and count_rows(db_path, "cycle_data") == 2, \
+            "只保存原始负载时每条消息应只写入一行"
+        stored = manager.get_raw_data(10)
+        assert all(isinstance(row[4], bytes) for row in stored), "原始负载应以字节保存而不是十六进制文本"
+        assert stored[-1][4] == payloads[0], "保存的原始负载应与消息负载一致"
+
+        latest = manager.get_latest_cycle_data(10)
+        assert [row[2] for row in latest] == [6, 5, 4, 3, 2, 1], \
+            f"最新周期应包含解码的原始负载且不重复，实际为: {[row[2] for row in latest]}"
+        assert np.array_equal(latest[-1][3], decode_payload(payloads[0])), "读取时解码的周期应与实时解码一致"
+        in_range = manager.get_cycle_data_by_time(latest[-1][1], latest[2][1])
+        assert [row[2] for row in in_range] == [1, 2, 3, 4], "按时间查询应包含只保存了原始负载的周期"
+
+        assert manager.get_cycle_count() == 6 and manager.get_raw_count() == 6, \
+            f"同时保存时原始负载不应重复计入周期总数，实际为: {manager.get_row_counts()}"
+
+        manager.close()  # 关闭时写入未完成的时间桶
+        manager = DatabaseManager(db_path)
+        stored = dict(manager.get_read_connection().execute("SELECT name, row_count FROM table_counts"))
+        assert stored["raw_cycles"] == 4 and manager.get_cycle_count() == 6, \
+            f"重新打开后只保存原始负载的周期数不正确: {stored}"
+        _, rollups = manager.get_rollups(latest[-1][1], latest[0][1], resolution=3600)
+        assert rollups["cycle_count"].sum() == 6, "汇总统计应包含只保存了原始负载的周期"
+        manager.close()
+    print("   ✓ 原始负载以字节保存，读取时解码")
+
+
+def test_window_default_storage_policy():
+    """测试主窗口默认只保存原始负载，下拉框显示的与实际使用的策略一致"""
+    print("=== 测试默认存储策略 ===")
+    from PySide6.QtWidgets import QApplication
+    from gis_pd_mqtt_gui_ui_revamp import MainWindow
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        window = MainWindow(os.path.join(tmp_dir, "window_test.db"))
+        try:
+            assert window.db_manager.storage_policy == "raw", \
+                f"默认应只保存原始负载，实际为: {window.db_manager.storage_policy}"
+            selected = window.storage_policy_combo.currentText()
+            assert window.storage_policies[selected] == window.db_manager.storage_policy, \
+                f"下拉框显示的策略应与实际使用的一致: {selected}"
+        finally:
+            window.close()
+    print("   ✓ 默认只保存原始负载")
+
+
+def encode_test_cycle(value):
+    """生成一个测试用的周期BLOB"""
+    from gis_pd_codec import encode_cycle
+    from gis_pd_decoder import ADC_SCALE
+    return encode_cycle([value * ADC_SCALE] * 8)
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_batched_writes_and_close()
+        test_queue_full_drops()
+        test_wal_readers_do_not_block_writer()
+        test_block_storage_queries()
+        test_timestamp_column_migration()
+        test_row_counters()
+        test_partitioned_storage()
+        test_storage_policy()
+        test_window_default_storage_policy()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证历史周期分批导出为CSV、NPZ和分块列式文件，
+导出结果与数据库一致，以及取消导出时删除临时文件
+"""
+
+import sys
+import os
+import csv
+import tempfile
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_codec import encode_cycle
+from gis_pd_decoder import ADC_SCALE
+from gis_pd_export import (CsvExportWriter, ColumnarExportWriter, export_cycles, iter_export_chunks,
+                           open_export_writer)
+from gis_pd_storage import us_to_timestamp
+
+START_US = 1_700_000_000_000_000
+TOTAL = 5000
+
+
+def fill_database(manager):
+    """写入TOTAL个周期，周期编号为i时每个点为i个ADC码值，奇数周期只有8个点"""
+    rows = [(us_to_timestamp(START_US + i * 20_000), START_US + i * 20_000, i,
+             encode_cycle([(i % 4000) * ADC_SCALE] * (8 if i % 2 else 12))) for i in range(TOTAL)]
+    with manager.conn:
+        manager.conn.executemany("INSERT INTO cycle_data (timestamp, ts_us, cycle_number, data) "
+                                 "VALUES (?, ?, ?, ?)", rows)
+
+
+def read_all(path):
+    """读取.npz或.gpdc导出文件的全部批"""
+    chunks = list(iter_export_chunks(path))
+    return (np.concatenate([chunk[0] for chunk in chunks]), np.concatenate([chunk[1] for chunk in chunks]),
+            [chunk[2] for chunk in chunks], np.concatenate([chunk[3] for chunk in chunks]))
+
+
+def test_export_formats():
+    """测试三种格式导出的内容与数据库一致"""
+    print("=== 测试导出格式 ===")
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager, ExportWorker
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = DatabaseManager(os.path.join(tmp_dir, "export_test.db"))
+        fill_database(manager)
+        start_us, end_us = START_US + 100 * 20_000, START_US + 4599 * 20_000  # 第100到4599个周期
+
+        chunk_sizes = [len(chunk[3]) for chunk in manager.iter_cycle_chunks(start_us, end_us, chunk_rows=1000)]
+        assert chunk_sizes == [1000] * 4 + [500], f"应按批读取，实际为: {chunk_sizes}"
+
+        for name in ("cycles.csv", "cycles.npz", "cycles.gpdc"):
+            path = os.path.join(tmp_dir, name)
+            worker = ExportWorker(manager, path, start_us, end_us)
+            results = []
+            worker.export_done.connect(lambda count, file_path: results.append(count))
+            worker.run()  # 在当前线程中执行，直接连接的信号立即调用
+            assert results == [4500], f"{name}应导出4500个周期，实际为: {results}"
+            assert os.path.exists(path) and not os.path.exists(path + ".part"), "完成后应改名为目标文件"
+
+            if name.endswith(".csv"):
+                with open(path, newline="", encoding="utf-8") as csv_file:
+                    lines = list(csv.reader(csv_file))
+                assert lines[0][:2] == ["timestamp", "cycle_number"] and len(lines) == 4501, "CSV应有表头和4500行"
+                assert lines[1][0] == us_to_timestamp(start_us) and lines[1][1] == "100", "第一行应为第100个周期"
+                assert len(lines[1]) == 2 + 12 and len(lines[2]) == 2 + 8, "每行只包含该周期的数据点"
+                assert np.isclose(float(lines[2][2]), 101 * ADC_SCALE, rtol=1e-5), "数据点的值不正确"
+                continue
+
+            timestamps_us, cycle_numbers, matrices, widths = read_all(path)
+            assert cycle_numbers.tolist() == list(range(100, 4600)), f"{name}的周期编号不正确"
+            assert timestamps_us[0] == start_us and timestamps_us[-1] == end_us, f"{name}的时间戳不正确"
+            assert widths[:2].tolist() == [12, 8], f"{name}应保存每个周期的点数"
+            first = matrices[0]
+            assert np.isnan(first[1, 8:]).all() and np.allclose(first[1, :8], 101 * ADC_SCALE), \
+                f"{name}中较短的周期末尾应为NaN"
+
+        for i in range(3):
+            manager.save_cycle_data(TOTAL + i, [0.1] * 8)  # 尚未落盘，由导出线程等待写入
+        worker = ExportWorker(manager, os.path.join(tmp_dir, "latest.npz"))
+        results = []
+        worker.export_done.connect(lambda count, file_path: results.append(count))
+        worker.run()
+        assert results == [TOTAL + 3], f"导出应包含写入队列中的周期，实际为: {results}"
+        manager.close()
+    print("   ✓ CSV、NPZ和分块列式文件的内容与数据库一致，导出前等待写入队列落盘")
+
+
+def test_cancel_removes_partial_file():
+    """测试取消或出错时删除临时文件，不留下不完整的导出"""
+    print("=== 测试取消导出 ===")
+    chunk = (np.arange(3, dtype=np.int64), np.arange(3, dtype=np.int64), np.ones((3, 4), dtype=np.float32),
+             np.full(3, 4))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "cancel.gpdc")
+        written = []
+        completed = export_cycles([chunk] * 5, ColumnarExportWriter(path), progress=written.append,
+                                  cancelled=lambda: len(written) >= 2)
+        assert not completed and written == [3, 6], f"应在第2批之后停止，实际为: {written}"
+        assert os.listdir(tmp_dir) == [], "取消后应删除临时文件"
+
+        def failing_chunks():
+            yield chunk
+            raise RuntimeError("读取失败")
+
+        try:
+            export_cycles(failing_chunks(), CsvExportWriter(os.path.join(tmp_dir, "fail.csv")))
+            assert False, "读取失败时应抛出异常"
+        except RuntimeError:
+            pass
+        assert os.listdir(tmp_dir) == [], "出错后应删除临时文件"
+
+        try:
+            open_export_writer(os.path.join(tmp_dir, "cycles.txt"))
+            assert False, "无法识别的扩展名应抛出ValueError"
+        except ValueError:
+            pass
+    print("   ✓ 取消和出错时不留下不完整的文件")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_export_formats()
+        test_cancel_removes_partial_file()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
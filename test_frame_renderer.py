@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证实时图表在不显示的Agg画布上按快照绘制，PRPD和PRPS图分别只重绘各自的区域，
+以及后台绘制线程只绘制最新提交的一帧
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_render import FrameSnapshot, OffscreenFrameRenderer
+from gis_pd_scheduler import FRAME_VIEWS
+
+
+def make_snapshot(sequence, chart_type="散点图", size=(400, 300), cycles=12, views=FRAME_VIEWS):
+    """生成一个包含随机周期的快照，每一帧都是新到达的周期"""
+    rng = np.random.default_rng(sequence)
+    data = rng.random((cycles, 90)).astype(np.float32) + 0.5
+    density = (rng.integers(0, 5, (20, 30)), cycles) if chart_type == "密度图" else None
+    x_sine = np.linspace(0, 360, 100)
+    return FrameSnapshot(sequence, size, 100, chart_type, data, 100 * sequence + cycles, 10, 8, False, "幅值 (mV)",
+                         (0.0, 3.3), "默认", "viridis", (x_sine, np.sin(np.radians(x_sine)) + 1.5), density, views)
+
+
+def test_offscreen_render():
+    """测试各图表类型按快照的尺寸绘制，快照的数组为只读"""
+    print("=== 测试离屏绘制 ===")
+    renderer = OffscreenFrameRenderer()
+    for chart_type in ("散点图", "颜色散点图", "密度图", "线图"):
+        snapshot = make_snapshot(1, chart_type)
+        pixels = renderer.render(snapshot)
+        assert pixels.shape == (300, 400, 4) and pixels.dtype == np.uint8, f"{chart_type}的图像尺寸不正确: {pixels.shape}"
+        assert pixels[..., :3].std() > 0, f"{chart_type}不应绘制空白图像"
+        assert not snapshot.cycles.flags.writeable, "快照中的周期数据应为只读"
+
+    pixels = renderer.render(make_snapshot(2, size=(640, 200)))
+    assert pixels.shape == (200, 640, 4), "尺寸变化后应按新尺寸绘制"
+    print("   ✓ 各图表类型按快照尺寸绘制")
+
+
+def test_views_blit_own_region():
+    """测试只更新一个图时不完整重绘画布，只改变该图所在的半幅，结果与完整重绘相同"""
+    print("=== 测试分区域重绘 ===")
+    for prps_view in ("三维表面", "热力瀑布图"):
+        renderer = OffscreenFrameRenderer()
+        draws = []
+        draw = renderer.canvas.draw
+        renderer.canvas.draw = lambda: draws.append(1) or draw()
+
+        snapshot = make_snapshot(1, size=(900, 400))
+        snapshot.prps_view = prps_view
+        previous = renderer.render(snapshot)
+        for sequence, views in ((2, ("prpd",)), (3, ("prps",)), (4, FRAME_VIEWS)):
+            snapshot = make_snapshot(sequence, size=(900, 400), views=views)
+            snapshot.prps_view = prps_view
+            pixels = renderer.render(snapshot)
+            changed = (pixels != previous).any(axis=2)
+            assert changed[:, :450].any() == ("prpd" in views), f"{prps_view}: PRPD区域的变化与{views}不符"
+            assert changed[:, 450:].any() == ("prps" in views), f"{prps_view}: PRPS区域的变化与{views}不符"
+            assert set(renderer.last_costs) == set(views), "应只记录更新的图的耗时"
+            previous = pixels
+        assert len(draws) == 1, f"{prps_view}: 只有第一帧需要完整重绘，实际重绘{len(draws)}次"
+        assert renderer.prps_blitter.bbox.x0 > renderer.axes_2d.bbox.x1, "PRPS区域不应与PRPD数据区域重叠"
+
+        draw()
+        assert np.array_equal(np.array(renderer.canvas.buffer_rgba()), previous), f"{prps_view}: blit结果应与完整重绘相同"
+    print("   ✓ 两个图分别blit各自的区域")
+
+
+def test_canvas_blits_own_region():
+    """测试在界面中绘制时，接收数据后PRPD和PRPS图分别blit，不完整重绘画布"""
+    print("=== 测试界面画布分区域重绘 ===")
+    from PySide6.QtWidgets import QApplication
+    from gis_pd_mqtt_gui_ui_revamp import MainWindow
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        window = MainWindow(os.path.join(directory, "test.db"))
+        try:
+            window.background_render = False
+            window.canvas.figure.set_size_inches(10, 4.5)
+            window.accumulated_data.extend(rng.random((60, 200)).astype(np.float32))
+            window.draw_canvas()
+
+            draws = []
+            draw = window.canvas.draw
+            window.canvas.draw = lambda: draws.append(1) or draw()
+            for views in (("prpd",), ("prps",), ("prpd", "prps")):
+                window.accumulated_data.extend(rng.random((5, 200)).astype(np.float32))
+                window.draw_canvas(views)
+            assert not draws, f"接收数据后不应完整重绘画布，实际重绘{len(draws)}次"
+            assert window.frame_scheduler.cost("prps") is not None, "应记录PRPS图的绘制耗时"
+        finally:
+            window.close()
+    print("   ✓ 接收数据时两个图只blit各自的区域")
+
+
+def test_render_thread_drops_stale_frames():
+    """测试绘制期间提交的旧帧被新帧替换，界面只收到最新的帧"""
+    print("=== 测试丢弃过期帧 ===")
+    from PySide6.QtWidgets import QApplication
+    from gis_pd_mqtt_gui_ui_revamp import FrameRenderThread
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+
+    thread = FrameRenderThread()
+    frames = []
+    thread.frame_ready.connect(lambda image, sequence, costs: frames.append((sequence, image.width(), image.height())))
+    for sequence in range(1, 6):
+        thread.submit(make_snapshot(sequence))  # 线程启动前提交，只有最后一帧会被绘制
+    thread.start()
+
+    deadline = time.monotonic() + 20
+    while not frames and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    thread.stop()
+    app.processEvents()
+    assert frames == [(5, 400, 300)], f"应只绘制最新的一帧，实际为: {frames}"
+    assert thread.dropped_frames == 4, f"应丢弃4个过期帧，实际为: {thread.dropped_frames}"
+    assert thread.isFinished(), "停止后线程应结束"
+    print("   ✓ 只绘制最新提交的帧")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_offscreen_render()
+        test_views_blit_own_region()
+        test_canvas_blits_own_region()
+        test_render_thread_drops_stale_frames()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证帧调度按绘制耗时分别调整PRPD和PRPS图的刷新间隔，
+没有新数据时不安排重绘，以及暂停时不重绘
+"""
+
+import sys
+import os
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_scheduler import FrameScheduler
+
+
+def test_intervals_follow_cost():
+    """测试刷新间隔随绘制耗时变化，并限制在设置的范围内"""
+    print("=== 测试刷新间隔 ===")
+    scheduler = FrameScheduler(100, 2000, load_share={"prpd": 0.25, "prps": 0.1})
+    assert scheduler.interval("prpd") == 100, "尚未测量耗时时应使用最短间隔"
+
+    scheduler.record_cost("prpd", 10)
+    scheduler.record_cost("prps", 80)
+    assert scheduler.interval("prpd") == 100, "绘制很快时不应短于最短间隔"
+    assert scheduler.interval("prps") == 800, f"PRPS间隔应为耗时/占用比例，实际为: {scheduler.interval('prps')}"
+
+    for _ in range(30):
+        scheduler.record_cost("prps", 500)
+    assert scheduler.interval("prps") == 2000, "绘制很慢时不应长于最长间隔"
+
+    scheduler.set_bounds(50, 20)
+    assert scheduler.max_interval_ms == 50, "最长间隔小于最短间隔时应取最短间隔"
+    print("   ✓ 间隔按耗时调整并限制在范围内")
+
+
+def test_independent_views_and_pause():
+    """测试两个图按各自的间隔重绘，没有新数据或暂停时不安排重绘"""
+    print("=== 测试独立刷新和暂停 ===")
+    scheduler = FrameScheduler(100, 5000, load_share={"prpd": 0.5, "prps": 0.1})
+    scheduler.record_cost("prpd", 50)   # 间隔100ms
+    scheduler.record_cost("prps", 50)   # 间隔500ms
+    assert scheduler.next_delay(0) is None, "没有新数据时不应安排重绘"
+
+    drawn = {"prpd": 0, "prps": 0}
+    for now in range(0, 1001, 10):
+        scheduler.mark_dirty()  # 每10ms到达新数据
+        assert scheduler.next_delay(now) is not None, "有新数据时应安排重绘"
+        views = scheduler.due_views(now)
+        scheduler.mark_drawn(views, now)
+        for view in views:
+            drawn[view] += 1
+    assert drawn["prpd"] == 11 and drawn["prps"] == 3, f"1秒内PRPD应重绘11次、PRPS应重绘3次，实际为: {drawn}"
+
+    scheduler.mark_dirty()
+    scheduler.paused = True
+    assert scheduler.due_views(now + 10000) == () and scheduler.next_delay(now) is None, "暂停时不应重绘"
+    scheduler.paused = False
+    assert scheduler.due_views(now + 10000) == ("prpd", "prps"), "恢复后应重绘暂停期间变化的图"
+    print("   ✓ PRPS图比PRPD图刷新得少，暂停时不重绘")
+
+
+def test_settings_without_data_settle():
+    """测试还没有数据时修改设置，重绘定时器不会以0ms间隔反复触发"""
+    print("=== 测试无数据时修改设置 ===")
+    from PySide6.QtCore import QEventLoop, QTimer
+    from PySide6.QtWidgets import QApplication
+    from gis_pd_mqtt_gui_ui_revamp import MainWindow
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        window = MainWindow(os.path.join(directory, "test.db"))
+        calls = []
+        due_views = window.frame_scheduler.due_views
+        window.frame_scheduler.due_views = lambda now_ms: calls.append(now_ms) or due_views(now_ms)
+        try:
+            window.toggle_unit()
+            window.update_color_scheme(window.current_color_scheme)
+            window.clear_data()
+            loop = QEventLoop()
+            QTimer.singleShot(400, loop.quit)
+            loop.exec()
+            assert len(calls) <= 3, f"没有数据时重绘应只触发一次，实际触发{len(calls)}次"
+            assert not window.frame_scheduler.dirty, "没有数据可画时应取消重绘标记"
+            assert not window.plot_timer.isActive(), "定时器应停止"
+            assert window.db_path == os.path.join(directory, "test.db"), \
+                f"路径信息应显示实际使用的数据库文件，实际为: {window.db_path}"
+        finally:
+            window.close()
+    print(f"   ✓ 修改设置后重绘触发{len(calls)}次，定时器停止")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_intervals_follow_cost()
+        test_independent_views_and_pause()
+        test_settings_without_data_settle()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
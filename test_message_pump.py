@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证消息队列批量取出、丢弃计数，以及修改队列深度时保留未处理的数据
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_message(value, samples=8):
+    """生成一条带帧头帧尾的模拟MQTT消息"""
+    words = [0, 0, 0, 0] + [value] * samples + [0]
+    return SimpleNamespace(payload=np.asarray(words, dtype='>u2').tobytes())
+
+
+def create_client():
+    """创建不连接Broker的MQTT客户端"""
+    from PySide6.QtWidgets import QApplication
+    from gis_pd_mqtt_gui_ui_revamp import MQTTClient
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+
+    client = MQTTClient()
+    client.set_loop_mode("poll")
+    client.queue_timer.stop()  # 由测试手动驱动队列处理
+    return client
+
+
+def test_batch_drain():
+    """测试每次处理取出全部待处理周期"""
+    print("=== 测试批量取出 ===")
+    client = create_client()
+
+    batches = []
+    payload_batches = []
+    client.messages_received.connect(batches.append)
+    client.payloads_received.connect(payload_batches.append)
+
+    for i in range(50):
+        client.on_message(None, None, make_message(i))
+    client.process_message_queue()
+
+    assert len(batches) == 1, f"应该只发出1个批量信号，实际为: {len(batches)}"
+    assert len(batches[0]) == 50, f"批量中应有50个周期，实际为: {len(batches[0])}"
+    assert payload_batches[0][3] == make_message(3).payload, "原始负载应按周期顺序随批量发出"
+    assert client.message_queue.empty(), "处理后队列应为空"
+    print("   ✓ 50个周期一次全部取出")
+
+    # 限制每批数量
+    client.configure_message_queue(max_batch_size=20)
+    for i in range(50):
+        client.on_message(None, None, make_message(i))
+    client.process_message_queue()
+    assert len(batches[-1]) == 20, f"每批最多20个周期，实际为: {len(batches[-1])}"
+    print("   ✓ 每批数量限制生效")
+
+
+def test_drop_counting():
+    """测试队列满时的丢弃计数和丢弃策略"""
+    print("=== 测试丢弃计数 ===")
+    client = create_client()
+    client.configure_message_queue(maxsize=10, drop_oldest=True)
+
+    for i in range(15):
+        client.on_message(None, None, make_message(i))
+
+    assert client.dropped_count == 5, f"应丢弃5个周期，实际为: {client.dropped_count}"
+
+    batches = []
+    client.messages_received.connect(batches.append)
+    client.process_message_queue()
+    first_code = int(round(float(batches[0][0][0]) * 4096 / 3.3))
+    assert first_code == 5, f"丢弃最旧数据时应保留第5个以后的周期，实际首个为: {first_code}"
+    print("   ✓ 丢弃最旧数据并正确计数")
+
+    client.reset_dropped_count()
+    client.configure_message_queue(drop_oldest=False)
+    for i in range(15):
+        client.on_message(None, None, make_message(i))
+    client.process_message_queue()
+    first_code = int(round(float(batches[-1][0][0]) * 4096 / 3.3))
+    assert client.dropped_count == 5, f"应丢弃5个周期，实际为: {client.dropped_count}"
+    assert first_code == 0, f"丢弃新数据时应保留最早的周期，实际首个为: {first_code}"
+    print("   ✓ 丢弃新数据策略正确")
+
+
+def test_resize_keeps_pending():
+    """测试修改队列深度时未处理的周期移入新队列，超出新深度的按丢弃策略计数"""
+    print("=== 测试修改队列深度 ===")
+    client = create_client()
+    batches = []
+    client.messages_received.connect(batches.append)
+
+    for i in range(8):
+        client.on_message(None, None, make_message(i))
+    client.configure_message_queue(maxsize=20)
+    client.on_message(None, None, make_message(8))
+    client.process_message_queue()
+    codes = [int(round(float(cycle[0]) * 4096 / 3.3)) for cycle in batches[-1]]
+    assert codes == list(range(9)) and client.dropped_count == 0, f"扩大队列时不应丢失数据，实际为: {codes}"
+
+    for drop_oldest, expected in ((True, [5, 6, 7]), (False, [0, 1, 2])):
+        client.configure_message_queue(maxsize=20, drop_oldest=drop_oldest)
+        client.reset_dropped_count()
+        for i in range(8):
+            client.on_message(None, None, make_message(i))
+        client.configure_message_queue(maxsize=3)
+        client.process_message_queue()
+        codes = [int(round(float(cycle[0]) * 4096 / 3.3)) for cycle in batches[-1]]
+        assert codes == expected, f"缩小队列时应按丢弃策略保留{expected}，实际为: {codes}"
+        assert client.dropped_count == 5, f"缩小队列时丢弃的周期应计数，实际为: {client.dropped_count}"
+    print("   ✓ 未处理的周期移入新队列，超出的按策略丢弃并计数")
+
+
+def test_event_mode_wakeup():
+    """测试事件模式下入队即唤醒处理，并记录延迟"""
+    print("=== 测试事件模式唤醒 ===")
+    client = create_client()
+    client.set_loop_mode("event")
+    assert not client.queue_timer.isActive(), "事件模式下不应启动轮询定时器"
+
+    batches = []
+    client.messages_received.connect(batches.append)
+    client.on_message(None, None, make_message(1))
+
+    # 同一线程内信号直接调用处理函数
+    assert len(batches) == 1, f"入队后应立即发出信号，实际批量数: {len(batches)}"
+    assert client.latency_count == 1, f"应记录1条延迟，实际为: {client.latency_count}"
+    assert client.latency_max_ms >= 0.0, "延迟不应为负数"
+    print("   ✓ 入队即唤醒处理并记录延迟")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_batch_drain()
+        test_drop_counting()
+        test_resize_keeps_pending()
+        test_event_mode_wakeup()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证向量化负载解码与旧版逐点解码结果一致
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_decoder import decode_payload, decode_payload_codes, legacy_decode_payload
+
+
+def make_payload(words):
+    """由16位字列表生成大端负载"""
+    return np.asarray(words, dtype='>u2').tobytes()
+
+
+def test_decode_matches_legacy():
+    """测试解码结果与旧版实现一致"""
+    print("=== 测试解码结果 ===")
+
+    words = [0xAAAA, 0x5555, 0x0001, 0x0002] + list(range(0, 4096, 17)) + [0xFFFF]
+    payload = make_payload(words)
+
+    decoded = decode_payload(payload)
+    legacy = legacy_decode_payload(payload)
+
+    assert decoded.dtype == np.float32, f"解码结果应为float32，实际为: {decoded.dtype}"
+    assert len(decoded) == len(legacy), f"采样点数应为{len(legacy)}，实际为: {len(decoded)}"
+    # 旧版保留两位小数，误差不超过0.005
+    assert np.allclose(decoded, legacy, atol=0.0051), "解码结果与旧版实现偏差过大"
+    print("   ✓ 解码结果与旧版一致")
+
+
+def test_header_and_trailer_stripped():
+    """测试帧头帧尾被去掉且不拷贝数据"""
+    print("=== 测试帧头帧尾处理 ===")
+
+    payload = make_payload([1, 2, 3, 4, 100, 200, 300, 9])
+    codes = decode_payload_codes(payload)
+
+    assert list(codes) == [100, 200, 300], f"码值应为[100, 200, 300]，实际为: {list(codes)}"
+    assert not codes.flags.owndata, "码值应为负载缓冲区的视图"
+    print("   ✓ 帧头帧尾已去掉")
+
+
+def test_short_and_odd_payloads():
+    """测试过短和奇数长度负载"""
+    print("=== 测试异常长度负载 ===")
+
+    assert len(decode_payload(b"")) == 0, "空负载应返回空数组"
+    assert len(decode_payload(make_payload([1, 2, 3, 4, 5]))) == 0, "只有帧头帧尾时应返回空数组"
+
+    # 奇数长度时忽略最后一个字节，与旧版一致
+    payload = make_payload([1, 2, 3, 4, 4095, 7]) + b"\x01"
+    assert np.allclose(decode_payload(payload), legacy_decode_payload(payload), atol=0.0051)
+    print("   ✓ 异常长度负载处理正确")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_decode_matches_legacy()
+        test_header_and_trailer_stripped()
+        test_short_and_odd_payloads()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证PRPD散点按相位像素列抽稀后点数与周期数无关，
+保留幅值包络和局部峰值，且高于阈值的脉冲全部保留
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_lod import decimate_prpd, lttb
+
+THRESHOLD = 1.0
+
+
+def make_cycles(count, width=200, seed=0):
+    """生成阈值以下的噪声周期，并在几个位置加入脉冲"""
+    rng = np.random.default_rng(seed)
+    cycles = (rng.random((count, width)) * 0.5 + 0.1).astype(np.float32)
+    pulses = [(count // 3, 20, 5.0), (count // 2, 20, 4.0), (count - 1, width - 1, 8.0)]
+    for row, column, value in pulses:
+        cycles[row, column] = value
+    return cycles, pulses
+
+
+def test_minmax_keeps_envelope_and_pulses():
+    """测试最小/最大值抽稀：点数由列数决定，包络和脉冲不丢失"""
+    print("=== 测试最小/最大值抽稀 ===")
+    columns = 50
+    sizes = []
+    for count in (100, 800):
+        cycles, pulses = make_cycles(count)
+        x, y = decimate_prpd(cycles, columns, THRESHOLD, "minmax")
+        sizes.append(len(x))
+        assert len(x) == len(y) and y.dtype == np.float32, "相位和幅值应一一对应并保持数据类型"
+        for row, column, value in pulses:
+            assert value in y, f"脉冲{value}应被保留"
+
+        # 每列（4个相位点）的最小值和最大值都应出现
+        below = np.where(cycles > THRESHOLD, np.nan, cycles)
+        for column in range(columns):
+            block = below[:, column * 4:(column + 1) * 4]
+            assert np.nanmin(block) in y and np.nanmax(block) in y, f"第{column}列的包络不完整"
+        assert x.min() >= 0 and x.max() <= 360, "相位应在0到360度之间"
+    assert sizes == [2 * columns + 3] * 2, f"点数应与周期数无关，实际为: {sizes}"
+
+    x, y = decimate_prpd(cycles, columns, THRESHOLD, "none")
+    assert len(x) == cycles.size, "关闭抽稀时应保留全部采样点"
+    x, y = decimate_prpd(cycles[:1], 1000, THRESHOLD, "minmax")
+    assert len(x) == cycles.shape[1], "点数不超过像素列数时不需要抽稀"
+    print("   ✓ 点数由像素列数决定，包络和脉冲全部保留")
+
+
+def test_lttb_keeps_peaks():
+    """测试LTTB选取局部峰值，并与脉冲保留一起使用"""
+    print("=== 测试LTTB抽稀 ===")
+    y = np.zeros(1000)
+    y[123] = 3.0
+    y[777] = -2.0
+    selected = lttb(np.arange(1000), y, 20)
+    assert len(selected) == 20 and (np.diff(selected) > 0).all(), "应选取20个递增的下标"
+    assert selected[0] == 0 and selected[-1] == 999, "应保留首尾两点"
+    assert 123 in selected and 777 in selected, "应保留局部峰值"
+
+    cycles, pulses = make_cycles(500)
+    x, y = decimate_prpd(cycles, 50, THRESHOLD, "lttb")
+    assert len(x) == 2 * 50 + len(pulses), f"点数应为2×列数加脉冲数，实际为: {len(x)}"
+    assert all(value in y for _, _, value in pulses), "脉冲应全部保留"
+    assert y[:-len(pulses)].max() <= THRESHOLD, "阈值以下的点才参与抽稀"
+    print("   ✓ LTTB保留局部峰值和全部脉冲")
+
+
+def test_offscreen_scatter_is_bounded():
+    """测试后台绘制的散点数与周期数无关"""
+    print("=== 测试散点数量 ===")
+    from gis_pd_render import FrameSnapshot, OffscreenFrameRenderer
+
+    renderer = OffscreenFrameRenderer()
+    counts = []
+    for count in (50, 400):
+        cycles, pulses = make_cycles(count)
+        snapshot = FrameSnapshot(count, (400, 300), 100, "散点图", cycles, count, count, 8, False, "幅值 (mV)",
+                                 (0.0, 10.0), "默认", "viridis", lod_method="minmax", lod_threshold=THRESHOLD)
+        renderer.render(snapshot)
+        counts.append(len(renderer.prpd_renderer.scatter.get_offsets()))
+    assert counts[0] == counts[1] and counts[0] < 50 * 200, f"散点数应由画布宽度决定，实际为: {counts}"
+    print(f"   ✓ 散点数为{counts[0]}，与周期数无关")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_minmax_keeps_envelope_and_pulses()
+        test_lttb_keeps_peaks()
+        test_offscreen_scatter_is_bounded()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
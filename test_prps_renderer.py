@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证PRPS增量渲染只为新周期计算条带，结果与完整重建和plot_surface一致，
+以及热力瀑布图和堆叠线瀑布图只为新周期转换数据
+"""
+
+import sys
+import os
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_buffers import CycleRingBuffer
+from gis_pd_render import IncrementalPRPSRenderer, WaterfallPRPSRenderer
+
+
+def create_renderer(capacity, convert=None):
+    """创建绑定到独立3D坐标轴的渲染器"""
+    fig = Figure()
+    ax = fig.add_subplot(111, projection='3d')
+    renderer = IncrementalPRPSRenderer(ax)
+    renderer.setup("config", capacity, (0, 3.3), "幅值 (mV)", "viridis", convert)
+    return renderer
+
+
+def test_incremental_matches_rebuild():
+    """测试逐帧增量更新与一次性重建的结果一致"""
+    print("=== 测试增量更新与重建一致 ===")
+    rng = np.random.default_rng(1)
+    buffer = CycleRingBuffer(10)
+    incremental = create_renderer(10)
+
+    for _ in range(23):
+        buffer.append(rng.random(120))
+        incremental.update(buffer.last(), buffer.appended, "PRPS")
+
+    rebuilt = create_renderer(10)
+    rebuilt.update(buffer.last(), buffer.appended, "PRPS")
+
+    assert np.allclose(incremental.surface.get_array(), rebuilt.surface.get_array()), "增量更新的着色数值应与重建一致"
+    assert len(incremental._strips) == 9, f"10个周期应有9个条带，实际为: {len(incremental._strips)}"
+    assert incremental.ax.get_ylim() == (1, 10), f"周期轴范围应为1-10，实际为: {incremental.ax.get_ylim()}"
+    print("   ✓ 增量更新结果正确")
+
+
+def test_matches_plot_surface():
+    """测试增量表面与原来的plot_surface(shade=True)绘制的像素相同"""
+    print("=== 测试与plot_surface一致 ===")
+    rng = np.random.default_rng(2)
+    for width in (50, 200):
+        data = rng.random((10, width)) * 3
+        images = []
+        for incremental in (True, False):
+            fig = Figure(figsize=(4, 3))
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot(111, projection='3d')
+            if incremental:
+                renderer = IncrementalPRPSRenderer(ax)
+                renderer.setup("config", 10, (0, 3.3), "幅值 (mV)", "viridis")
+                renderer.update(data, 10, "PRPS")
+            else:
+                x, y = np.meshgrid(np.linspace(0, 360, width), np.arange(1, 11))
+                ax.plot_surface(x, y, data, cmap="viridis", edgecolor='none', alpha=0.8, shade=True)
+                ax.set_xlabel("相位", fontsize=10, labelpad=10)
+                ax.set_ylabel("周期", fontsize=10, labelpad=10)
+                ax.set_zlabel("幅值 (mV)", fontsize=10, labelpad=10)
+                ax.set_xlim(0, 360)
+                ax.set_ylim(1, 10)
+                ax.set_zlim(0, 3.3)
+                ax.view_init(elev=30, azim=240)
+                ax.set_box_aspect((1, 0.7, 0.5))
+                ax.set_title("PRPS", fontsize=12)
+            fig.canvas.draw()
+            images.append(np.array(fig.canvas.buffer_rgba()))
+        assert np.array_equal(images[0], images[1]), f"{width}个相位点时增量表面应与plot_surface相同"
+    print("   ✓ 分块、着色与plot_surface相同")
+
+
+def test_only_new_rows_converted():
+    """测试每帧只转换新到达的周期"""
+    print("=== 测试只计算新周期 ===")
+    converted = []
+
+    def convert(values):
+        converted.append(len(values))
+        return values * 2
+
+    buffer = CycleRingBuffer(5)
+    renderer = create_renderer(5, convert)
+    for i in range(5):
+        buffer.append(np.full(8, i, dtype=np.float32))
+    renderer.update(buffer.last(), buffer.appended, "PRPS")
+    assert len(converted) == 5, f"首次绘制应转换5个周期，实际为: {len(converted)}"
+
+    buffer.append(np.full(8, 9, dtype=np.float32))
+    renderer.update(buffer.last(), buffer.appended, "PRPS")
+    assert len(converted) == 6, f"新增1个周期只应转换1次，实际共: {len(converted)}"
+    assert np.isclose(renderer.surface.get_array().max(), (4 + 9) * 2 / 2), "最新条带应按转换后的平均值着色"
+    print("   ✓ 只转换新周期")
+
+
+def test_waterfall_views():
+    """测试两种瀑布图显示窗口内的全部周期，每帧只转换新周期"""
+    print("=== 测试瀑布图 ===")
+    converted = []
+
+    def convert(values):
+        converted.append(len(values))
+        return values * 2
+
+    for view_type in ("热力瀑布图", "堆叠线瀑布图"):
+        converted.clear()
+        ax = Figure(figsize=(8, 8), dpi=100).add_subplot(111)  # 高度足够，300条折线不需要合并
+        renderer = WaterfallPRPSRenderer(ax)
+        renderer.setup("config", view_type, 300, (0, 4), "viridis", convert)
+        buffer = CycleRingBuffer(300)
+        for i in range(400):
+            buffer.append(np.full(90, i % 2, dtype=np.float32))
+            if i % 50 == 49:
+                renderer.update(buffer.last(), buffer.appended, "PRPS")
+        assert sum(converted) == 400, f"每个周期只应转换一次，实际共转换: {sum(converted)}"
+
+        if view_type == "热力瀑布图":
+            image = renderer.artist.get_array()
+            assert image.shape == (300, 90), f"图像应为300个周期×90个相位点，实际为: {image.shape}"
+            assert np.allclose(image[:, 0], (buffer.last()[:, 0] * 2)), "图像的行应为转换后的周期数据"
+            assert ax.get_ylim() == (0.5, 300.5), f"周期轴范围不正确: {ax.get_ylim()}"
+        else:
+            segments = renderer.artist.get_segments()
+            assert len(segments) == 300 and len(segments[0]) == 90, "每个周期应有一条90个点的折线"
+            # 转换后为0或2，幅值范围0-4缩放到RIDGE_HEIGHT个周期间距
+            assert np.allclose(segments[0][:, 1], 1), "最早的折线基线应为1"
+            assert np.allclose(segments[-1][:, 1], 300 + 2 / 4 * renderer.RIDGE_HEIGHT), "最新的折线基线应为300"
+            assert np.allclose(renderer.artist.get_array()[-2:], [0, 2]), "折线应按转换后的最大幅值着色"
+
+            # 画布较矮时相邻周期合并为取最大值的折线
+            ax.figure.set_size_inches(8, 2)
+            renderer.update(buffer.last(), buffer.appended, "PRPS")
+            segments = renderer.artist.get_segments()
+            assert len(segments) <= ax.bbox.height / renderer.MIN_LINE_SPACING_PX, f"折线过多: {len(segments)}"
+            assert np.allclose(renderer.artist.get_array(), 2), "合并后的每条折线都应保留最大幅值"
+    print("   ✓ 瀑布图显示全部周期，只转换新周期")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_incremental_matches_rebuild()
+        test_matches_plot_surface()
+        test_only_new_rows_converted()
+        test_waterfall_views()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证颜色映射、参考正弦波、相位轴和网格按设置缓存并在各图表之间共享，
+以及缓存的数组为只读、设置变化时可以丢弃
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_render_cache import RenderResourceCache, shared_cache
+
+COLORS = ['#000000', '#FFFFFE', '#FFFF13', '#FF0000']
+
+
+def test_colormap_and_sine():
+    """测试颜色映射和参考正弦波只创建一次"""
+    print("=== 测试颜色映射和参考正弦波 ===")
+    cache = RenderResourceCache()
+    cmap = cache.colormap(COLORS)
+    assert cache.colormap(list(COLORS)) is cmap, "同一颜色方案应返回同一个颜色映射"
+    assert cache.colormap(COLORS[::-1]) is not cmap, "不同颜色方案应返回不同的颜色映射"
+    assert cmap.N == 100 and np.allclose(cmap(1.0), (1, 0, 0, 1)), "颜色映射应与原来的自定义颜色映射一致"
+    assert np.allclose(cache.colormap(COLORS[:3])(1.0), (1, 0, 0, 1)), "颜色不足4种时末尾应补红色"
+
+    x, y = cache.sine_overlay(25, -25)
+    assert cache.sine_overlay(25, -25)[0] is x, "同一单位的正弦波应只计算一次"
+    assert len(x) == 1000 and np.isclose(y[250], 0, atol=0.01) and np.isclose(y.min(), -50), "正弦波的值不正确"
+    assert not x.flags.writeable and not y.flags.writeable, "缓存的正弦波应为只读"
+
+    cache.invalidate("sine")
+    assert cache.sine_overlay(25, -25)[0] is not x, "丢弃后应重新计算"
+    assert cache.colormap(COLORS) is cmap, "只丢弃指定类型的资源"
+    print("   ✓ 颜色映射和正弦波按设置缓存")
+
+
+def test_phase_grids():
+    """测试相位轴、网格和平铺相位与直接计算一致，周期数变化时复用最大的网格"""
+    print("=== 测试相位网格 ===")
+    cache = RenderResourceCache(max_entries=2)
+    phase = cache.phase_axis(90)
+    assert np.array_equal(phase, np.linspace(0, 360, 90)) and cache.phase_axis(90) is phase, "相位轴应被缓存"
+
+    x, y = cache.meshgrid(90, 50)
+    expected_x, expected_y = np.meshgrid(np.linspace(0, 360, 90), np.arange(1, 51))
+    assert np.array_equal(x, expected_x) and np.array_equal(y, expected_y), "网格应与np.meshgrid一致"
+    assert not x.flags.writeable, "缓存的网格应为只读"
+
+    small_x, _ = cache.meshgrid(90, 20)
+    assert small_x.shape == (20, 90) and np.shares_memory(small_x, x), "较少的周期数应取缓存网格的前几行"
+    tile = cache.phase_tile(90, 30)
+    assert np.array_equal(tile, np.tile(np.linspace(0, 360, 90), 30)), "平铺相位应与np.tile一致"
+
+    large_x, large_y = cache.meshgrid(90, 80)
+    assert large_x.shape == (80, 90) and large_y[-1, 0] == 80, "周期数增加时应重新创建更大的网格"
+
+    for width in (10, 20, 30):
+        cache.phase_axis(width)
+    assert len(cache._entries["phase"]) == 2, "每类资源的缓存条目数应有上限"
+    print("   ✓ 相位网格按点数和周期数缓存")
+
+
+def test_dialogs_share_cache():
+    """测试历史数据对话框之间以及与实时图表共享颜色映射（实时图表同样通过shared_cache取得）"""
+    print("=== 测试共享缓存 ===")
+    from PySide6.QtWidgets import QApplication
+    from gis_pd_mqtt_gui_ui_revamp import HistoricalChartsDialog
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+
+    first = HistoricalChartsDialog([])
+    second = HistoricalChartsDialog([])
+    colors = first.color_schemes["默认方案"]
+    cmap = first.create_custom_colormap(colors)
+    assert first.create_custom_colormap(colors) is cmap, "每次重绘应复用同一个颜色映射"
+    assert second.create_custom_colormap(list(colors)) is cmap, "不同的对话框应共享同一个颜色映射"
+    assert shared_cache.colormap(colors) is cmap, "应使用共享缓存"
+    first.close()
+    second.close()
+    print("   ✓ 各图表共享缓存的颜色映射")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_colormap_and_sine()
+        test_phase_grids()
+        test_dialogs_share_cache()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
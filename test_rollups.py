@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证汇总统计的分桶计算、写入线程维护汇总、重启后合并同一时间桶，
+以及按时间范围选择分辨率
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_rollups import (RollupAccumulator, RollupBucket, choose_resolution, summarize_cycle,
+                            ROLLUP_AMPLITUDE_RANGE, ROLLUP_PHASE_BINS, PULSE_THRESHOLD)
+
+START_US = 1_700_000_000_000_000 - 1_700_000_000_000_000 % 3_600_000_000  # 整点
+
+
+def make_cycle(peak, width=144):
+    """生成底噪加一个脉冲的周期（毫伏），脉冲位于第一个相位分箱"""
+    values = np.full(width, ROLLUP_AMPLITUDE_RANGE[0] + 0.01)
+    values[0] = peak
+    return values
+
+
+def test_summarize_and_buckets():
+    """测试单个周期的汇总量和跨时间桶的累积"""
+    print("=== 测试分桶汇总 ===")
+    peak = PULSE_THRESHOLD + 0.1
+    maxima, sums, samples, pulses, histogram = summarize_cycle(make_cycle(peak))
+    assert np.isclose(maxima[0], peak) and samples.sum() == 144, "每个相位分箱的最大值和采样点数不正确"
+    assert pulses == 1, f"应检测到1个脉冲，实际为: {pulses}"
+    assert histogram.sum() == 144, "范围内的采样点都应计入二维计数"
+
+    accumulator = RollupAccumulator()
+    rows = []
+    for i in range(150):  # 每秒一个周期，跨过两个分钟边界
+        rows.extend(accumulator.add(START_US + i * 1_000_000, make_cycle(peak if i % 2 else 0.7)))
+    rows.extend(accumulator.take_all())
+    by_resolution = {}
+    for row in rows:
+        by_resolution.setdefault(row[0], []).append(RollupBucket.from_row(row))
+
+    assert len(by_resolution[1]) == 150, "1秒分辨率应有150个时间桶"
+    assert [bucket.cycle_count for bucket in by_resolution[60]] == [60, 60, 30], "1分钟分辨率的周期数不正确"
+    assert by_resolution[3600][0].cycle_count == 150, "1小时分辨率应包含全部周期"
+    assert by_resolution[3600][0].pulse_count == 75, "脉冲数应为各周期之和"
+    assert np.isclose(by_resolution[3600][0].maxima[0], peak, atol=1e-6), "最大值应为各周期的最大值"
+    print("   ✓ 各分辨率的时间桶正确")
+
+
+def test_writer_rollups_and_merge():
+    """测试写入线程维护汇总，重启后同一时间桶合并"""
+    print("=== 测试写入汇总 ===")
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+    from gis_pd_codec import encode_cycle
+    from gis_pd_storage import us_to_timestamp
+
+    def submit(manager, index):
+        timestamp_us = START_US + index * 500_000  # 每秒2个周期
+        manager.writer.submit("cycle_data", (us_to_timestamp(timestamp_us), timestamp_us, index,
+                                             encode_cycle(make_cycle(PULSE_THRESHOLD + 0.1))))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "rollup_test.db")
+        manager = DatabaseManager(db_path)
+        for i in range(100):
+            submit(manager, i)
+        manager.close()
+
+        manager = DatabaseManager(db_path)
+        for i in range(100, 140):  # 与重启前最后一分钟属于同一时间桶
+            submit(manager, i)
+        manager.flush(5.0)
+
+        start, end = us_to_timestamp(START_US), us_to_timestamp(START_US + 3600 * 1_000_000)
+        resolution, minutes = manager.get_rollups(start, end, resolution=60)
+        assert resolution == 60 and list(minutes["cycle_count"]) == [120, 20], \
+            f"1分钟汇总应合并重启前后的数据，实际为: {list(minutes['cycle_count'])}"
+        _, seconds = manager.get_rollups(start, end, resolution=1, with_histogram=True)
+        assert len(seconds["start_us"]) == 70 and seconds["cycle_count"].sum() == 140, "1秒汇总不正确"
+        assert seconds["histogram"].sum() == 140 * 144, "合计的二维计数应包含全部采样点"
+        assert seconds["max_amplitude"].shape == (70, ROLLUP_PHASE_BINS), "最大幅值应为每个时间桶一行"
+        manager.close()
+    print("   ✓ 写入时维护汇总，重启后合并")
+
+
+def test_choose_resolution():
+    """测试按时间范围选择分辨率，并测量一年的小时汇总的读取耗时"""
+    print("=== 测试选择分辨率 ===")
+    hour_us = 3600 * 1_000_000
+    assert choose_resolution(0, 365 * 24 * hour_us) == 3600, "一年应使用1小时分辨率"
+    assert choose_resolution(0, 30 * 24 * hour_us) == 3600, "一个月有720个小时，应使用1小时分辨率"
+    assert choose_resolution(0, 7 * 24 * hour_us) == 60, "一周应使用1分钟分辨率"
+    assert choose_resolution(0, hour_us) == 1, "一小时应使用1秒分辨率"
+    print("   ✓ 选择能填满图表的最粗分辨率")
+
+    from gis_pd_mqtt_gui_ui_revamp import DatabaseManager
+    from gis_pd_storage import us_to_timestamp
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = DatabaseManager(os.path.join(tmp_dir, "year_test.db"))
+        row = RollupBucket(3600, 0)
+        row.add(summarize_cycle(make_cycle(1.0)))
+        template = row.to_row()
+        with manager.conn:
+            manager.conn.executemany(
+                "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(3600, START_US + i * hour_us) + template[2:] for i in range(365 * 24)])
+        begin = time.perf_counter()
+        resolution, rollups = manager.get_rollups(us_to_timestamp(START_US),
+                                                  us_to_timestamp(START_US + 365 * 24 * hour_us))
+        elapsed = (time.perf_counter() - begin) * 1000
+        assert resolution == 3600 and len(rollups["start_us"]) == 365 * 24, "应读取一年的小时汇总"
+        manager.close()
+    print(f"   ✓ 一年的趋势读取耗时 {elapsed:.1f} ms")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_summarize_and_buckets()
+        test_writer_rollups_and_merge()
+        test_choose_resolution()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试脚本：验证向量化单位转换与逐点公式一致
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gis_pd_units import mv_to_dbm, dbm_to_mv, to_display_unit
+
+
+def test_array_matches_formula():
+    """测试整个数组转换与原公式逐点计算一致"""
+    print("=== 测试数组转换 ===")
+    values = np.random.default_rng(0).random((5, 40)) * 3.3
+
+    expected = np.array([[v * 54.545 - 81.818 for v in row] for row in values])
+    assert np.allclose(mv_to_dbm(values), expected), "mV转dBm应与原公式一致"
+    assert np.allclose(dbm_to_mv(mv_to_dbm(values)), values), "dBm转回mV应得到原值"
+    assert np.isclose(dbm_to_mv(-50), (-50 + 81.818) / 54.545), "标量转换应与原公式一致"
+    assert mv_to_dbm([1.0, 2.0]).shape == (2,), "列表输入应返回数组"
+    print("   ✓ 数组、列表和标量转换正确")
+
+    assert to_display_unit(values, False) is values, "使用毫伏时不应拷贝数据"
+    assert np.allclose(to_display_unit(values, True), expected), "使用dBm时应转换"
+    print("   ✓ 显示单位转换正确")
+
+
+def main():
+    """主测试函数"""
+    try:
+        test_array_matches_formula()
+        print("🎉 所有测试通过！")
+    except AssertionError as e:
+        print(f"❌ 测试失败: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)